@@ -0,0 +1,123 @@
+"""Archiving of finished work: completed parts of a plan are moved to a side plan file
+(.ldag), leaving stubs behind, and brought back when needed.
+
+A product is archived when it is done, all of its prerequisites are archived and all of
+its direct successors are done. Archived products that are still prerequisites of products
+left in the model stay as stubs: the same product, fields untouched, whose prerequisites
+are only in the archive. Other archived products leave the model.
+
+Until then a stub is a leaf: ordering, validation, queries and layout only see its own
+fields, so the model stays proportional to the work still active. `rehydrate` brings back a
+stub's prerequisites from the archive, as stubs themselves if they have prerequisites of
+their own, and `restore` a whole cone.
+
+Example:
+
+    archive_done(dag_model, "archive.ldag")
+    ...
+    rehydrate(dag_model, stub)      # the stub's prerequisites come back
+"""
+import os
+
+from contextlib import nullcontext
+
+from src.dag_model import DAGModel, Status
+from src.plan_file import load_plan, write_plan
+
+
+def is_stub(dag_model, product):
+    """Whether a product is a stub left by `archive_done`.
+    """
+    return product._uuid in dag_model._stubs
+
+
+def archivable(dag_model):
+    """UUIDs of the products that `archive_done` would archive, prerequisites first.
+    """
+    nodes, graph = dag_model._nodes, dag_model._graph
+    successors = {id: [] for id in graph}
+    for id, prereqs in graph.items():
+        for pre in prereqs:
+            successors[pre].append(id)
+
+    archived = {}
+    for product in dag_model._order():
+        id = product._uuid
+        if (product.status == Status.DONE
+                and all(pre in archived for pre in graph[id])
+                and all(nodes[s].status == Status.DONE for s in successors[id])):
+            archived[id] = None
+    return list(archived)
+
+
+def archive_done(dag_model, filepath):
+    """Moves finished work out of a model into an archive plan file.
+
+    The archive is added to if it exists, which reads and rewrites it: O(N + E) for the
+    model, plus the size of the archive. The model is edited through its usual methods, so
+    observers follow.
+
+    Args:
+        dag_model (DAGModel): the model to trim.
+        filepath (str): the archive plan file.
+
+    Returns:
+        int: the number of products archived, not counting stubs archived before.
+    """
+    filepath = os.path.abspath(filepath)
+    lock = dag_model._lock
+    with lock.write() if lock is not None else nullcontext():
+        ids = archivable(dag_model)
+        if not ids:
+            return 0
+        nodes, graph = dag_model._nodes, dag_model._graph
+        chosen = set(ids)
+
+        # Stubs are already archived in full
+        new = [id for id in ids if id not in dag_model._stubs]
+        if new:
+            archive = load_plan(filepath) if os.path.exists(filepath) else DAGModel()
+            for id in new:
+                archive.add_product(nodes[id], *[nodes[pre] for pre in graph[id]])
+            write_plan(archive, filepath)
+
+        boundary = {pre for id, prereqs in graph.items() if id not in chosen
+                    for pre in prereqs if pre in chosen}
+
+        for id in boundary:
+            dag_model.stub(nodes[id], filepath)
+        dag_model.remove_products(*[nodes[id] for id in ids if id not in boundary])
+    return len(new)
+
+
+def rehydrate(dag_model, product):
+    """Brings back the prerequisites of a stub from its archive. Prerequisites missing from
+    the model come back as stubs themselves.
+
+    Returns:
+        bool: False if the product is not a stub.
+
+    Raises:
+        KeyError: if the product is not in its archive.
+    """
+    return dag_model._unstub(product._uuid)
+
+
+def restore(dag_model, product):
+    """Rehydrates every stub among a product and its prerequisites, so that its whole cone
+    is back in the model.
+
+    Returns:
+        int: the number of stubs rehydrated.
+    """
+    count = 0
+    seen = {product._uuid}
+    queue = [product]
+    while queue:
+        product = queue.pop()
+        count += rehydrate(dag_model, product)
+        for pre in dag_model.get_prerequisites(product):
+            if pre._uuid not in seen:
+                seen.add(pre._uuid)
+                queue.append(pre)
+    return count
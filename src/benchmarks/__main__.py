@@ -0,0 +1,5 @@
+import sys
+
+from src.benchmarks.suite import main
+
+sys.exit(main())
@@ -0,0 +1,131 @@
+import math
+import random
+
+from datetime import datetime, timedelta
+
+from src.dag_model import DAGModel, Product, Status
+
+
+def _make_product(name, rng, start=datetime(2024, 1, 1)):
+    status = Status(rng.randrange(3))
+    target = start + timedelta(days=rng.randrange(365)) if rng.random() < 0.5 else None
+    return Product(name, status=status, target=target)
+
+
+def chain(n, seed=0):
+    """A single path: each product depends on the one before it.
+
+    Args:
+        n (int): number of products.
+        seed (int, optional): seed for statuses and target dates.
+
+    Returns:
+        DAGModel: the generated model.
+    """
+    rng = random.Random(seed)
+    dag_model = DAGModel()
+
+    previous = None
+    for i in range(n):
+        product = _make_product(f"chain{i}", rng)
+        if previous is None:
+            dag_model.add_product(product)
+        else:
+            dag_model.add_product(product, previous)
+        previous = product
+
+    return dag_model
+
+
+def fan_in(n, seed=0):
+    """One endpoint depending directly on n - 1 independent products.
+    """
+    rng = random.Random(seed)
+    dag_model = DAGModel()
+
+    sources = [_make_product(f"source{i}", rng) for i in range(n - 1)]
+    for source in sources:
+        dag_model.add_product(source)
+    dag_model.add_product(_make_product("sink", rng), *sources)
+
+    return dag_model
+
+
+def fan_out(n, seed=0):
+    """n - 1 endpoints that all depend on a single shared product.
+    """
+    rng = random.Random(seed)
+    dag_model = DAGModel()
+
+    source = _make_product("source", rng)
+    dag_model.add_product(source)
+    for i in range(n - 1):
+        dag_model.add_product(_make_product(f"sink{i}", rng), source)
+
+    return dag_model
+
+
+def diamond_lattice(n, seed=0):
+    """A square grid in which each product depends on its upper and left neighbours.
+
+    Every interior product is reachable along many paths, which is the worst case
+    for traversals that do not remember visited nodes.
+    """
+    rng = random.Random(seed)
+    dag_model = DAGModel()
+
+    width = max(1, math.isqrt(n))
+    products = []
+    for i in range(n):
+        product = _make_product(f"lattice{i}", rng)
+        prerequisites = []
+        if i >= width:
+            prerequisites.append(products[i - width])
+        if i % width != 0:
+            prerequisites.append(products[i - 1])
+        dag_model.add_product(product, *prerequisites)
+        products.append(product)
+
+    return dag_model
+
+
+def random_layered(n, layers=None, max_prerequisites=3, seed=0):
+    """Products split into layers, each depending on random products of earlier layers.
+
+    Args:
+        n (int): number of products.
+        layers (int, optional): number of layers, defaults to sqrt(n).
+        max_prerequisites (int, optional): maximum number of prerequisites per product.
+        seed (int, optional): seed for the structure, statuses and target dates.
+
+    Returns:
+        DAGModel: the generated model.
+    """
+    rng = random.Random(seed)
+    dag_model = DAGModel()
+
+    layers = layers if layers is not None else max(1, math.isqrt(n))
+    per_layer = math.ceil(n / layers)
+    products = []
+    for i in range(n):
+        product = _make_product(f"layered{i}", rng)
+        layer_start = (i // per_layer) * per_layer
+        prerequisites = []
+        if layer_start > 0:
+            k = rng.randint(1, max_prerequisites)
+            # Mostly link to the previous layer, occasionally to anything earlier
+            lo = max(0, layer_start - per_layer) if rng.random() < 0.8 else 0
+            prerequisites = [products[rng.randrange(lo, layer_start)] for _ in range(k)]
+        dag_model.add_product(product, *prerequisites)
+        products.append(product)
+
+    return dag_model
+
+
+GENERATORS = {
+    "chain": chain,
+    "fan_in": fan_in,
+    "fan_out": fan_out,
+    "diamond": diamond_lattice,
+    "layered": random_layered,
+}
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from src.benchmarks.generators import GENERATORS
+from src.dag_model import DAGModel, Product
+from src.planning import simulate
+from src.query import ProductColumns
+from src.validate import validate_DAG
+from src.visualize import gantt
+
+
+DEFAULT_SIZES = [10**2, 10**3, 10**4]
+
+
+class Operation:
+    """A timed operation on a generated DAGModel.
+
+    Args:
+        name (str): key under which the timing is stored.
+        run (callable): the timed call, receives the values returned by `setup`.
+        setup (callable, optional): untimed preparation, receives the BenchmarkContext.
+        teardown (callable, optional): untimed cleanup, receives the values returned by `setup`.
+        max_nodes (int or dict, optional): largest model the operation is run on, either for
+            all shapes or per shape (with a "default" entry). Used to skip quadratic or worse
+            operations on large models.
+    """
+
+    def __init__(self, name, run, setup=None, teardown=None, max_nodes=None):
+        self.name = name
+        self.run = run
+        self.setup = setup if setup is not None else (lambda ctx: (ctx,))
+        self.teardown = teardown
+        self.max_nodes = max_nodes
+
+    def applies_to(self, shape, n):
+        limit = self.max_nodes
+        if isinstance(limit, dict):
+            limit = limit.get(shape, limit.get("default"))
+        return limit is None or n <= limit
+
+
+class BenchmarkContext:
+    def __init__(self, dag_model, workdir):
+        self.dag_model = dag_model
+        self.workdir = workdir
+        self.xml_path = os.path.join(workdir, "bench.xml")
+
+        products = dag_model.products
+        self.sample = products[len(products) // 2]
+        self.endpoint = max(dag_model.endpoints,
+                            key=lambda p: len(dag_model._graph[p._uuid]))
+        self.deepest = products[-1]
+
+
+# --- setup/teardown helpers for mutating operations ---
+
+def _setup_add(ctx):
+    return ctx.dag_model, Product("bench_new"), ctx.sample
+
+
+def _teardown_add(dag_model, product, _):
+    dag_model.remove_product(product)
+
+
+def _setup_add_dependency(ctx):
+    new = Product("bench_new")
+    return ctx.dag_model, ctx.sample, new
+
+
+def _teardown_add_dependency(dag_model, product, new):
+    dag_model.remove_dependencies(product, new)
+    dag_model.remove_product(new)
+
+
+def _setup_remove(ctx):
+    dag_model = ctx.dag_model
+    product = ctx.sample
+    return dag_model, product, dag_model.get_prerequisites(product), dag_model.get_successors(product)
+
+
+def _teardown_remove(dag_model, product, prerequisites, successors):
+    dag_model.add_product(product, *prerequisites)
+    for successor in successors:
+        dag_model.add_dependency(successor, product)
+
+
+def _setup_remove_dependencies(ctx):
+    dag_model = ctx.dag_model
+    product = ctx.deepest
+    return dag_model, product, dag_model.get_prerequisites(product)
+
+
+def _teardown_remove_dependencies(dag_model, product, prerequisites):
+    dag_model.add_dependency(product, *prerequisites)
+
+
+def _setup_from_xml(ctx):
+    ctx.dag_model.to_xml(ctx.xml_path)
+    return (ctx.xml_path,)
+
+
+def _setup_find(ctx):
+    return ProductColumns(ctx.dag_model), ctx.deepest.name
+
+
+def _run_find(columns, name):
+    columns.find(f"status=to_do target<=+14d upstream={name}")
+
+
+def _teardown_find(columns, _):
+    columns.close()
+
+
+def _setup_gantt(ctx):
+    fig, ax = plt.subplots()
+    return ctx.dag_model, ax
+
+
+def _run_gantt(dag_model, ax):
+    gantt(dag_model, ax)
+    ax.figure.canvas.draw()
+
+
+def _teardown_gantt(_, ax):
+    plt.close(ax.figure)
+
+
+OPERATIONS = [
+    Operation("add_product",
+              lambda m, p, pre: m.add_product(p, pre),
+              _setup_add, _teardown_add),
+    Operation("add_dependency",
+              lambda m, p, pre: m.add_dependency(p, pre),
+              _setup_add_dependency, _teardown_add_dependency),
+    Operation("remove_product",
+              lambda m, p, pres, succs: m.remove_product(p),
+              _setup_remove, _teardown_remove),
+    Operation("remove_dependencies",
+              lambda m, p, pres: m.remove_dependencies(p, *pres),
+              _setup_remove_dependencies, _teardown_remove_dependencies),
+    Operation("get_product_by_uuid",
+              lambda ctx: ctx.dag_model.get_product_by_uuid(ctx.sample._uuid)),
+    Operation("get_products_by_name",
+              lambda ctx: ctx.dag_model.get_products_by_name(ctx.sample.name)),
+    Operation("get_prerequisites",
+              lambda ctx: ctx.dag_model.get_prerequisites(ctx.endpoint)),
+    Operation("all_prerequisites",
+              lambda ctx: list(ctx.dag_model.all_prerequisites(ctx.deepest))),
+    Operation("get_successors",
+              lambda ctx: ctx.dag_model.get_successors(ctx.sample)),
+    Operation("endpoints",
+              lambda ctx: ctx.dag_model.endpoints),
+    Operation("products",
+              lambda ctx: ctx.dag_model.products),
+    Operation("order",
+              lambda ctx: ctx.dag_model.order),
+    Operation("eq",
+              lambda ctx: ctx.dag_model == ctx.dag_model),
+    # __str__ recurses once per path, which explodes on lattices and overflows the stack on chains
+    Operation("str",
+              lambda ctx: str(ctx.dag_model),
+              max_nodes={"default": 10**4, "chain": 500, "diamond": 100, "layered": 100}),
+    Operation("to_xml",
+              lambda ctx: ctx.dag_model.to_xml(ctx.xml_path)),
+    Operation("from_xml",
+              DAGModel.from_xml, _setup_from_xml),
+    Operation("validate_DAG",
+              lambda ctx: validate_DAG(ctx.dag_model)),
+    Operation("find",
+              _run_find, _setup_find, _teardown_find),
+    Operation("simulate",
+              lambda ctx: simulate(ctx.dag_model, samples=1000, seed=0)),
+    Operation("gantt",
+              _run_gantt, _setup_gantt, _teardown_gantt,
+              max_nodes=10**3),
+]
+
+
+def time_operation(operation, ctx, repeat):
+    """Times an operation `repeat` times, running its setup and teardown around each call.
+
+    Returns:
+        dict: the fastest and median wall time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = operation.setup(ctx)
+        start = time.perf_counter()
+        operation.run(*args)
+        timings.append(time.perf_counter() - start)
+        if operation.teardown is not None:
+            operation.teardown(*args)
+
+    return {"min": min(timings), "median": statistics.median(timings)}
+
+
+def run(shapes=None, sizes=None, operations=None, repeat=5, seed=0, log=None):
+    """Runs every operation on every generated model.
+
+    Args:
+        shapes (list, optional): generator names from GENERATORS, defaults to all.
+        sizes (list, optional): model sizes, defaults to DEFAULT_SIZES.
+        operations (list, optional): names of operations to run, defaults to all.
+        repeat (int, optional): number of timed runs per operation.
+        seed (int, optional): seed passed to the generators.
+        log (file, optional): where to write progress, if anywhere.
+
+    Returns:
+        dict: benchmark metadata and results keyed by "<shape>/<size>/<operation>".
+    """
+    shapes = shapes if shapes is not None else list(GENERATORS)
+    sizes = sizes if sizes is not None else DEFAULT_SIZES
+    selected = [op for op in OPERATIONS if operations is None or op.name in operations]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for shape in shapes:
+            for n in sizes:
+                start = time.perf_counter()
+                dag_model = GENERATORS[shape](n, seed=seed)
+                elapsed = time.perf_counter() - start
+                results[f"{shape}/{n}/generate"] = {"min": elapsed, "median": elapsed}
+                ctx = BenchmarkContext(dag_model, workdir)
+
+                for operation in selected:
+                    key = f"{shape}/{n}/{operation.name}"
+                    if not operation.applies_to(shape, n):
+                        continue
+                    try:
+                        results[key] = time_operation(operation, ctx, repeat)
+                    except Exception as e:
+                        results[key] = {"error": f"{type(e).__name__}: {e}"}
+
+                    if log is not None:
+                        print(f"{key}: {results[key]}", file=log)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def _typical(result):
+    # Medians vary less between runs than minimums; results without one only have a minimum
+    return result.get("median", result.get("min"))
+
+
+def compare(current, baseline, threshold=0.25, thresholds=None, min_time=1e-2):
+    """Finds operations that got slower than in a baseline run, comparing median timings.
+
+    Args:
+        current (dict): results of `run`.
+        baseline (dict): results of an earlier `run`.
+        threshold (float, optional): allowed relative slowdown, 0.25 meaning 25% slower.
+        thresholds (dict, optional): per-operation overrides of `threshold`.
+        min_time (float, optional): timings below this many seconds are treated as noise:
+            they are not reported, and faster baselines count as this long. Sub-millisecond
+            operations easily vary by 2x between identical runs.
+
+    Returns:
+        list: (key, baseline seconds, current seconds, ratio) for every regression.
+    """
+    thresholds = thresholds if thresholds is not None else {}
+    regressions = []
+
+    for key, result in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None or _typical(old) is None or _typical(result) is None:
+            continue
+
+        allowed = thresholds.get(key.rsplit("/", 1)[-1], threshold)
+        old_time, new_time = _typical(old), _typical(result)
+        if new_time < min_time:
+            continue
+        ratio = new_time / max(old_time, min_time)
+        if ratio > 1 + allowed:
+            regressions.append((key, old_time, new_time, ratio))
+
+    return regressions
+
+
+def _parse_sizes(string):
+    return [int(float(size)) for size in string.split(",")]
+
+
+def _parse_thresholds(pairs):
+    thresholds = {}
+    for pair in pairs:
+        name, value = pair.split("=")
+        thresholds[name] = float(value)
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.benchmarks",
+        description="Time DAGModel operations on synthetic DAGs and compare against a baseline.")
+    parser.add_argument("--shapes", default=",".join(GENERATORS),
+                        help=f"comma-separated generators ({', '.join(GENERATORS)})")
+    parser.add_argument("--sizes", type=_parse_sizes, default=DEFAULT_SIZES,
+                        help="comma-separated node counts, e.g. 1e2,1e4,1e6")
+    parser.add_argument("--ops", default=None,
+                        help="comma-separated operations to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json",
+                        help="where to write the results as JSON")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON results to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="also write the results to the --baseline path")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative slowdown before reporting a regression")
+    parser.add_argument("--op-threshold", action="append", default=[], metavar="OP=VALUE",
+                        help="per-operation threshold override, may be repeated")
+    parser.add_argument("--min-time", type=float, default=1e-2,
+                        help="ignore median timings faster than this many seconds")
+    args = parser.parse_args(argv)
+
+    operations = args.ops.split(",") if args.ops else None
+    results = run(args.shapes.split(","), args.sizes, operations,
+                  repeat=args.repeat, seed=args.seed, log=sys.stdout)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline is None:
+        return 0
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.threshold,
+                          _parse_thresholds(args.op_threshold), args.min_time)
+    for key, old, new, ratio in regressions:
+        print(f"REGRESSION {key}: {old:.6f}s -> {new:.6f}s ({ratio:.2f}x)")
+    if not regressions:
+        print("No regressions.")
+
+    return 1 if regressions else 0
@@ -0,0 +1,290 @@
+"""Independent parts of a plan (weakly connected components), and validation, ordering and
+Gantt charts run on each part in parallel worker processes.
+
+Example:
+
+    components = Components(dag_model)
+    len(components)                                 # number of independent projects
+    cycles, dates = analyze_components(dag_model, components, workers=8)
+"""
+from array import array
+from collections import namedtuple
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from graphlib import TopologicalSorter, CycleError
+from multiprocessing import get_context
+
+from src.dag_model import DAGObserver
+from src.validate import analyze_DAG, _analyze_graph, Analysis, Cycle
+
+
+class Components(DAGObserver):
+    """Weakly connected components of a DAGModel: groups of products linked by dependencies
+    in either direction, which can be analyzed independently of each other.
+
+    Kept up to date by union-find: adding products and dependencies costs near-constant
+    time. Removals can split a component, which union-find cannot undo, so they mark the
+    structure to be rebuilt in O(N + E) the next time it is used.
+
+    Args:
+        dag_model (DAGModel): the model to follow.
+    """
+
+    def __init__(self, dag_model):
+        self.dag_model = dag_model
+        self._parent = {}
+        self._size = {}
+        self._stale = True
+        dag_model.subscribe(self)
+
+    def close(self):
+        """Stops following the model.
+        """
+        self.dag_model.unsubscribe(self)
+
+    # --- union-find ---
+
+    def _find(self, id):
+        parent = self._parent
+        if id not in parent:
+            parent[id] = id
+            self._size[id] = 1
+        while parent[id] != id:
+            # Path halving
+            parent[id] = parent[parent[id]]
+            id = parent[id]
+        return id
+
+    def _union(self, a, b):
+        a, b = self._find(a), self._find(b)
+        if a == b:
+            return
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size.pop(b)
+
+    def _rebuild(self):
+        self._parent, self._size = {}, {}
+        for id, prereqs in self.dag_model._graph.items():
+            self._find(id)
+            for pre in prereqs:
+                self._union(id, pre)
+        self._stale = False
+
+    def _roots(self):
+        if self._stale:
+            self._rebuild()
+        return self._size
+
+    # --- DAGObserver ---
+
+    def product_added(self, dag_model, product):
+        if not self._stale:
+            self._find(product._uuid)
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        if not self._stale:
+            for pre in prerequisite_ids:
+                self._union(product._uuid, pre)
+
+    def product_removed(self, dag_model, product):
+        self._stale = True
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        self._stale = True
+
+    # --- queries ---
+
+    def __len__(self):
+        return len(self._roots())
+
+    def same(self, product, other):
+        """Whether two products are in the same component.
+        """
+        self._roots()
+        return self._find(product._uuid) == self._find(other._uuid)
+
+    def groups(self):
+        """UUIDs of the products of each component, largest component first.
+
+        Returns:
+            list: a list of UUIDs per component.
+        """
+        self._roots()
+        groups = {}
+        for id in self._parent:
+            groups.setdefault(self._find(id), []).append(id)
+        return sorted(groups.values(), key=len, reverse=True)
+
+
+# --- parallel analysis ---
+
+_Part = namedtuple("_Part", ["offsets", "prerequisites", "targets"])
+# What a worker gets of one component: the prerequisites of its i-th product are
+# prerequisites[offsets[i]:offsets[i + 1]], as positions within the component, and targets
+# (if needed) holds the target date of each product. Positions rather than products or UUIDs
+# keep what is pickled small.
+
+
+def _parts(dag_model, components, targets=False):
+    # (UUIDs, _Part) for each component, largest first
+    if dag_model._loader is not None:
+        raise ValueError("Cannot split a partially loaded model; load the whole plan.")
+    if components is None:
+        components = Components(dag_model)
+        components.close()
+    lock = dag_model._lock
+    with lock.read() if lock is not None else nullcontext():
+        nodes, graph = dag_model._nodes, dag_model._graph
+        parts = []
+        for group in components.groups():
+            position = {id: i for i, id in enumerate(group)}
+            offsets, prerequisites = array("I", [0]), array("I")
+            for id in group:
+                prerequisites.extend([position[pre] for pre in graph[id]])
+                offsets.append(len(prerequisites))
+            parts.append((group, _Part(offsets, prerequisites,
+                                       [nodes[id].target for id in group] if targets else None)))
+    return parts
+
+
+def _graph(part):
+    offsets, prerequisites = part.offsets, part.prerequisites
+    return {i: tuple(prerequisites[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)}
+
+
+def _batches(parts, count):
+    # Longest processing time first: each part, largest first, goes to the smallest batch
+    batches = [[] for _ in range(min(count, len(parts)))]
+    sizes = [0] * len(batches)
+    for part in parts:
+        i = sizes.index(min(sizes))
+        batches[i].append(part)
+        sizes[i] += len(part.offsets) + len(part.prerequisites)
+    return batches
+
+
+def _map(function, parts, workers):
+    # Results of function on each part, in the order of parts
+    if workers is None or workers <= 1 or len(parts) < 2:
+        return [function(part) for part in parts]
+
+    # Several batches per worker, so that one slow batch does not hold the others back
+    batches = _batches(parts, workers * 4)
+    # Spawned rather than forked: the shell and servers may be running other threads
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as executor:
+        results = executor.map(_run_batch, [function] * len(batches), batches)
+        by_part = {}
+        for batch, batch_results in zip(batches, results):
+            for part, result in zip(batch, batch_results):
+                by_part[id(part)] = result
+    return [by_part[id(part)] for part in parts]
+
+
+def _run_batch(function, parts):
+    return [function(part) for part in parts]
+
+
+def _analyze_part(part):
+    cycles, invalid = _analyze_graph(_graph(part), part.targets)
+    return [tuple(cycle) for cycle in cycles], sorted(invalid)
+
+
+def _order_part(part):
+    # The order, or the members of a cycle
+    try:
+        return list(TopologicalSorter(_graph(part)).static_order()), None
+    except CycleError as e:
+        return None, e.args[1]
+
+
+def _gantt_part(part):
+    # (position, column) of each row, as in visualize._gantt_rows
+    graph = _graph(part)
+    end = {}
+    rows = []
+    for i in TopologicalSorter(graph).static_order():
+        column = max([0] + [end[pre] for pre in graph[i]])
+        end[i] = column + 1
+        rows.append((i, column))
+    return rows
+
+
+def _serial(workers, components):
+    # A single process gains nothing from splitting the model
+    return (workers is None or workers <= 1) or (components is not None and len(components) < 2)
+
+
+def analyze_components(dag_model, components=None, workers=None):
+    """analyze_DAG run on each component, in `workers` processes.
+
+    Workers only get each component's dependencies and target dates, and the products are
+    matched back in this process.
+
+    Args:
+        dag_model (DAGModel): the model to analyze.
+        components (Components, optional): the model's components, if already followed.
+        workers (int, optional): number of worker processes; in this process if None.
+
+    Returns:
+        Analysis: the cycles and invalid dates of all components.
+    """
+    if _serial(workers, components):
+        return analyze_DAG(dag_model)
+
+    parts = _parts(dag_model, components, targets=True)
+    nodes = dag_model._nodes
+    cycles, invalid_dates = [], []
+    for (group, _), (part_cycles, part_dates) in zip(parts, _map(_analyze_part, [part for _, part in parts], workers)):
+        for products, witness, break_edges in part_cycles:
+            cycles.append(Cycle([nodes[group[i]] for i in products],
+                                [nodes[group[i]] for i in witness],
+                                [(nodes[group[i]], nodes[group[pre]]) for i, pre in break_edges]))
+        invalid_dates.extend(nodes[group[i]] for i in part_dates)
+    return Analysis(cycles, invalid_dates)
+
+
+def order_components(dag_model, components=None, workers=None):
+    """Topological order of the model, sorted one component per task in `workers` processes.
+
+    Returns:
+        tuple: the products, each after its prerequisites.
+
+    Raises:
+        CycleError: if the model has a cycle.
+    """
+    if _serial(workers, components):
+        return dag_model.order
+
+    parts = _parts(dag_model, components)
+    nodes = dag_model._nodes
+    order = []
+    for (group, _), (part_order, cycle) in zip(parts, _map(_order_part, [part for _, part in parts], workers)):
+        if cycle is not None:
+            raise CycleError("nodes are in a cycle",
+                             [f"{nodes[group[i]].name} ({str(group[i])[-8:]})" for i in cycle])
+        order.extend(nodes[group[i]] for i in part_order)
+    return tuple(order)
+
+
+def gantt_components(dag_model, ax=None, progress=None, components=None, workers=None):
+    """Gantt chart of the model, one component after the other. The rows of each component
+    are laid out in `workers` processes; they are drawn in this one, on a single Axes.
+
+    Args:
+        dag_model (DAGModel): the model to draw.
+        ax (Axes, optional): where to draw, a new figure by default.
+        progress (callable, optional): returns the rollup.Progress of a product.
+        components (Components, optional): the model's components, if already followed.
+        workers (int, optional): number of worker processes; in this process if None.
+    """
+    # Imported here so that workers, which import this module, do not load matplotlib
+    from src.visualize import _draw_gantt
+
+    parts = _parts(dag_model, components)
+    nodes = dag_model._nodes
+    rows = [(nodes[group[i]], column)
+            for (group, _), part_rows in zip(parts, _map(_gantt_part, [part for _, part in parts], workers))
+            for i, column in part_rows]
+    return _draw_gantt(rows, ax, progress)
@@ -0,0 +1,130 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Many-readers/one-writer lock, preferring writers so that edits are not starved.
+
+    Both sides are reentrant for the thread holding them, and a thread holding the write
+    lock may also read; if it releases the write lock first, it keeps reading as an ordinary
+    reader. Upgrading a read lock to a write lock is not supported (two readers upgrading
+    would wait for each other forever), so a thread holding only a read lock cannot edit:
+    see DAGModel.make_concurrent.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    def _read_depth(self):
+        return getattr(self._local, "depth", 0)
+
+    def _counted(self):
+        # Whether this thread's reads are counted in _readers; they are not while it reads
+        # under its own write lock
+        return getattr(self._local, "counted", False)
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        depth = self._read_depth()
+        if self._writer == me or depth > 0:
+            self._local.depth = depth + 1
+            return
+
+        with self._condition:
+            while self._writer is not None or self._writers_waiting > 0:
+                self._condition.wait()
+            self._readers += 1
+        self._local.depth = 1
+        self._local.counted = True
+
+    def release_read(self):
+        depth = self._read_depth() - 1
+        self._local.depth = depth
+        if depth > 0 or not self._counted():
+            return
+
+        self._local.counted = False
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writer_depth += 1
+            return
+        if self._read_depth() > 0:
+            raise RuntimeError("Cannot acquire write lock while holding a read lock; edits, "
+                               "including setting product fields, are not allowed while reading.")
+
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers > 0:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        self._writer_depth -= 1
+        if self._writer_depth > 0:
+            return
+
+        with self._condition:
+            self._writer = None
+            if self._read_depth() > 0:
+                # Still reading: from now on as a counted reader, so writers wait for it
+                self._readers += 1
+                self._local.counted = True
+            self._condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+_executor = None
+
+
+def run_on_snapshot(function, dag_model, *args, executor=None, **kwargs):
+    """Runs a long read-only task on a snapshot of the model in a worker thread.
+
+    The model can keep being edited while the task runs; the task sees the model as it
+    was when this was called.
+
+    Args:
+        function (callable): called as function(snapshot, *args, **kwargs), e.g. validate_DAG.
+        dag_model (DAGModel): the model to snapshot.
+        executor (Executor, optional): where to run the task, a shared thread pool by default.
+
+    Returns:
+        Future: the task's result.
+    """
+    global _executor
+    if executor is None:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(thread_name_prefix="labdag-reader")
+        executor = _executor
+
+    snapshot = dag_model.snapshot()
+    return executor.submit(function, snapshot, *args, **kwargs)
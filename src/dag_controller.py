@@ -4,8 +4,18 @@ import matplotlib.pyplot as plt
 from shlex import split, quote
 from datetime import datetime
 from src.dag_model import DAGModel, Product, Status
-from src.visualize import gantt
-from src.validate import validate_DAG
+from src.visualize import gantt, InteractiveGantt
+from src.validate import analyze_DAG, LiveValidator
+from src.resources import ResourceChecker, ResourceIndex, check_resources
+from src.server import DAGClient, RemoteDAGModel, DEFAULT_ADDRESS
+from src.history import History
+from src.query import ProductColumns
+from src.rollup import ProgressRollUp
+from src.layout import GraphLayout
+from src.plan_file import load_plan, load_cone, write_plan, PLAN_EXTENSION, ANCESTORS, DESCENDANTS, BOTH
+from src.watch import PlanWatcher
+from src.components import Components, analyze_components
+from src.archive import archive_done, rehydrate, restore
 
 def select_match(options, prompt=None, return_index=False):
     if prompt is not None:
@@ -73,13 +83,80 @@ class LabManagementShell(cmd.Cmd):
     def __init__(self):
         super().__init__()
         self.dag_model = DAGModel()
+        self.resource_checker = ResourceChecker()
+        self.history = None
+        self.columns = None
+        self.rollup = None
+        self.live = None
+        self.layout = None
+        self.gantt_view = None
+        self.watcher = None
+        self.resource_index = None
+        self.components = None
+
+
+    def _indexes(self):
+        # Columns and roll-ups of the current model, rebuilt when the model is replaced
+        if self.columns is None or self.columns.dag_model is not self.dag_model:
+            if self.columns is not None:
+                self.rollup.close()
+                self.columns.close()
+            self.columns = ProductColumns(self.dag_model)
+            self.rollup = ProgressRollUp(self.columns)
+        return self.columns, self.rollup
+
+
+    def _resources(self):
+        # Resource -> products index of the current model, rebuilt when the model is replaced
+        if not isinstance(self.dag_model, DAGModel):
+            return None
+        if self.resource_index is None or self.resource_index.dag_model is not self.dag_model:
+            if self.resource_index is not None:
+                self.resource_index.close()
+            self.resource_index = ResourceIndex(self.dag_model)
+        return self.resource_index
+
+
+    def _components(self):
+        # Independent parts of the current model, rebuilt when the model is replaced
+        if not isinstance(self.dag_model, DAGModel):
+            return None
+        if self.components is None or self.components.dag_model is not self.dag_model:
+            if self.components is not None:
+                self.components.close()
+            self.components = Components(self.dag_model)
+        return self.components
 
 
     def do_load(self, arg):
-        'Load a DAG model from an XML file: load <file>'
+        """Load a DAG model from an XML or indexed plan (.ldag) file.
+        Usage:
+            load <file>
+
+            Load part of a .ldag plan: load --cone <product> [--descendants | --both] <file>
+                Loads the product and its prerequisites (or its successors, or both);
+                other products are read from the file when first needed.
+        """
         try:
-            self.dag_model = DAGModel.from_xml(arg)
-            print(f"DAG model loaded from {arg}")
+            args = split(arg)
+            filepath = args[-1]
+
+            if "--cone" in args:
+                product = args[args.index("--cone") + 1]
+                direction = ANCESTORS
+                if "--descendants" in args:
+                    direction = DESCENDANTS
+                elif "--both" in args:
+                    direction = BOTH
+                self.dag_model = load_cone(filepath, product, direction)
+                print(f"Loaded {len(self.dag_model.products)} products around {product} from {filepath}")
+                return
+
+            if filepath.endswith(PLAN_EXTENSION):
+                self.dag_model = load_plan(filepath)
+            else:
+                self.dag_model = DAGModel.from_xml(filepath)
+            print(f"DAG model loaded from {filepath}")
         except Exception as e:
             print(f"Error loading file: {e}")
 
@@ -87,14 +164,25 @@ class LabManagementShell(cmd.Cmd):
     def do_show(self, arg):
         'Show the current DAG, or (if given) details of a product: show [product]'
         try:
+            local = isinstance(self.dag_model, DAGModel)
             if len(arg) == 0:
                 print(self.dag_model)
+                if local:
+                    _, rollup = self._indexes()
+                    print("Progress:")
+                    for endpoint in rollup.endpoints:
+                        print(f"\t{endpoint}: {rollup.progress(endpoint)}")
             else:
                 product = select_product(self.dag_model, arg, create_missing=False)
+                if local:
+                    # Showing a stub brings back its archived prerequisites
+                    rehydrate(self.dag_model, product)
                 print()
                 print(product)
                 print(f"Created: {product._created}")
                 print(f"Target: {product.target}")
+                if local:
+                    print(f"Progress: {self._indexes()[1].progress(product)}")
 
                 print(f"\n{product.description}\n")
 
@@ -234,6 +322,11 @@ class LabManagementShell(cmd.Cmd):
             
             Open a resource: resource open <product>
                 -w : When running in WSL, open using windows application
+
+            List the products using a resource: resource users <value>
+
+            Check that resources exist: resource check [product]
+                -t <seconds> : Give up on checks still running after this long
         """
 
         try:
@@ -248,7 +341,7 @@ class LabManagementShell(cmd.Cmd):
                     print("\n".join(f"\t{i+1}. {res}" for i, res in enumerate(product.resources)))
                 case "add":
                     product = select_product(self.dag_model, subargs[0], create_missing=False)
-                    product.resources.extend(subargs[1:])
+                    product.resources = [*product.resources, *subargs[1:]]
                 case "remove":
                     product = select_product(self.dag_model, subargs[0], create_missing=False)
 
@@ -260,7 +353,7 @@ class LabManagementShell(cmd.Cmd):
                             product.resources = []
                         case _:
                             i, removed = select_match(product.resources, "Remove which resource?", return_index=True)
-                            product.resources.pop(i)
+                            product.resources = product.resources[:i] + product.resources[i + 1:]
                     
                     print(f"Removed {removed} from {product}.")
                         
@@ -282,6 +375,36 @@ class LabManagementShell(cmd.Cmd):
                         pass
                     else:
                         webbrowser.open(quote(resource))
+                case "users":
+                    index = self._resources()
+                    if index is not None:
+                        users = index.products_using(subargs[0])
+                    else:
+                        users = [p for p in self.dag_model.products if subargs[0] in p.resources]
+                    print(f"{len(users)} products use {subargs[0]}:")
+                    for product in users:
+                        print(f"\t{product}")
+                case "check":
+                    budget = None
+                    if "-t" in subargs:
+                        i = subargs.index("-t")
+                        budget = float(subargs[i + 1])
+                        subargs = subargs[:i] + subargs[i + 2:]
+
+                    product = None
+                    if len(subargs) > 0:
+                        product = select_product(self.dag_model, subargs[0], create_missing=False)
+
+                    counts = {True: 0, False: 0, None: 0}
+                    for result, users in check_resources(self.dag_model, product,
+                                                         self.resource_checker, budget,
+                                                         self._resources()):
+                        counts[result.ok] += 1
+                        if not result.ok:
+                            symbol = "✗" if result.ok is False else "?"
+                            print(f"\t{symbol} {result.resource} ({result.detail}), used by: "
+                                  f"{', '.join(p.name for p in users)}")
+                    print(f"{counts[True]} ok, {counts[False]} broken, {counts[None]} unknown.")
                 case _:
                     raise Exception(f"Unrecognized subcommand `{subcommand}`.")
         except Exception as e:
@@ -316,15 +439,25 @@ class LabManagementShell(cmd.Cmd):
 
 
     def do_validate(self, arg):
-        'Validate the current DAG model, reporting any cycle or date inconsistencies'
+        """Validate the current DAG model, reporting every cycle and any date inconsistencies.
+        Usage: validate [--workers <n>]
+            --workers: check independent parts of the DAG in n processes
+        """
         try:
-            valid, cycle, dates = validate_DAG(self.dag_model)
-            if valid:
+            args = split(arg)
+            if "--workers" in args and self._components() is not None:
+                workers = int(args[args.index("--workers") + 1])
+                cycles, dates = analyze_components(self.dag_model, self._components(), workers)
+            else:
+                cycles, dates = analyze_DAG(self.dag_model)
+            if len(cycles) == 0 and len(dates) == 0:
                 print("No problems found.")
             else:
                 print("Issues found in DAG!")
-                if cycle is not None:
-                    print(f"Cycle: {' -> '.join(cycle)}")
+                for cycle in cycles:
+                    print(f"Cycle between {len(cycle.products)} products: {' -> '.join(str(prod) for prod in cycle.witness)}")
+                    for product, prerequisite in cycle.break_edges:
+                        print(f"\tbreak with: free {product.name} {prerequisite.name}")
                 if len(dates) > 0:
                     sep = "\n\t"
                     print(f"Products with target dates before targets of some predecessor:\n\t{sep.join([str(prod) for prod in dates])}")
@@ -332,30 +465,257 @@ class LabManagementShell(cmd.Cmd):
             print(f"Error validating DAG: {e}")
 
     
+    def do_archive(self, arg):
+        """Move finished work to an archive plan file, leaving stubs for products still needed.
+        Usage: archive <file.ldag>
+            Archives done products whose prerequisites are archived and whose successors are done.
+            Stubs count as products without prerequisites until shown (`show <stub>`) or restored
+            (`restore <product>` brings back a whole cone).
+        """
+        try:
+            if not isinstance(self.dag_model, DAGModel):
+                raise ValueError("Archiving needs a local DAG model.")
+            count = archive_done(self.dag_model, arg.strip())
+            print(f"Archived {count} products to {arg.strip()}")
+        except Exception as e:
+            print(f"Error archiving: {e}")
+
+
+    def do_restore(self, arg):
+        'Bring a product and its prerequisites back from the archive: restore <product>'
+        try:
+            product = select_product(self.dag_model, arg, create_missing=False)
+            count = restore(self.dag_model, product)
+            print(f"Restored {count} products")
+        except Exception as e:
+            print(f"Error restoring {arg}: {e}")
+
+
+    def do_find(self, arg):
+        """Find products matching a filter.
+        Usage:
+            find <term> [<term> ...] [or <term> ...]
+
+            Terms (prefix with `not` to negate):
+                status=<status>, status!=<status>
+                target<date, target<=date, target>date, target>=date, target=date, target=none
+                    (dates as month/day/year, year-month-day, today, +14d or -2w; also for created)
+                name=<name>, name~<text>
+                upstream=<product>, downstream=<product>
+
+            Example: find status=to_do target<=+14d upstream="Final construct"
+        """
+        try:
+            columns, _ = self._indexes()
+            matches = columns.find(arg)
+            for product in matches:
+                print(f"\t{product}")
+            print(f"{len(matches)} products found.")
+        except Exception as e:
+            print(f"Error finding products: {e}")
+
+
+    def do_live(self, arg):
+        """Check the DAG after every command and warn about new cycles and date inconsistencies.
+        Usage: live [on | off]
+        """
+        try:
+            arg = arg.strip().lower()
+            if arg in ("", "on"):
+                if not isinstance(self.dag_model, DAGModel):
+                    raise ValueError("Live validation needs a local DAG model.")
+                if self.live is None:
+                    self.live = LiveValidator(self.dag_model)
+                print("Live validation is on.")
+            elif arg == "off":
+                if self.live is not None:
+                    self.live.close()
+                    self.live = None
+                print("Live validation is off.")
+            else:
+                raise ValueError(f"Expected on or off, got {arg}.")
+        except Exception as e:
+            print(f"Error setting live validation: {e}")
+
+
+    def _warn_live(self):
+        if self.live.dag_model is not self.dag_model:
+            # A new model was loaded: follow it instead
+            self.live.close()
+            if not isinstance(self.dag_model, DAGModel):
+                self.live = None
+                return
+            self.live = LiveValidator(self.dag_model)
+
+        cycles, dates = self.live.drain()
+        for cycle in cycles:
+            print(f"Warning: cycle {' -> '.join(str(prod) for prod in cycle)}")
+        for product in dates:
+            print(f"Warning: target date of {product} is before that of some prerequisite")
+        if cycles or dates:
+            print(f"{len(self.live.cycles)} cycles and {len(self.live.invalid_dates)} date problems in DAG.")
+
+
     def do_gantt(self, arg):
-        'Visualize the current DAG model as a Gantt chart: gantt'
+        'Visualize the current DAG model as a Gantt chart that stays open and follows later commands: gantt'
         try:
-            gantt(dag_model=self.dag_model)
-            plt.show()
+            if not isinstance(self.dag_model, DAGModel):
+                gantt(dag_model=self.dag_model)
+                plt.show()
+                return
+
+            if self.gantt_view is not None:
+                self.gantt_view.close()
+            _, rollup = self._indexes()
+            self.gantt_view = InteractiveGantt(self.dag_model, progress=rollup.progress,
+                                               downstream=rollup.downstream)
+            self.gantt_view.show()
         except Exception as e:
             print(f"Error visualizing DAG: {e}")
 
 
+    def do_graph(self, arg):
+        'Export a layered diagram of the current DAG model to an SVG or DOT file: graph <file.svg | file.dot>'
+        try:
+            if not arg.endswith((".svg", ".dot")):
+                raise ValueError("Expected a .svg or .dot file.")
+            if self.layout is None or self.layout.dag_model is not self.dag_model:
+                if self.layout is not None:
+                    self.layout.close()
+                self.layout = GraphLayout(self.dag_model)
+
+            if arg.endswith(".svg"):
+                self.layout.to_svg(arg)
+            else:
+                self.layout.to_dot(arg)
+            print(f"Diagram saved to {arg}")
+        except Exception as e:
+            print(f"Error exporting diagram: {e}")
+
+
     def do_save(self, arg):
-        'Save the current DAG model to an XML file: save <file>'
+        'Save the current DAG model to an XML or indexed plan (.ldag) file: save <file>'
         try:
-            self.dag_model.to_xml(arg)
+            if arg.endswith(PLAN_EXTENSION):
+                write_plan(self.dag_model, arg)
+            else:
+                self.dag_model.to_xml(arg)
             print(f"DAG model saved to {arg}")
         except Exception as e:
             print(f"Error saving file: {e}")
 
 
+    def do_watch(self, arg):
+        """Follow a plan file edited by other programs: its changes are applied before each command.
+        Usage:
+            watch <file>    apply the file now, then whenever it changes
+            watch off
+        """
+        try:
+            arg = arg.strip()
+            if self.watcher is not None:
+                self.watcher.close()
+                self.watcher = None
+            if arg in ("", "off"):
+                print("Not watching any file.")
+                return
+
+            if not isinstance(self.dag_model, DAGModel) or self.dag_model._loader is not None:
+                raise ValueError("Watching needs a fully loaded local DAG model.")
+            self.watcher = PlanWatcher(arg)
+            changes = self.watcher.poll(self.dag_model)
+            print(f"Watching {arg}" + (f": {changes}" if changes is not None else ""))
+        except Exception as e:
+            print(f"Error watching file: {e}")
+
+
+    def _reload_watched(self):
+        # Applies the watched file's changes as a step of history of their own
+        if not isinstance(self.dag_model, DAGModel) or self.dag_model._loader is not None:
+            return
+        recording = self.history is not None and self.history.dag_model is self.dag_model
+        if recording:
+            self.history.begin(f"reload {self.watcher.filepath}")
+        try:
+            changes = self.watcher.poll(self.dag_model)
+        finally:
+            if recording:
+                self.history.commit()
+        if changes is not None and not changes.empty:
+            print(f"Reloaded {self.watcher.filepath}: {changes}")
+
+
+    def do_connect(self, arg):
+        'Work on a DAG model held by a LabDAG server (python -m src.server): connect [unix:<path> | [host:]port]'
+        try:
+            address = arg.strip() or DEFAULT_ADDRESS
+            self.dag_model = RemoteDAGModel(DAGClient(address))
+            print(f"Connected to {address}")
+        except Exception as e:
+            print(f"Error connecting to server: {e}")
+
+
+    def do_undo(self, arg):
+        'Undo the last command that changed the DAG: undo'
+        label = self.history.undo() if self.history is not None else None
+        if label is None:
+            print("Nothing to undo.")
+        else:
+            print(f"Undid `{label}`.")
+
+
+    def do_redo(self, arg):
+        'Redo the last undone command: redo'
+        label = self.history.redo() if self.history is not None else None
+        if label is None:
+            print("Nothing to redo.")
+        else:
+            print(f"Redid `{label}`.")
+
+
     def do_exit(self, _):
         'Exit the shell'
         print("Goodbye!")
         return True
 
+    def onecmd(self, line):
+        # Record every command except undo/redo themselves as one step of history
+        command = self.parseline(line)[0]
+        if command in {"undo", "redo"} or type(self.dag_model) is not DAGModel:
+            return super().onecmd(line)
+
+        if self.history is None or self.history.dag_model is not self.dag_model:
+            self.history = History(self.dag_model)
+        self.history.begin(line)
+        try:
+            return super().onecmd(line)
+        finally:
+            if self.history.dag_model is self.dag_model:
+                self.history.commit()
+
+    def precmd(self, line):
+        if self.watcher is not None:
+            try:
+                self._reload_watched()
+            except Exception as e:
+                print(f"Error reloading {self.watcher.filepath}: {e}")
+        return super().precmd(line)
+
     def postcmd(self, stop: bool, line: str) -> bool:
+        if isinstance(self.dag_model, RemoteDAGModel):
+            try:
+                self.dag_model.flush()
+            except Exception as e:
+                print(f"Error sending changes to server: {e}")
+        if self.live is not None:
+            self._warn_live()
+        if self.gantt_view is not None:
+            if self.gantt_view.closed or self.gantt_view.dag_model is not self.dag_model:
+                self.gantt_view.close()
+                self.gantt_view = None
+            else:
+                self.gantt_view.flush()
+                self.gantt_view.ax.figure.canvas.flush_events()
         print()
         return super().postcmd(stop, line)
 
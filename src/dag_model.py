@@ -1,11 +1,24 @@
+import copy
+import functools
+import sys
+import threading
 import uuid
+import weakref
 import xml.etree.ElementTree as ET
 
+from collections.abc import Mapping
+from contextlib import nullcontext
 from datetime import datetime
 from enum import Enum
 from graphlib import TopologicalSorter, CycleError
 from warnings import warn
 
+from src.concurrency import ReadWriteLock
+from src.persistent import PersistentDict
+
+
+# Held while bringing back the prerequisites of stubs, see DAGModel._unstub
+_unstub_lock = threading.RLock()
 
 class Status(Enum):
     TO_DO, IN_PROGRESS, DONE = range(3)
@@ -28,6 +41,12 @@ class Status(Enum):
 
 
 class Product():
+    # Fields whose changes are reported to the DAGModels holding the product
+    FIELDS = ("name", "status", "target", "notes", "resources", "description")
+    # Text fields whose strings are interned, so that products repeating the same text (and
+    # resources) share one copy of it
+    INTERNED = ("name", "notes", "description")
+
     def __init__(self, name="", status=None, target=None, notes=None, resources=None, description=None):
         self._uuid = uuid.uuid4()
         self._created = datetime.now().replace(microsecond=0)
@@ -38,6 +57,33 @@ class Product():
         self.resources = resources if resources is not None else []
         self.description = description if description is not None else ""
 
+    def __setattr__(self, name, value):
+        if name in Product.INTERNED and type(value) is str:
+            value = sys.intern(value)
+        elif name == "resources" and isinstance(value, list):
+            value = [sys.intern(r) if type(r) is str else r for r in value]
+
+        owners = self.__dict__.get("_owners")
+        if not owners or name not in Product.FIELDS:
+            return super().__setattr__(name, value)
+
+        old = self.__dict__.get(name)
+        if old is value:
+            return
+        dag_models = [ref() for ref in list(owners.values())]
+        dag_models = [m for m in dag_models if m is not None]
+        for dag_model in dag_models:
+            dag_model._product_changing(self, name, old, value)
+        super().__setattr__(name, value)
+        for dag_model in dag_models:
+            dag_model._notify("product_changed", self, name, old, value)
+
+    def __getstate__(self):
+        # Copies and pickles do not belong to the models of the original
+        state = self.__dict__.copy()
+        state.pop("_owners", None)
+        return state
+
     def __eq__(self, __value: object) -> bool:
         return (self._uuid == __value._uuid
                 and self._created == __value._created
@@ -48,28 +94,291 @@ class Product():
                 and self.resources == __value.resources
                 and self.description == __value.description)
 
+    def to_dict(self):
+        """JSON-serializable representation of the product (without its prerequisites).
+        """
+        return {
+            "uuid": str(self._uuid),
+            "created": self._created.isoformat(),
+            "name": self.name,
+            "status": self.status.value,
+            "target": self.target.isoformat() if self.target is not None else None,
+            "notes": self.notes,
+            "resources": list(self.resources),
+            "description": self.description,
+        }
+
+    @staticmethod
+    def from_dict(data):
+        """Inverse of `to_dict`. Missing fields get the same defaults as in the constructor.
+        """
+        target = data.get("target")
+        product = Product(data.get("name", ""),
+                          status=Status(data.get("status", 0)),
+                          target=datetime.fromisoformat(target) if target is not None else None,
+                          notes=data.get("notes"),
+                          resources=list(data.get("resources", [])),
+                          description=data.get("description"))
+        if "uuid" in data:
+            product._uuid = uuid.UUID(data["uuid"])
+        if "created" in data:
+            product._created = datetime.fromisoformat(data["created"])
+        return product
+
     def __repr__(self) -> str:
         target_date_str = f" [{self.target.strftime(
             '%d/%m/%Y')}]" if self.target is not None else ""
         return f"({str(self._uuid)[-8:]}) {self.name}{target_date_str} {self.status.to_symbol()}"
 
 
+class DAGObserver:
+    """Base class for objects kept in sync with a DAGModel, see `DAGModel.subscribe`.
+
+    Each method is called after the change has been applied to the model. Products loaded
+    on demand rather than added (see plan_file.load_cone and archive.rehydrate) are reported
+    as added too, while the model's `_loading` is set.
+    """
+
+    def product_added(self, dag_model, product):
+        pass
+
+    def product_removed(self, dag_model, product):
+        pass
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        pass
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        pass
+
+    def product_changed(self, dag_model, product, name, old, new):
+        pass
+
+
+def _reads(method):
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        if self._lock is None:
+            return method(self, *args, **kwargs)
+        with self._lock.read():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def _writes(method):
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        if self._lock is None:
+            return method(self, *args, **kwargs)
+        with self._lock.write():
+            return method(self, *args, **kwargs)
+    return locked
+
+
 class DAGModel:
-    def __init__(self):
+    def __init__(self, concurrent=False):
         self._nodes = {}
         self._graph = {}
-        self._sorter = TopologicalSorter()
+        self._lock = None
+        self._snapshots = []
+        self._observers = []
+        # Source of products that are referenced but not loaded yet, see plan_file.load_cone
+        self._loader = None
+        # Archive file of each stub: a product whose prerequisites were archived, see
+        # archive.archive_done
+        self._stubs = {}
+        # Set while reporting products loaded by _fault or _unstub, which are not edits
+        self._loading = False
+
+        if concurrent:
+            self.make_concurrent()
+
+    def make_persistent(self):
+        """Stores the node, graph and stub maps as persistent maps.
+
+        Their current state can then be saved in O(1) (see `snapshot` and `History`) and
+        each edit costs O(log N) time and memory on top of it. Single lookups and edits get
+        a few times slower in exchange.
+        """
+        if not self.persistent:
+            self._nodes = PersistentDict(self._nodes)
+            self._graph = PersistentDict(self._graph)
+            self._stubs = PersistentDict(self._stubs)
 
-    def add_product(self, product, *prerequisites):
-        self._nodes[product._uuid] = product
-        self._graph[product._uuid] = {pre._uuid for pre in prerequisites}
-        self._sorter.add(product._uuid, *[pre._uuid for pre in prerequisites])
+    def make_concurrent(self):
+        """Switches the model to concurrency mode.
 
+        Every operation then takes a readers-writer lock, so the model can be shared between
+        threads. Implies `make_persistent`, so snapshots for readers are O(1).
+
+        Edits need the write lock, which cannot be taken by a thread holding the read lock:
+        editing the model, or setting a field of one of its products while snapshots of it
+        are alive, raises RuntimeError inside `with dag_model._lock.read()`. Read what is
+        needed first, or hold the write lock throughout.
+        """
+        if self._lock is None:
+            self.make_persistent()
+            self._lock = ReadWriteLock()
+
+    @property
+    def persistent(self):
+        return isinstance(self._nodes, PersistentDict)
+
+    @property
+    def concurrent(self):
+        return self._lock is not None
+
+    def subscribe(self, observer):
+        """Registers a DAGObserver to be told about every later change to the model.
+        """
+        self._observers.append(observer)
+
+    def unsubscribe(self, observer):
+        self._observers.remove(observer)
+
+    def _notify(self, event, *args):
+        for observer in self._observers:
+            getattr(observer, event)(self, *args)
+
+    def _own(self, product):
+        owners = product.__dict__.setdefault("_owners", {})
+        key = id(self)
+        if key not in owners:
+            owners[key] = weakref.ref(self, lambda _, owners=owners, key=key: owners.pop(key, None))
+
+    def _disown(self, product):
+        product.__dict__.get("_owners", {}).pop(id(self), None)
+
+    def _product_changing(self, product, name, old, new):
+        """Called by a product of this model just before one of its FIELDS changes.
+        """
+        if not self._snapshots:
+            return
+
+        with self._lock.write() if self._lock is not None else nullcontext():
+            live = []
+            for ref in self._snapshots:
+                nodes = ref()
+                if nodes is not None:
+                    nodes._preserve(product, name, old)
+                    live.append(ref)
+            self._snapshots = live
+
+    def _node(self, id):
+        try:
+            return self._nodes[id]
+        except KeyError:
+            if self._loader is None:
+                raise
+            return self._fault(id)
+
+    def _fault(self, id):
+        # Loading a product is not an edit, so this is allowed while holding a read lock; the
+        # loader's own lock keeps concurrent faults from losing each other's updates.
+        with self._loader.lock:
+            if id in self._nodes:
+                return self._nodes[id]
+
+            product, prereqs, archive = self._loader.load(id)
+            self._nodes[id] = product
+            self._graph[id] = prereqs
+            self._own(product)
+            if archive is not None:
+                self._stubs[id] = archive
+
+            loading, self._loading = self._loading, True
+            try:
+                self._notify("product_added", product)
+                if prereqs:
+                    self._notify("dependencies_added", product, prereqs)
+            finally:
+                self._loading = loading
+            return product
+
+    def _unstub(self, id):
+        """Brings back the prerequisites of a stub from its archive, the ones that are
+        missing from the model as stubs themselves. Like _fault, this loads rather than
+        edits, so it is allowed while holding a read lock.
+
+        Returns:
+            bool: False if the product is not a stub.
+
+        Raises:
+            KeyError: if the product is not in its archive.
+        """
+        # plan_file imports this module
+        from src.plan_file import PlanFile
+
+        with _unstub_lock:
+            archive = self._stubs.get(id)
+            if archive is None:
+                return False
+
+            plan = PlanFile(archive)
+            loading, self._loading = self._loading, True
+            try:
+                position = plan.find(id)
+                if position < 0:
+                    raise KeyError(f"{self._nodes[id].name} is not in {archive}.")
+                prereqs = []
+                for pre_position in plan.prerequisites(position):
+                    pre = plan.uuid_at(pre_position)
+                    if pre not in self._nodes:
+                        product = plan.read_product(pre_position)
+                        self._nodes[pre] = product
+                        self._graph[pre] = frozenset()
+                        self._own(product)
+                        self._stubs[pre] = archive
+                        self._notify("product_added", product)
+                    prereqs.append(pre)
+                del self._stubs[id]
+                added = frozenset(prereqs) - self._graph[id]
+                if added:
+                    self._graph[id] = self._graph[id] | added
+                    self._notify("dependencies_added", self._nodes[id], added)
+            finally:
+                self._loading = loading
+                plan.close()
+            return True
+
+    def _load_prerequisites(self):
+        # Faults in every product that a loaded product depends on, directly or not, so that
+        # the graph is closed under prerequisites. Stubs stay leaves: their archived
+        # prerequisites only come back through _unstub.
+        if self._loader is None:
+            return
+        queue = [pre for prereqs in list(self._graph.values()) for pre in prereqs
+                 if pre not in self._graph]
+        while queue:
+            id = queue.pop()
+            if id in self._graph:
+                continue
+            self._node(id)
+            queue.extend(pre for pre in self._graph[id] if pre not in self._graph)
+
+    @_writes
+    def add_product(self, product, *prerequisites):
         # Recursively add prerequisites if they are not already in the DAG
         for pre in prerequisites:
             if pre._uuid not in self._nodes:
                 self.add_product(pre)
 
+        new = product._uuid not in self._nodes
+        old_prereqs = frozenset() if new else self._graph[product._uuid]
+        prereqs = frozenset(pre._uuid for pre in prerequisites)
+
+        self._nodes[product._uuid] = product
+        self._graph[product._uuid] = prereqs
+        self._own(product)
+
+        if new:
+            self._notify("product_added", product)
+        if old_prereqs - prereqs:
+            self._notify("dependencies_removed", product, old_prereqs - prereqs)
+        if prereqs - old_prereqs:
+            self._notify("dependencies_added", product, prereqs - old_prereqs)
+
+    @_writes
     def add_dependency(self, product, *prerequisites):
         if product._uuid in self._nodes:
             existing_prereqs = self.get_prerequisites(product)
@@ -77,32 +386,72 @@ class DAGModel:
 
         self.add_product(product, *prerequisites)
 
+    @_writes
     def remove_product(self, product):
-        # remove from nodes
-        del self._nodes[product._uuid]
-
-        # remove from graph
-        del self._graph[product._uuid]
-
-        for product_id, product in self._nodes.items():
-            if product._uuid in self._graph[product_id]:
-                self._graph[product_id].remove(product._uuid)
-
-        # re-create sorter
-        self._sorter = TopologicalSorter(self._graph)
+        self._remove([product])
 
+    @_writes
+    def remove_products(self, *products):
+        """Removes several products in a single pass over the graph, O(N + E) in all rather
+        than O(N) for each product as with `remove_product`.
+        """
+        self._remove(products)
+
+    def _remove(self, products):
+        ids = {product._uuid for product in products}
+
+        # remove edges from successors
+        for product_id, prereqs in list(self._graph.items()):
+            removed = prereqs & ids
+            if removed and product_id not in ids:
+                self._graph[product_id] = prereqs - removed
+                self._notify("dependencies_removed", self._nodes[product_id], removed)
+
+        # remove own edges
+        for product in products:
+            prereqs = self._graph[product._uuid]
+            self._graph[product._uuid] = frozenset()
+            if prereqs:
+                self._notify("dependencies_removed", product, prereqs)
+
+        # remove from nodes and graph
+        for product in products:
+            del self._nodes[product._uuid]
+            del self._graph[product._uuid]
+            self._stubs.pop(product._uuid, None)
+
+            self._disown(product)
+            self._notify("product_removed", product)
+
+    @_writes
     def remove_dependencies(self, product, *prerequisites):
         # remove dependencies from graph
         prereqs_to_remove = {pre._uuid for pre in prerequisites}
-        self._graph[product._uuid] -= prereqs_to_remove
+        removed = self._graph[product._uuid] & prereqs_to_remove
+        self._graph[product._uuid] = self._graph[product._uuid] - prereqs_to_remove
 
-        # re-create sorter
-        self._sorter = TopologicalSorter(self._graph)
+        if removed:
+            self._notify("dependencies_removed", product, removed)
 
+    @_writes
+    def stub(self, product, archive):
+        """Makes a product a stub: its prerequisites are dropped from the model, and are
+        brought back from the archive plan file (see archive.archive_done) by
+        archive.rehydrate. Until then the stub is a leaf.
+        """
+        self.remove_dependencies(product, *[self._nodes[pre] for pre in self._graph[product._uuid]])
+        self._stubs[product._uuid] = archive
+
+    @_reads
     def get_product_by_uuid(self, uuid):
         return self._nodes[uuid]
 
+    @_reads
     def get_products_by_name(self, product_name):
+        if self._loader is not None:
+            for id in self._loader.ids_named(product_name):
+                self._node(id)
+
         result = []
         for product in self._nodes.values():
             if product.name == product_name:
@@ -110,10 +459,19 @@ class DAGModel:
 
         return result
 
+    @_reads
     def get_prerequisites(self, product):
-        return [self._nodes[pre_id] for pre_id in self._graph[product._uuid]]
+        # A stub has none until rehydrated, see archive.rehydrate
+        return [self._node(pre_id) for pre_id in self._graph[product._uuid]]
 
     def all_prerequisites(self, product):
+        if self._lock is not None:
+            # Collect under the lock rather than holding it while the caller iterates
+            with self._lock.read():
+                return iter(list(self._iter_all_prerequisites(product)))
+        return self._iter_all_prerequisites(product)
+
+    def _iter_all_prerequisites(self, product):
         queue = [pre for pre in self.get_prerequisites(product)]
         seen = set()
 
@@ -125,7 +483,12 @@ class DAGModel:
 
             yield pre
 
+    @_reads
     def get_successors(self, product):
+        if self._loader is not None:
+            for id in self._loader.successor_ids(product._uuid):
+                self._node(id)
+
         successors = []
         for node_id, pre in self._graph.items():
             if product._uuid in pre:
@@ -133,38 +496,98 @@ class DAGModel:
         return successors
 
     @property
+    @_reads
     def endpoints(self):
         """Get a list of all products with no successors.
+
+        On a partially loaded model, these are the loaded products that have no successors
+        in the plan file either.
         """
         endpoints = set(self._nodes.keys())
         for pred in self._graph.values():
             endpoints -= pred
+        if self._loader is not None:
+            # Successors that are loaded are already in the graph
+            endpoints = {id for id in endpoints
+                         if all(s in self._nodes for s in self._loader.successor_ids(id))}
 
         return [self._nodes[n] for n in endpoints]
 
     @property
+    @_reads
     def products(self):
+        """All products of the model; on a partially loaded model, only the loaded ones.
+        """
         return [product for product in self._nodes.values()]
 
     @property
+    @_reads
     def order(self):
-        try:
-            result = tuple(self._nodes[uuid]
-                           for uuid in self._sorter.static_order())
-            # re-create sorter
-            self._sorter = TopologicalSorter(self._graph)
+        return self._order()
 
-            return result
+    def _order(self):
+        self._load_prerequisites()
+        return self._sorted(self._graph, self._node)
+
+    @staticmethod
+    def _sorted(graph, node):
+        sorter = TopologicalSorter(graph)
+        try:
+            return tuple(node(uuid)
+                         for uuid in sorter.static_order())
         except CycleError as e:
             msg = e.args[0]
             cycle_nodes = [
-                f"{self._nodes[uuid].name} ({str(uuid)[-8:]})" for uuid in e.args[1]]
+                f"{node(uuid).name} ({str(uuid)[-8:]})" for uuid in e.args[1]]
             e.args = (msg, cycle_nodes)
-
-            # re-create sorter
-            self._sorter = TopologicalSorter(self._graph)
             raise e
 
+    @_writes
+    def snapshot(self):
+        """Get a read-only view of the model as it is now.
+
+        Later edits to the model, including to fields of its products, do not show in the
+        snapshot, so long-running readers (validate_DAG, gantt, to_xml) can use it from another
+        thread while the model keeps changing. In-place edits of a product's `resources` list
+        are the exception; assign a new list instead.
+
+        In persistent or concurrency mode (see `make_persistent`) taking a snapshot is O(1)
+        and it shares structure with the model; otherwise the node and graph maps are copied.
+
+        Returns:
+            DAGSnapshot: the read-only view.
+        """
+        if self.persistent:
+            nodes, graph, stubs = self._nodes.freeze(), self._graph.freeze(), self._stubs.freeze()
+        else:
+            nodes, graph, stubs = dict(self._nodes), dict(self._graph), dict(self._stubs)
+
+        view = _SnapshotNodes(nodes)
+        self._snapshots.append(weakref.ref(view))
+        return DAGSnapshot(view, graph, stubs)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_snapshots"] = []
+        state["_observers"] = []
+        state["_loader"] = None
+        state["_loading"] = False
+        state["concurrent"] = self._lock is not None
+        return state
+
+    def __setstate__(self, state):
+        concurrent = state.pop("concurrent", False)
+        state.setdefault("_stubs", {})
+        state.setdefault("_loading", False)
+        self.__dict__.update(state)
+        if self.persistent and not isinstance(self._stubs, PersistentDict):
+            self._stubs = PersistentDict(self._stubs)
+        if concurrent:
+            self._lock = ReadWriteLock()
+        for product in self._nodes.values():
+            self._own(product)
+
     @staticmethod
     def from_xml(filepath):
         def get_mandatory_node_content(parent, nodename):
@@ -182,11 +605,15 @@ class DAGModel:
         tree = ET.parse(filepath)
         root = tree.getroot()
 
+        # Shared resources, referenced by id from the products
+        resource_table = {element.get("id"): element.text
+                          for element in root.findall("ResourceTable/Resource")}
+
         for product_element in root.findall('Product'):
             name = get_mandatory_node_content(product_element, "Name")
 
             status = Status(
-                int(get_optional_node_content(product_element, "Status", 0)))
+                int(get_optional_node_content(product_element, "Status") or 0))
 
             id = uuid.UUID(get_mandatory_node_content(product_element, "UUID"))
             notes = get_optional_node_content(product_element, "Notes")
@@ -198,15 +625,16 @@ class DAGModel:
 
             target_date = get_optional_node_content(product_element, "Target")
             if target_date is not None:
-                target_date = datetime.strptime(target_date.text, "%Y-%m-%d")
+                target_date = datetime.strptime(target_date, "%Y-%m-%d")
 
             prereqs = []
             for pre in product_element.find("Prerequisites"):
                 prereqs.append(dag_model._nodes[uuid.UUID(pre.text)])
 
             resources = []
-            for res in product_element.find("Resources"):
-                resources.append(res.text)
+            for res in product_element.findall("Resources/Resource"):
+                ref = res.get("ref")
+                resources.append(resource_table[ref] if ref is not None else res.text)
 
             
             product = Product(name, status=status,
@@ -216,12 +644,40 @@ class DAGModel:
             product._created = created
             dag_model.add_product(product, *prereqs)
 
+            archive = get_optional_node_content(product_element, "Archive")
+            if archive is not None:
+                dag_model._stubs[id] = archive
+
         return dag_model
 
     def to_xml(self, filepath):
+        """Saves the model as XML. On a partially loaded model (see plan_file.load_cone),
+        the products that were never loaded are copied over from the plan file, so the saved
+        model is complete.
+        """
         root = ET.Element("DAGModel")
 
-        for product in self.order:
+        nodes, graph, stubs = self._nodes, self._graph, self._stubs
+        if self._loader is not None:
+            nodes, graph, stubs = dict(nodes), dict(graph), dict(stubs)
+            for product, prereqs, archive in self._loader.unloaded(self._nodes):
+                nodes[product._uuid] = product
+                graph[product._uuid] = prereqs
+                if archive is not None:
+                    stubs[product._uuid] = archive
+
+        # Each distinct resource is written once, and referenced by id from the products.
+        # Stubs are saved as stubs, without bringing back their prerequisites.
+        products = self._sorted(graph, nodes.__getitem__)
+        resource_ids = {}
+        resource_table = ET.SubElement(root, "ResourceTable")
+        for product in products:
+            for res in product.resources:
+                if res not in resource_ids:
+                    resource_ids[res] = str(len(resource_ids))
+                    ET.SubElement(resource_table, "Resource", id=resource_ids[res]).text = res
+
+        for product in products:
             product_element = ET.SubElement(root, "Product")
             ET.SubElement(product_element, "Name").text = product.name
             ET.SubElement(product_element,
@@ -236,22 +692,27 @@ class DAGModel:
                 ET.SubElement(product_element, "Target").text = product.target.strftime(
                     "%Y-%m-%d")
 
+            if product._uuid in stubs:
+                ET.SubElement(product_element, "Archive").text = stubs[product._uuid]
+
             prereqs_element = ET.SubElement(product_element, "Prerequisites")
-            for pre in self.get_prerequisites(product):
+            for pre in graph[product._uuid]:
                 ET.SubElement(prereqs_element,
-                              "Prerequisite").text = str(pre._uuid)
+                              "Prerequisite").text = str(pre)
 
             resources_element = ET.SubElement(product_element, "Resources")
             for res in product.resources:
-                ET.SubElement(resources_element, "Resource").text = res
+                ET.SubElement(resources_element, "Resource", ref=resource_ids[res])
 
         tree = ET.ElementTree(root)
         tree.write(filepath)
 
+    @_reads
     def __eq__(self, __value: object) -> bool:
         return (self._nodes == __value._nodes
                 and self._graph == __value._graph)
 
+    @_reads
     def __str__(self) -> str:
         def str_iter(products, indent=0):
             tab = "\t"
@@ -262,3 +723,59 @@ class DAGModel:
             return result
 
         return str_iter(self.endpoints)
+
+
+class _SnapshotNodes(Mapping):
+    # Frozen uuid -> Product map that keeps the old state of products edited after the snapshot
+
+    def __init__(self, nodes):
+        self._nodes = nodes
+        self._preserved = {}
+
+    def _preserve(self, product, name, old):
+        id = product._uuid
+        if id in self._preserved or self._nodes.get(id) is not product:
+            return
+
+        frozen = copy.copy(product)
+        frozen.resources = list(product.resources)
+        setattr(frozen, name, old)
+        self._preserved[id] = frozen
+
+    def __getitem__(self, key):
+        frozen = self._preserved.get(key)
+        return frozen if frozen is not None else self._nodes[key]
+
+    def __contains__(self, key):
+        return key in self._nodes
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+class DAGSnapshot(DAGModel):
+    """Read-only view of a DAGModel, see `DAGModel.snapshot`.
+    """
+
+    def __init__(self, nodes, graph, stubs):
+        self._nodes = nodes
+        self._graph = graph
+        self._lock = None
+        self._snapshots = []
+        self._observers = []
+        self._loader = None
+        self._stubs = stubs
+        self._loading = False
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("DAGSnapshot is read-only.")
+
+    add_product = add_dependency = remove_product = remove_products = remove_dependencies = _read_only
+    stub = _read_only
+    make_persistent = make_concurrent = _read_only
+
+    def snapshot(self):
+        return self
@@ -0,0 +1,175 @@
+from contextlib import nullcontext
+
+from src.dag_model import DAGObserver
+from src.persistent import PersistentDict
+
+
+_INVERSE = {
+    "product_added": "product_removed",
+    "product_removed": "product_added",
+    "dependencies_added": "dependencies_removed",
+    "dependencies_removed": "dependencies_added",
+}
+
+
+class _Command:
+    def __init__(self, label, before):
+        self.label = label
+        self.before = before
+        self.after = None
+        self.structure = []
+        self.fields = []
+        # Whether any structural change was an edit rather than a load
+        self.edited = False
+
+    @property
+    def empty(self):
+        return not self.edited and not self.fields
+
+
+class History(DAGObserver):
+    """Undo/redo stack for a DAGModel.
+
+    Changes are grouped into commands with `begin` and `commit`. Because the model's node,
+    graph and stub maps are persistent (see `DAGModel.make_persistent`), a checkpoint only
+    keeps references to their current versions: O(1) to take, plus O(log N) memory per edit made
+    in the command. Undo and redo swap those versions back in O(1), revert the recorded
+    product field edits, and replay the structural changes to the model's other observers
+    so that their indexes are updated rather than rebuilt.
+
+    Args:
+        dag_model (DAGModel): the model to track, switched to persistent mode.
+        limit (int, optional): number of commands kept for undo.
+    """
+
+    def __init__(self, dag_model, limit=1000):
+        self.dag_model = dag_model
+        self.limit = limit
+        self._undo = []
+        self._redo = []
+        self._current = None
+        self._replaying = False
+
+        dag_model.make_persistent()
+        dag_model.subscribe(self)
+
+    def _maps(self):
+        dag_model = self.dag_model
+        return dag_model._nodes.freeze(), dag_model._graph.freeze(), dag_model._stubs.freeze()
+
+    def begin(self, label=""):
+        """Starts recording a command, committing the previous one if still open.
+        """
+        self.commit()
+        self._current = _Command(label, self._maps())
+
+    def commit(self):
+        """Finishes the current command. Commands that changed nothing are dropped.
+
+        Commands that only loaded products (see DAGObserver) are not steps of their own:
+        the loads join the last command, whose state they extend.
+        """
+        command, self._current = self._current, None
+        if command is None:
+            return
+        if command.empty:
+            if command.structure and self._undo:
+                last = self._undo[-1]
+                last.structure.extend(command.structure)
+                last.after = self._maps()
+            return
+
+        command.after = self._maps()
+        self._undo.append(command)
+        if self.limit is not None and len(self._undo) > self.limit:
+            del self._undo[0]
+        self._redo.clear()
+
+    @property
+    def can_undo(self):
+        return len(self._undo) > 0
+
+    @property
+    def can_redo(self):
+        return len(self._redo) > 0
+
+    def undo(self):
+        """Reverts the last command.
+
+        Returns:
+            str or None: the label of the reverted command, None if there was nothing to undo.
+        """
+        self.commit()
+        if not self._undo:
+            return None
+
+        command = self._undo.pop()
+        self._apply(command.before,
+                    [(p, name, old) for p, name, old, _ in reversed(command.fields)],
+                    [(_INVERSE[event], args) for event, args in reversed(command.structure)])
+        self._redo.append(command)
+        return command.label
+
+    def redo(self):
+        """Re-applies the last undone command.
+
+        Returns:
+            str or None: the label of the command, None if there was nothing to redo.
+        """
+        self.commit()
+        if not self._redo:
+            return None
+
+        command = self._redo.pop()
+        self._apply(command.after,
+                    [(p, name, new) for p, name, _, new in command.fields],
+                    command.structure)
+        self._undo.append(command)
+        return command.label
+
+    def _apply(self, maps, fields, structure):
+        dag_model = self.dag_model
+        lock = dag_model._lock.write() if dag_model._lock is not None else nullcontext()
+
+        self._replaying = True
+        try:
+            with lock:
+                dag_model._nodes = PersistentDict(maps[0])
+                dag_model._graph = PersistentDict(maps[1])
+                dag_model._stubs = PersistentDict(maps[2])
+
+                for event, args in structure:
+                    if event == "product_added":
+                        dag_model._own(args[0])
+                    elif event == "product_removed":
+                        dag_model._disown(args[0])
+                    dag_model._notify(event, *args)
+
+                for product, name, value in fields:
+                    setattr(product, name, value)
+        finally:
+            self._replaying = False
+
+    # --- DAGObserver ---
+
+    def _record(self, event, *args):
+        if self._current is not None and not self._replaying:
+            self._current.structure.append((event, args))
+            if not self.dag_model._loading:
+                self._current.edited = True
+
+    def product_added(self, dag_model, product):
+        self._record("product_added", product)
+
+    def product_removed(self, dag_model, product):
+        self._record("product_removed", product)
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        self._record("dependencies_added", product, prerequisite_ids)
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        self._record("dependencies_removed", product, prerequisite_ids)
+
+    def product_changed(self, dag_model, product, name, old, new):
+        if self._current is not None and not self._replaying:
+            self._current.fields.append((product, name, old, new))
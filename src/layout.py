@@ -0,0 +1,327 @@
+"""Layered (Sugiyama) layout of the dependency graph, with DOT and SVG export.
+
+Products are placed left to right in layers by longest path from the products without
+prerequisites, edges spanning several layers are routed through dummy points, the order
+within each layer is chosen by barycenter sweeps to reduce crossings, and vertical
+coordinates are balanced towards each product's neighbours.
+
+Example:
+
+    layout = GraphLayout(dag_model)
+    layout.to_svg("plan.svg")
+"""
+from collections import namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+from src.dag_model import DAGObserver, Status
+
+
+LAYER_GAP = 180
+ROW_GAP = 40
+NODE_WIDTH = 140
+NODE_HEIGHT = 26
+_MARGIN = 20
+
+_COLORS = {Status.TO_DO: "#e06666", Status.IN_PROGRESS: "#ffd966", Status.DONE: "#93c47d"}
+
+Layout = namedtuple("Layout", ["positions", "edges"])
+Layout.__doc__ = """Result of GraphLayout.update.
+
+    positions (dict): product uuid -> (x, y) of the center of the product's box.
+    edges (list): (prerequisite uuid, product uuid, points) for each edge, where points are
+        the (x, y) bends of the edge from the prerequisite to the product.
+"""
+
+
+class GraphLayout(DAGObserver):
+    """Layered layout of a DAGModel, cached and kept in sync as an observer.
+
+    The layout is recomputed on `update`, but only around what changed: layering is redone
+    in O(N + E), while crossing reduction and coordinate assignment, which dominate the
+    cost, only run on the layers whose members or edges changed, plus one layer on each
+    side, separately for each run of such layers. The other layers keep their order and
+    coordinates.
+
+    Args:
+        dag_model (DAGModel): the model to lay out; must be acyclic.
+        sweeps (int, optional): number of down-and-up barycenter sweeps.
+    """
+
+    def __init__(self, dag_model, sweeps=4):
+        self.dag_model = dag_model
+        self.sweeps = sweeps
+
+        # Keys are product uuids, or (product uuid, prerequisite uuid, layer) for the dummy
+        # points of long edges
+        self._members = []      # layer -> list of keys, in slot order
+        self._slots = []        # layer -> {key: slot}
+        self._pos = []          # layer -> array of the position of each slot in the layer
+        self._y = []            # layer -> array of the y of each slot
+        self._layer = {}
+        self._links = []        # layer -> (slots in the layer, slots in the next one) of each edge
+        self._changed = set()
+        self._stale = True
+        self._layout = None
+
+        dag_model.subscribe(self)
+
+    def close(self):
+        """Stops following the model.
+        """
+        self.dag_model.unsubscribe(self)
+
+    # --- DAGObserver ---
+
+    def _touch(self, *ids):
+        self._changed.update(ids)
+        self._layout = None
+
+    def product_added(self, dag_model, product):
+        self._touch(product._uuid)
+
+    def product_removed(self, dag_model, product):
+        self._touch(product._uuid)
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        self._touch(product._uuid, *prerequisite_ids)
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        self._touch(product._uuid, *prerequisite_ids)
+
+    # --- layout ---
+
+    def update(self):
+        """Brings the layout up to date with the model.
+
+        Returns:
+            Layout: the positions of the products and the routes of the edges.
+
+        Raises:
+            CycleError: if the model has a cycle.
+        """
+        if self._layout is not None:
+            return self._layout
+
+        graph = self.dag_model._graph
+        layer = {}
+        for product in self.dag_model.order:
+            id = product._uuid
+            layer[id] = 1 + max((layer[pre] for pre in graph[id]), default=-1)
+
+        # Members of each layer, including dummy points of long edges
+        members = [[] for _ in range(max(layer.values(), default=-1) + 1)]
+        links = []
+        for id, prereqs in graph.items():
+            members[layer[id]].append(id)
+            for pre in prereqs:
+                previous = pre
+                for l in range(layer[pre] + 1, layer[id]):
+                    dummy = (id, pre, l)
+                    members[l].append(dummy)
+                    links.append((l - 1, previous, dummy))
+                    previous = dummy
+                links.append((layer[id] - 1, previous, id))
+
+        dirty = self._dirty_layers(members, layer)
+        self._layer = layer
+        self._reslot(members, dirty)
+
+        # Edges between consecutive layers, as slot indices
+        by_layer = [([], []) for _ in members]
+        for l, a, b in links:
+            left, right = by_layer[l]
+            left.append(self._slots[l][a])
+            right.append(self._slots[l + 1][b])
+        self._links = [(np.array(left, np.intp), np.array(right, np.intp)) for left, right in by_layer]
+
+        for lo, hi in self._windows(dirty, len(members)):
+            self._reduce_crossings(lo, hi)
+            self._assign_coordinates(lo, hi)
+
+        self._changed.clear()
+        self._stale = False
+        self._layout = self._result(graph)
+        return self._layout
+
+    def _dirty_layers(self, members, layer):
+        if self._stale:
+            return set(range(len(members)))
+
+        dirty = set()
+        for l, keys in enumerate(members):
+            if (l >= len(self._members) or len(keys) != len(self._members[l])
+                    or not all(key in self._slots[l] for key in keys)):
+                dirty.add(l)
+        for id in self._changed:
+            for known in (layer, self._layer):
+                if id in known:
+                    dirty.add(known[id])
+        return dirty
+
+    @staticmethod
+    def _windows(dirty, count):
+        # Runs of dirty layers, each widened by one layer on each side; runs that meet after
+        # widening are merged
+        windows = []
+        for l in sorted(dirty):
+            lo, hi = max(l - 1, 0), min(l + 1, count - 1)
+            if windows and lo <= windows[-1][1] + 1:
+                windows[-1][1] = hi
+            else:
+                windows.append([lo, hi])
+        return windows
+
+    def _reslot(self, members, dirty):
+        # Keeps the relative order of the members that stay in a dirty layer, and puts new
+        # members at the end
+        slots, positions, ys = [], [], []
+        for l, keys in enumerate(members):
+            if l not in dirty:
+                slots.append(self._slots[l])
+                positions.append(self._pos[l])
+                ys.append(self._y[l])
+                members[l] = self._members[l]
+                continue
+
+            old_slots = self._slots[l] if l < len(self._slots) else {}
+            old_pos = self._pos[l] if l < len(self._pos) else np.zeros(0)
+            previous = np.array([old_pos[old_slots[key]] if key in old_slots else len(old_pos) + i
+                                 for i, key in enumerate(keys)], float)
+            pos = np.empty(len(keys), np.intp)
+            pos[np.argsort(previous, kind="stable")] = np.arange(len(keys))
+
+            slots.append({key: slot for slot, key in enumerate(keys)})
+            positions.append(pos)
+            ys.append(pos * float(ROW_GAP))
+
+        self._members, self._slots, self._pos, self._y = members, slots, positions, ys
+
+    def _barycenters(self, l, neighbour, pos):
+        # Mean position of each slot's neighbours in the adjacent layer; slots without
+        # neighbours keep their current position
+        if neighbour < l:
+            source, target = self._links[neighbour]
+        else:
+            target, source = self._links[l]
+        count = np.bincount(target, minlength=len(pos[l]))
+        total = np.bincount(target, weights=pos[neighbour][source], minlength=len(pos[l]))
+        return np.where(count > 0, total / np.maximum(count, 1), pos[l])
+
+    def _reduce_crossings(self, lo, hi):
+        pos = self._pos
+        for _ in range(self.sweeps):
+            for direction in (1, -1):
+                layers = range(lo, hi + 1) if direction == 1 else range(hi, lo - 1, -1)
+                for l in layers:
+                    neighbour = l - direction
+                    if not 0 <= neighbour < len(pos) or len(pos[l]) < 2:
+                        continue
+                    barycenters = self._barycenters(l, neighbour, pos)
+                    # Ties keep the current order
+                    order = np.lexsort((pos[l], barycenters))
+                    pos[l] = np.empty_like(order)
+                    pos[l][order] = np.arange(len(order))
+
+    def _assign_coordinates(self, lo, hi):
+        # Pull each slot towards the mean y of its neighbours, keeping the order and at least
+        # ROW_GAP between consecutive slots
+        for l in range(lo, hi + 1):
+            self._y[l] = self._pos[l] * float(ROW_GAP)
+        for l in range(lo, hi + 1):
+            count = np.zeros(len(self._pos[l]))
+            total = np.zeros(len(self._pos[l]))
+            if l > 0:
+                source, target = self._links[l - 1]
+                count += np.bincount(target, minlength=len(count))
+                total += np.bincount(target, weights=self._y[l - 1][source], minlength=len(count))
+            if l + 1 < len(self._pos):
+                target, source = self._links[l]
+                count += np.bincount(target, minlength=len(count))
+                total += np.bincount(target, weights=self._y[l + 1][source], minlength=len(count))
+
+            order = np.argsort(self._pos[l])
+            desired = np.where(count > 0, total / np.maximum(count, 1), self._pos[l] * float(ROW_GAP))[order]
+            steps = np.arange(len(order)) * float(ROW_GAP)
+            y = np.empty(len(order))
+            y[order] = np.maximum.accumulate(desired - steps) + steps
+            self._y[l] = y - min(y.min(initial=0.0), 0.0)
+
+    def _point(self, key):
+        l = self._layer[key] if not isinstance(key, tuple) else key[2]
+        return (l * LAYER_GAP + NODE_WIDTH / 2 + _MARGIN,
+                float(self._y[l][self._slots[l][key]]) + NODE_HEIGHT / 2 + _MARGIN)
+
+    def _result(self, graph):
+        positions = {id: self._point(id) for id in graph}
+        edges = []
+        for id, prereqs in graph.items():
+            for pre in prereqs:
+                bends = [self._point((id, pre, l)) for l in range(self._layer[pre] + 1, self._layer[id])]
+                edges.append((pre, id, [positions[pre], *bends, positions[id]]))
+        return Layout(positions, edges)
+
+    # --- export ---
+
+    def to_dot(self, filepath):
+        """Writes the graph in Graphviz DOT format, with the computed positions (in points)
+        as `pos` attributes so that `neato -n` draws it as laid out here.
+        """
+        layout = self.update()
+        nodes = self.dag_model._nodes
+        with open(filepath, "w") as f:
+            f.write("digraph LabDAG {\n\trankdir=LR;\n\tnode [shape=box, style=filled];\n")
+            for id, (x, y) in layout.positions.items():
+                product = nodes[id]
+                label = product.name.replace("\\", "\\\\").replace('"', '\\"')
+                f.write(f'\t"{id}" [label="{label}", fillcolor="{_COLORS[product.status]}", '
+                        f'pos="{x:.0f},{-y:.0f}!"];\n')
+            for pre, id, _ in layout.edges:
+                f.write(f'\t"{pre}" -> "{id}";\n')
+            f.write("}\n")
+
+    def to_svg(self, filepath):
+        """Writes the graph as an SVG image, element by element.
+        """
+        layout = self.update()
+        nodes = self.dag_model._nodes
+        width = max((x for x, _ in layout.positions.values()), default=0) + NODE_WIDTH / 2 + _MARGIN
+        height = max((y for _, y in layout.positions.values()), default=0) + NODE_HEIGHT / 2 + _MARGIN
+
+        with open(filepath, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+                    f'font-family="sans-serif" font-size="12">\n')
+            f.write('<g fill="none" stroke="#888">\n')
+            for _, _, points in layout.edges:
+                # From the right side of the prerequisite to the left side of the product
+                (x0, y0), (x1, y1) = points[0], points[-1]
+                route = [(x0 + NODE_WIDTH / 2, y0), *points[1:-1], (x1 - NODE_WIDTH / 2, y1)]
+                f.write(f'<polyline points="{" ".join(f"{x:.1f},{y:.1f}" for x, y in route)}"/>\n')
+            f.write('</g>\n')
+
+            for id, (x, y) in layout.positions.items():
+                product = nodes[id]
+                f.write(f'<g><title>{escape(str(product))}</title>'
+                        f'<rect x="{x - NODE_WIDTH / 2:.1f}" y="{y - NODE_HEIGHT / 2:.1f}" '
+                        f'width="{NODE_WIDTH}" height="{NODE_HEIGHT}" rx="4" '
+                        f'fill={quoteattr(_COLORS[product.status])} stroke="#444"/>'
+                        f'<text x="{x:.1f}" y="{y + 4:.1f}" text-anchor="middle">{escape(product.name)}</text></g>\n')
+            f.write('</svg>\n')
+
+
+def crossings(layout):
+    """Number of edge crossings between consecutive layers of a GraphLayout, for testing
+    and tuning.
+    """
+    layout.update()
+    total = 0
+    for l, (left, right) in enumerate(layout._links):
+        if len(left) < 2:
+            continue
+        a = layout._pos[l][left]
+        b = layout._pos[l + 1][right]
+        # Pairs of edges whose ends are in opposite orders
+        total += int(np.sum((a[:, None] < a[None, :]) & (b[:, None] > b[None, :])))
+    return total
@@ -0,0 +1,276 @@
+"""Persistent (immutable, structurally shared) maps.
+
+`PMap` is a hash array mapped trie: every update returns a new map that shares all but
+O(log32 N) nodes with the old one, so keeping old versions around is cheap.
+`PersistentDict` is a mutable mapping on top of it whose current contents can be
+frozen into a PMap in O(1).
+"""
+from collections.abc import Mapping, MutableMapping, ItemsView, ValuesView
+
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_BITS = 64
+_MISSING = object()
+
+
+def _hash(key):
+    return hash(key) & ((1 << _HASH_BITS) - 1)
+
+
+def _merge(leaf1, leaf2, shift):
+    # Builds the smallest subtree holding two leaves whose hashes agree below `shift`
+    h1, h2 = leaf1[0], leaf2[0]
+    if shift >= _HASH_BITS:
+        return _CollisionNode(h1, [leaf1, leaf2])
+
+    i1, i2 = (h1 >> shift) & _MASK, (h2 >> shift) & _MASK
+    if i1 == i2:
+        return _BitmapNode(1 << i1, [_merge(leaf1, leaf2, shift + _BITS)])
+    if i1 < i2:
+        return _BitmapNode((1 << i1) | (1 << i2), [leaf1, leaf2])
+    return _BitmapNode((1 << i1) | (1 << i2), [leaf2, leaf1])
+
+
+class _BitmapNode:
+    # Entries are leaves (hash, key, value) or child nodes, in bit order
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def get(self, h, key, shift, default):
+        bit = 1 << ((h >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return default
+
+        entry = self.entries[(self.bitmap & (bit - 1)).bit_count()]
+        if type(entry) is tuple:
+            return entry[2] if entry[1] is key or entry[1] == key else default
+        return entry.get(h, key, shift + _BITS, default)
+
+    def set(self, h, key, value, shift):
+        bit = 1 << ((h >> shift) & _MASK)
+        i = (self.bitmap & (bit - 1)).bit_count()
+        if not self.bitmap & bit:
+            entries = self.entries[:i] + [(h, key, value)] + self.entries[i:]
+            return _BitmapNode(self.bitmap | bit, entries), True
+
+        entry = self.entries[i]
+        if type(entry) is tuple:
+            if entry[1] is key or entry[1] == key:
+                if entry[2] is value:
+                    return self, False
+                new, added = (h, key, value), False
+            else:
+                new, added = _merge(entry, (h, key, value), shift + _BITS), True
+        else:
+            new, added = entry.set(h, key, value, shift + _BITS)
+            if new is entry:
+                return self, False
+
+        entries = self.entries.copy()
+        entries[i] = new
+        return _BitmapNode(self.bitmap, entries), added
+
+    def remove(self, h, key, shift):
+        """Returns the node without `key` (None if empty), or self if `key` is absent.
+        """
+        bit = 1 << ((h >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return self
+
+        i = (self.bitmap & (bit - 1)).bit_count()
+        entry = self.entries[i]
+        if type(entry) is tuple:
+            if not (entry[1] is key or entry[1] == key):
+                return self
+            new = None
+        else:
+            new = entry.remove(h, key, shift + _BITS)
+            if new is entry:
+                return self
+            # Pull single leaves up so that removals keep the trie shallow
+            if type(new) is _BitmapNode and len(new.entries) == 1 and type(new.entries[0]) is tuple:
+                new = new.entries[0]
+            elif type(new) is _CollisionNode and len(new.pairs) == 1:
+                new = new.pairs[0]
+
+        if new is None:
+            if self.bitmap == bit:
+                return None
+            return _BitmapNode(self.bitmap ^ bit, self.entries[:i] + self.entries[i + 1:])
+
+        entries = self.entries.copy()
+        entries[i] = new
+        return _BitmapNode(self.bitmap, entries)
+
+    def leaves(self):
+        for entry in self.entries:
+            if type(entry) is tuple:
+                yield entry
+            else:
+                yield from entry.leaves()
+
+
+class _CollisionNode:
+    # Leaves whose full hashes are equal
+    __slots__ = ("hash", "pairs")
+
+    def __init__(self, h, pairs):
+        self.hash = h
+        self.pairs = pairs
+
+    def _find(self, key):
+        for i, pair in enumerate(self.pairs):
+            if pair[1] is key or pair[1] == key:
+                return i
+        return -1
+
+    def get(self, h, key, shift, default):
+        i = self._find(key)
+        return self.pairs[i][2] if i >= 0 else default
+
+    def set(self, h, key, value, shift):
+        i = self._find(key)
+        pairs = self.pairs.copy()
+        if i < 0:
+            pairs.append((h, key, value))
+        else:
+            pairs[i] = (h, key, value)
+        return _CollisionNode(self.hash, pairs), i < 0
+
+    def remove(self, h, key, shift):
+        i = self._find(key)
+        if i < 0:
+            return self
+        return _CollisionNode(self.hash, self.pairs[:i] + self.pairs[i + 1:])
+
+    def leaves(self):
+        return iter(self.pairs)
+
+
+class _PMapItems(ItemsView):
+    def __iter__(self):
+        for _, key, value in self._mapping._leaves():
+            yield key, value
+
+
+class _PMapValues(ValuesView):
+    def __iter__(self):
+        for _, _, value in self._mapping._leaves():
+            yield value
+
+
+class PMap(Mapping):
+    """Immutable hash map with cheap updated copies.
+
+    `set` and `delete` return new maps in O(log32 N) time and memory, leaving the original
+    unchanged. Iteration order is arbitrary but stable for a given map.
+    """
+    __slots__ = ("_root", "_len")
+
+    def __init__(self, items=None):
+        self._root = _BitmapNode(0, [])
+        self._len = 0
+        if items is not None:
+            pairs = items.items() if isinstance(items, Mapping) else items
+            for key, value in pairs:
+                self._root, added = self._root.set(_hash(key), key, value, 0)
+                self._len += added
+
+    @staticmethod
+    def _make(root, length):
+        pmap = PMap.__new__(PMap)
+        pmap._root = root
+        pmap._len = length
+        return pmap
+
+    def __getitem__(self, key):
+        value = self._root.get(_hash(key), key, 0, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return self._root.get(_hash(key), key, 0, default)
+
+    def __contains__(self, key):
+        return self._root.get(_hash(key), key, 0, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._len
+
+    def _leaves(self):
+        return self._root.leaves()
+
+    def __iter__(self):
+        for _, key, _ in self._root.leaves():
+            yield key
+
+    def items(self):
+        return _PMapItems(self)
+
+    def values(self):
+        return _PMapValues(self)
+
+    def set(self, key, value):
+        root, added = self._root.set(_hash(key), key, value, 0)
+        if root is self._root:
+            return self
+        return PMap._make(root, self._len + added)
+
+    def delete(self, key):
+        root = self._root.remove(_hash(key), key, 0)
+        if root is self._root:
+            raise KeyError(key)
+        return PMap._make(root if root is not None else _BitmapNode(0, []), self._len - 1)
+
+    def __repr__(self):
+        return f"PMap({dict(self.items())!r})"
+
+
+class PersistentDict(MutableMapping):
+    """Mutable mapping backed by a PMap.
+
+    Updates cost O(log32 N) instead of O(1), in exchange for `freeze`, which returns an
+    immutable copy of the current contents in O(1).
+    """
+    __slots__ = ("_map",)
+
+    def __init__(self, items=None):
+        self._map = items if isinstance(items, PMap) else PMap(items)
+
+    def freeze(self):
+        return self._map
+
+    def __getitem__(self, key):
+        return self._map[key]
+
+    def get(self, key, default=None):
+        return self._map.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __setitem__(self, key, value):
+        self._map = self._map.set(key, value)
+
+    def __delitem__(self, key):
+        self._map = self._map.delete(key)
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self):
+        return len(self._map)
+
+    def items(self):
+        return self._map.items()
+
+    def values(self):
+        return self._map.values()
+
+    def __repr__(self):
+        return f"PersistentDict({dict(self.items())!r})"
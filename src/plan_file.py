@@ -0,0 +1,417 @@
+"""Indexed plan files (.ldag) that can be opened without reading every product.
+
+Layout (little-endian):
+
+    header     magic, product count and section offsets
+    index      one fixed-size entry per product, sorted by UUID: UUID, position and length
+               of its record, and where its prerequisites and successors start in the
+               adjacency section
+    adjacency  index positions (uint32) of every product's prerequisites and successors
+    names      (name hash, index position) pairs sorted by hash
+    resources  each distinct resource once: end offsets (uint64) into the UTF-8 text of all
+               resources, then that text
+    records    one JSON object per product, as written by Product.to_dict, with its
+               resources given as ids into the resource section, and for stubs (see
+               archive.archive_done) the archive holding their prerequisites
+
+Lookups by UUID or name are binary searches over the memory-mapped file, and walking a
+product's cone only touches the index and adjacency sections, so loading a slice of a
+large plan reads little more than the records in the slice.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import uuid
+
+from array import array
+
+from src.dag_model import DAGModel, DAGObserver, Product
+
+
+PLAN_EXTENSION = ".ldag"
+MAGIC = b"LABDAG\x00\x02"
+_HEADER = struct.Struct("<8sQQQQQQQ")
+# Version 1 had no resource section, and resources written out in each record
+_MAGIC_V1 = b"LABDAG\x00\x01"
+_HEADER_V1 = struct.Struct("<8sQQQQQ")
+_ENTRY = struct.Struct("<16sQIIIII")
+_NAME = struct.Struct("<QI")
+
+ANCESTORS, DESCENDANTS, BOTH = "ancestors", "descendants", "both"
+
+
+def _name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "little")
+
+
+def _encode(record, resource_ids):
+    # record is a dict from Product.to_dict; its resources are replaced by their ids
+    ids = []
+    for resource in record["resources"]:
+        if resource not in resource_ids:
+            resource_ids[resource] = len(resource_ids)
+        ids.append(resource_ids[resource])
+    record["resources"] = ids
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+def write_plan(dag_model, filepath):
+    """Saves a DAGModel as an indexed plan file.
+
+    If the model was partially loaded from a plan file (see `load_cone`), the products that
+    were never loaded are copied over from it, so the saved plan is complete.
+
+    Args:
+        dag_model (DAGModel): the model to save.
+        filepath (str): where to write the plan.
+    """
+    # uuid -> (record bytes, prerequisite uuids)
+    records = {}
+    resource_ids = {}
+
+    loader = getattr(dag_model, "_loader", None)
+    if loader is not None:
+        plan = loader.plan
+        for position in range(len(plan)):
+            id = plan.uuid_at(position)
+            if id in dag_model._nodes or id in loader.removed:
+                continue
+            records[id] = (_encode(plan.read_record(position), resource_ids),
+                           [plan.uuid_at(p) for p in plan.prerequisites(position)])
+
+    stubs = getattr(dag_model, "_stubs", {})
+    for id, product in dag_model._nodes.items():
+        record = product.to_dict()
+        if id in stubs:
+            record["archive"] = stubs[id]
+        records[id] = (_encode(record, resource_ids), dag_model._graph[id])
+
+    ids = sorted(records, key=lambda id: id.bytes)
+    positions = {id: i for i, id in enumerate(ids)}
+
+    prerequisites = [[positions[pre] for pre in records[id][1] if pre in positions] for id in ids]
+    successors = [[] for _ in ids]
+    for i, prereqs in enumerate(prerequisites):
+        for pre in prereqs:
+            successors[pre].append(i)
+
+    adjacency = array("I")
+    index = bytearray()
+    record_offset = 0
+    for i, id in enumerate(ids):
+        record = records[id][0]
+        prereq_start = len(adjacency)
+        adjacency.extend(prerequisites[i])
+        succ_start = len(adjacency)
+        adjacency.extend(successors[i])
+        index += _ENTRY.pack(id.bytes, record_offset, len(record),
+                             prereq_start, len(prerequisites[i]), succ_start, len(successors[i]))
+        record_offset += len(record) + 1
+
+    names = sorted((_name_hash(json.loads(records[id][0])["name"]), i) for i, id in enumerate(ids))
+
+    resource_text = [resource.encode() for resource in resource_ids]
+    resource_ends = array("Q")
+    end = 0
+    for text in resource_text:
+        end += len(text)
+        resource_ends.append(end)
+
+    index_offset = _HEADER.size
+    adjacency_offset = index_offset + len(index)
+    names_offset = adjacency_offset + adjacency.itemsize * len(adjacency)
+    resources_offset = names_offset + _NAME.size * len(names)
+    records_offset = resources_offset + resource_ends.itemsize * len(resource_ends) + end
+
+    if sys.byteorder == "big":
+        adjacency.byteswap()
+        resource_ends.byteswap()
+
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(ids), index_offset, adjacency_offset, names_offset,
+                             resources_offset, len(resource_ends), records_offset))
+        f.write(index)
+        f.write(adjacency.tobytes())
+        for name_hash, position in names:
+            f.write(_NAME.pack(name_hash, position))
+        f.write(resource_ends.tobytes())
+        for text in resource_text:
+            f.write(text)
+        for id in ids:
+            f.write(records[id][0])
+            f.write(b"\n")
+    os.replace(tmp_path, filepath)
+
+
+class PlanFile:
+    """Read-only, memory-mapped view of a plan file. Products are addressed by their
+    position in the index.
+
+    Args:
+        filepath (str): the plan file to open.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        with open(filepath, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic = self._mmap[:len(MAGIC)]
+        if magic == MAGIC:
+            (_, self._count, self._index_offset, self._adjacency_offset, self._names_offset,
+             self._resources_offset, self._resource_count,
+             self._records_offset) = _HEADER.unpack_from(self._mmap, 0)
+        elif magic == _MAGIC_V1:
+            (_, self._count, self._index_offset, self._adjacency_offset,
+             self._names_offset, self._records_offset) = _HEADER_V1.unpack_from(self._mmap, 0)
+            self._resource_count = None
+        else:
+            raise ValueError(f"{filepath} is not a LabDAG plan file.")
+        # Resources read so far, so that products sharing a resource share its string
+        self._resources = {}
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._mmap.close()
+
+    def _entry(self, position):
+        return _ENTRY.unpack_from(self._mmap, self._index_offset + position * _ENTRY.size)
+
+    def uuid_at(self, position):
+        offset = self._index_offset + position * _ENTRY.size
+        return uuid.UUID(bytes=self._mmap[offset:offset + 16])
+
+    def find(self, id):
+        """Index position of the product with this UUID, or -1.
+        """
+        key = id.bytes
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = self._index_offset + mid * _ENTRY.size
+            found = self._mmap[offset:offset + 16]
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def find_name(self, name):
+        """Index positions of all products with this name.
+        """
+        target = _name_hash(name)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _NAME.unpack_from(self._mmap, self._names_offset + mid * _NAME.size)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        positions = []
+        while lo < self._count:
+            name_hash, position = _NAME.unpack_from(self._mmap, self._names_offset + lo * _NAME.size)
+            if name_hash != target:
+                break
+            # Hashes may collide, so check the record
+            if json.loads(self.record_bytes(position))["name"] == name:
+                positions.append(position)
+            lo += 1
+        return positions
+
+    def _adjacent(self, start, count):
+        offset = self._adjacency_offset + start * 4
+        return list(struct.unpack_from(f"<{count}I", self._mmap, offset))
+
+    def prerequisites(self, position):
+        _, _, _, start, count, _, _ = self._entry(position)
+        return self._adjacent(start, count)
+
+    def successors(self, position):
+        _, _, _, _, _, start, count = self._entry(position)
+        return self._adjacent(start, count)
+
+    def record_bytes(self, position):
+        _, offset, length, _, _, _, _ = self._entry(position)
+        offset += self._records_offset
+        return self._mmap[offset:offset + length]
+
+    def resource(self, resource_id):
+        """Text of a resource of the resource section, by id.
+        """
+        text = self._resources.get(resource_id)
+        if text is None:
+            ends = self._resources_offset
+            text_start = ends + 8 * self._resource_count
+            start = struct.unpack_from("<Q", self._mmap, ends + 8 * (resource_id - 1))[0] if resource_id else 0
+            end = struct.unpack_from("<Q", self._mmap, ends + 8 * resource_id)[0]
+            text = sys.intern(self._mmap[text_start + start:text_start + end].decode())
+            self._resources[resource_id] = text
+        return text
+
+    def read_record(self, position):
+        """The product's record, as from Product.to_dict.
+        """
+        record = json.loads(self.record_bytes(position))
+        if self._resource_count is not None:
+            record["resources"] = [self.resource(i) for i in record.get("resources", [])]
+        return record
+
+    def read_product(self, position):
+        return Product.from_dict(self.read_record(position))
+
+    def cone(self, positions, direction=ANCESTORS):
+        """All positions reachable from `positions` (included) through prerequisites
+        (ANCESTORS), successors (DESCENDANTS) or both separately (BOTH).
+        """
+        if direction == BOTH:
+            return self.cone(positions, ANCESTORS) | self.cone(positions, DESCENDANTS)
+
+        step = self.prerequisites if direction == ANCESTORS else self.successors
+        seen = set(positions)
+        queue = list(positions)
+        while queue:
+            for next in step(queue.pop()):
+                if next not in seen:
+                    seen.add(next)
+                    queue.append(next)
+        return seen
+
+
+class PlanLoader(DAGObserver):
+    """Loads products of a plan file into a DAGModel on demand.
+
+    Attached to a model as its `_loader`; the model asks it for products that are referenced
+    but not loaded yet. It also remembers products removed from the model, so that saving
+    the model does not bring them back from the file.
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.removed = set()
+        self.lock = threading.Lock()
+
+    def _position(self, id):
+        position = self.plan.find(id)
+        if position < 0 or id in self.removed:
+            raise KeyError(id)
+        return position
+
+    def load(self, id):
+        """Reads a product, its prerequisites' UUIDs, and its archive if it is a stub, from
+        the file.
+
+        Raises:
+            KeyError: if the product is not in the file.
+        """
+        position = self._position(id)
+        prereqs = frozenset(self.plan.uuid_at(p) for p in self.plan.prerequisites(position))
+        record = self.plan.read_record(position)
+        return Product.from_dict(record), prereqs - self.removed, record.get("archive")
+
+    def unloaded(self, loaded):
+        """Reads every product of the file that is neither in `loaded` nor removed.
+
+        Yields:
+            tuple: (product, prerequisite UUIDs, archive) as from `load`.
+        """
+        for position in range(len(self.plan)):
+            id = self.plan.uuid_at(position)
+            if id not in loaded and id not in self.removed:
+                yield self.load(id)
+
+    def ids_named(self, name):
+        """UUIDs of the products of the file with this name.
+        """
+        ids = (self.plan.uuid_at(p) for p in self.plan.find_name(name))
+        return [id for id in ids if id not in self.removed]
+
+    def successor_ids(self, id):
+        try:
+            position = self._position(id)
+        except KeyError:
+            return []
+        ids = (self.plan.uuid_at(p) for p in self.plan.successors(position))
+        return [id for id in ids if id not in self.removed]
+
+    def product_removed(self, dag_model, product):
+        self.removed.add(product._uuid)
+
+
+def load_plan(filepath):
+    """Loads every product of a plan file.
+    """
+    plan = PlanFile(filepath)
+    try:
+        return _load_positions(plan, range(len(plan)))
+    finally:
+        plan.close()
+
+
+def _load_positions(plan, positions):
+    dag_model = DAGModel()
+    products = {}
+    prerequisites = {}
+    for position in positions:
+        record = plan.read_record(position)
+        product = Product.from_dict(record)
+        products[position] = product
+        prerequisites[position] = plan.prerequisites(position)
+        if "archive" in record:
+            dag_model._stubs[product._uuid] = record["archive"]
+
+    for position, product in products.items():
+        dag_model._nodes[product._uuid] = product
+        dag_model._graph[product._uuid] = frozenset(plan.uuid_at(p) for p in prerequisites[position])
+        dag_model._own(product)
+    return dag_model
+
+
+def load_cone(filepath, product, direction=ANCESTORS):
+    """Loads one product and its ancestors, descendants or both from a plan file.
+
+    Products outside the cone that are reached later (for example the other prerequisites
+    of a descendant, or the successors of an ancestor) are loaded from the file on first
+    access.
+
+    Args:
+        filepath (str): the plan file.
+        product (str or uuid.UUID): name or UUID of the product at the tip of the cone.
+        direction (str, optional): ANCESTORS, DESCENDANTS or BOTH.
+
+    Returns:
+        DAGModel: a model holding the cone, loading other products lazily.
+
+    Raises:
+        ValueError: if no product, or several products, match `product`.
+    """
+    plan = PlanFile(filepath)
+
+    if isinstance(product, uuid.UUID):
+        positions = [plan.find(product)] if plan.find(product) >= 0 else []
+    else:
+        try:
+            id = uuid.UUID(product)
+            positions = [plan.find(id)] if plan.find(id) >= 0 else []
+        except ValueError:
+            positions = plan.find_name(product)
+
+    if len(positions) != 1:
+        plan.close()
+        problem = "No product" if not positions else "More than one product"
+        raise ValueError(f"{problem} named {product} found in {filepath}.")
+
+    dag_model = _load_positions(plan, plan.cone(positions, direction))
+    loader = PlanLoader(plan)
+    dag_model._loader = loader
+    dag_model.subscribe(loader)
+    return dag_model
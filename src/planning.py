@@ -0,0 +1,240 @@
+"""Monte Carlo schedule risk: how likely each product is to be finished by its target date,
+given uncertain durations.
+
+Example:
+
+    forecast = simulate(dag_model, {digest._uuid: Estimate(1, 2, 4)}, samples=10000, workers=4)
+    forecast.percentiles(final)     # {10: datetime, 50: datetime, 90: datetime}
+    forecast.chance(final)          # probability of finishing by final.target
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from src.dag_model import Status
+
+
+class Estimate(namedtuple("Estimate", ["optimistic", "likely", "pessimistic"])):
+    """Three-point estimate of the remaining work on a product, in days, sampled from the
+    triangular distribution with these minimum, mode and maximum.
+    """
+
+
+DEFAULT_ESTIMATE = Estimate(1, 2, 5)
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+class _Network:
+    # The model as arrays, in rows sorted by layer (longest path from the products without
+    # prerequisites), so that each layer only depends on the layers before it. Picklable, to
+    # be sent to worker processes.
+
+    def __init__(self, dag_model, estimates, default):
+        graph = dag_model._graph
+        layer = {}
+        for product in dag_model.order:
+            id = product._uuid
+            layer[id] = 1 + max((layer[pre] for pre in graph[id]), default=-1)
+
+        self.ids = sorted(layer, key=layer.get)
+        row = {id: i for i, id in enumerate(self.ids)}
+        nodes = dag_model._nodes
+
+        bounds = np.array([tuple(estimates.get(id, default)) for id in self.ids], np.float64).reshape(-1, 3)
+        low, mode, high = bounds.T
+        if np.any((low > mode) | (mode > high) | (low < 0)):
+            raise ValueError("Estimates must satisfy 0 <= optimistic <= likely <= pessimistic.")
+        done = np.array([nodes[id].status == Status.DONE for id in self.ids], bool)
+        low, mode, high = (np.where(done, 0, a) for a in (low, mode, high))
+
+        # Terms of the inverse of the triangular CDF, as columns
+        span = high - low
+        cut = np.divide(mode - low, span, out=np.ones_like(span), where=span > 0)
+        self._low, self._high, self._cut, self._rise, self._fall = (
+            a[:, None].astype(np.float32) for a in (low, high, cut, span * (mode - low), span * (high - mode)))
+
+        # Rows of each layer, and the rows of their prerequisites grouped by product (every
+        # product after the first layer has at least one prerequisite)
+        counts = np.bincount([layer[id] for id in self.ids], minlength=1)
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        self.layers = []
+        for l in range(len(counts)):
+            lo, hi = int(starts[l]), int(starts[l + 1])
+            sources, offsets = [], []
+            if l > 0:
+                for id in self.ids[lo:hi]:
+                    offsets.append(len(sources))
+                    sources.extend(row[pre] for pre in graph[id])
+            self.layers.append((lo, hi, np.array(sources, np.intp), np.array(offsets, np.intp)))
+
+    def durations(self, rng, lo, hi, samples):
+        """Draws the durations of rows lo to hi, one column per sample.
+        """
+        u = rng.random((hi - lo, samples), dtype=np.float32)
+        rising = u < self._cut[lo:hi]
+        duration = np.where(rising, u, 1 - u)
+        duration *= np.where(rising, self._rise[lo:hi], self._fall[lo:hi])
+        np.sqrt(duration, out=duration)
+        return np.where(rising, self._low[lo:hi] + duration, self._high[lo:hi] - duration)
+
+    def sample(self, samples, seed, out=None):
+        """Finish times in days from the start, one column per sample.
+        """
+        rng = np.random.default_rng(seed)
+        finish = out if out is not None else np.empty((len(self.ids), samples), np.float32)
+        for lo, hi, sources, offsets in self.layers:
+            duration = self.durations(rng, lo, hi, samples)
+            if len(sources):
+                duration += np.maximum.reduceat(finish[sources], offsets, axis=0)
+            finish[lo:hi] = duration
+        return finish
+
+
+def _summarize(finish, levels, target_days):
+    # Percentiles of each row, and fraction of each row's samples that are on target (NaN
+    # without a target)
+    if len(finish):
+        percentiles = np.percentile(finish, levels, axis=1).T
+    else:
+        percentiles = np.zeros((0, len(levels)))
+    with np.errstate(invalid="ignore"):
+        on_target = np.count_nonzero(finish <= target_days[:, None], axis=1) / max(finish.shape[1], 1)
+    return percentiles, np.where(np.isnan(target_days), np.nan, on_target)
+
+
+def _shared(name, shape):
+    shm = SharedMemory(name)
+    return shm, np.ndarray(shape, np.float32, buffer=shm.buf)
+
+
+def _sample_columns(network, name, shape, columns, seed):
+    shm, finish = _shared(name, shape)
+    try:
+        network.sample(columns.stop - columns.start, seed, out=finish[:, columns])
+    finally:
+        del finish
+        shm.close()
+
+
+def _summarize_rows(name, shape, rows, levels, target_days):
+    shm, finish = _shared(name, shape)
+    try:
+        return _summarize(finish[rows], levels, target_days[rows])
+    finally:
+        del finish
+        shm.close()
+
+
+class Forecast:
+    """Result of `simulate`: completion date distributions of the products of a model.
+
+    Attributes:
+        start (datetime): when the simulated work starts.
+        samples (int): number of simulated schedules.
+    """
+
+    def __init__(self, ids, start, samples, levels, percentiles, chances):
+        self.start = start
+        self.samples = samples
+        self._rows = {id: i for i, id in enumerate(ids)}
+        self._levels = tuple(levels)
+        self._percentiles = percentiles
+        self._chances = chances
+
+    def percentiles(self, product):
+        """Completion date percentiles of a product.
+
+        Returns:
+            dict: percentile -> datetime.
+        """
+        days = self._percentiles[self._rows[product._uuid]]
+        return {level: self.start + timedelta(days=float(d)) for level, d in zip(self._levels, days)}
+
+    def chance(self, product):
+        """Probability that the product is finished by its target date.
+
+        Returns:
+            float or None: None if the product has no target date.
+        """
+        chance = self._chances[self._rows[product._uuid]]
+        return None if np.isnan(chance) else float(chance)
+
+
+def simulate(dag_model, estimates=None, samples=2000, start=None, percentiles=DEFAULT_PERCENTILES,
+             default=DEFAULT_ESTIMATE, seed=None, workers=None):
+    """Simulates many schedules of a model with random durations.
+
+    Each product starts when all of its prerequisites are finished and takes a duration drawn
+    from its estimate; products that are done are taken as finished at the start. All samples
+    are propagated through the model at once as NumPy arrays, one layer of the dependency
+    graph at a time, which takes O((N + E) * samples) work but only O(depth) Python steps.
+    Memory grows as N * samples (4 bytes each).
+
+    With `workers`, the samples are simulated, and the rows then summarized, in that many
+    processes sharing the finish times through shared memory.
+
+    Args:
+        dag_model (DAGModel): the model; must be acyclic.
+        estimates (dict, optional): Estimate (or (optimistic, likely, pessimistic) days) of the
+            remaining work on each product, keyed by product UUID.
+        samples (int, optional): number of simulated schedules.
+        start (datetime, optional): when the work starts; defaults to now.
+        percentiles (sequence, optional): completion date percentiles to report.
+        default (Estimate, optional): estimate of the products missing from `estimates`.
+        seed (int, optional): seed for reproducible results.
+        workers (int, optional): split the samples over this many worker processes.
+
+    Returns:
+        Forecast: completion date percentiles and chance of meeting the target of each product.
+
+    Raises:
+        CycleError: if the model has a cycle.
+    """
+    estimates = estimates if estimates is not None else {}
+    start = start if start is not None else datetime.now().replace(microsecond=0)
+    network = _Network(dag_model, estimates, default)
+
+    nodes = dag_model._nodes
+    day = timedelta(days=1)
+    target_days = np.array([(nodes[id].target - start) / day if nodes[id].target is not None else np.nan
+                            for id in network.ids], np.float64)
+    levels = tuple(percentiles)
+
+    seeds = np.random.SeedSequence(seed)
+    if workers is None or workers <= 1:
+        finish = network.sample(samples, seeds)
+        summary = _summarize(finish, levels, target_days)
+    else:
+        summary = _simulate_in_pool(network, samples, levels, target_days, seeds, workers)
+    return Forecast(network.ids, start, samples, levels, *summary)
+
+
+def _simulate_in_pool(network, samples, levels, target_days, seeds, workers):
+    # The finish times live in shared memory: each worker simulates some of the samples (all
+    # rows), then each summarizes some of the rows (all samples)
+    shape = (len(network.ids), samples)
+    shm = SharedMemory(create=True, size=max(shape[0] * shape[1] * 4, 1))
+    try:
+        columns = [slice(int(part[0]), int(part[-1]) + 1)
+                   for part in np.array_split(np.arange(samples), workers) if len(part)]
+        rows = [slice(int(part[0]), int(part[-1]) + 1)
+                for part in np.array_split(np.arange(shape[0]), workers) if len(part)]
+        # Spawned rather than forked: the shell and servers may be running other threads
+        with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as executor:
+            list(executor.map(_sample_columns, repeat(network), repeat(shm.name), repeat(shape),
+                              columns, seeds.spawn(len(columns))))
+            parts = list(executor.map(_summarize_rows, repeat(shm.name), repeat(shape), rows,
+                                      repeat(levels), repeat(target_days)))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if not parts:
+        return _summarize(np.zeros(shape, np.float32), levels, target_days)
+    return (np.concatenate([percentiles for percentiles, _ in parts]),
+            np.concatenate([chances for _, chances in parts]))
@@ -0,0 +1,392 @@
+"""Columnar copy of product fields, for filtering large models without looping over Products.
+
+Example:
+
+    columns = ProductColumns(dag_model)
+    columns.find("status=to_do target>=today target<=+14d upstream='Final construct'")
+"""
+import re
+
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from shlex import split
+
+import numpy as np
+
+from src.dag_model import DAGObserver, Status
+
+
+_NAT = np.datetime64("NaT", "s")
+_NAT_SECONDS = np.iinfo(np.int64).min
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+_TERM = re.compile(r"^(\w+)(<=|>=|!=|=|<|>|~)(.*)$", re.DOTALL)
+_RELATIVE = re.compile(r"^([+-]\d+)([dw])$")
+_DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%m/%d/%y", "%m-%d-%y"]
+
+
+def _datetime64(value):
+    return np.datetime64(value, "s") if value is not None else _NAT
+
+
+def _datetime64_column(values, count):
+    # Much faster than letting NumPy convert datetime objects one by one
+    seconds = np.fromiter((_NAT_SECONDS if value is None else (value - _EPOCH) // _SECOND
+                           for value in values), np.int64, count)
+    return seconds.view("datetime64[s]")
+
+
+def parse_date(string, now=None):
+    """Parses a date in a query: `today`, an offset from today such as `+14d` or `-2w`, or a
+    date in one of _DATE_FORMATS.
+
+    Returns:
+        datetime: the date.
+
+    Raises:
+        ValueError: if the string is not a date.
+    """
+    today = (now if now is not None else datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    string = string.strip().lower()
+    if string == "today":
+        return today
+
+    relative = _RELATIVE.match(string)
+    if relative is not None:
+        count, unit = int(relative.group(1)), relative.group(2)
+        return today + timedelta(days=count * (7 if unit == "w" else 1))
+
+    for format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(string, format)
+        except ValueError:
+            continue
+    raise ValueError(f"Could not parse {string} as a date.")
+
+
+class ProductColumns(DAGObserver):
+    """Product fields stored column-wise in NumPy arrays, one row per product, kept in sync
+    with a DAGModel as an observer.
+
+    Status is stored as int8, target and creation dates as datetime64 (NaT for no target),
+    and names as ids into a table of distinct names. Prerequisite and successor lists are
+    kept by row, so upstream/downstream cones are walked without hashing UUIDs. Filters are
+    boolean masks over the rows, combined with NumPy operators; `select` turns a mask into
+    products.
+
+    Rows of removed products are reused; the `alive` column tells which rows hold a product.
+
+    Args:
+        dag_model (DAGModel): the model to mirror.
+    """
+
+    def __init__(self, dag_model):
+        self.dag_model = dag_model
+        self._rows = {}
+        self._products = []
+        self._free = []
+        self._names = {}
+        self._name_list = []
+        self._prerequisites = []
+        self._successors = []
+        # Successor rows of prerequisites that are not loaded yet (see plan_file.load_cone)
+        self._pending = {}
+
+        with self._read_lock():
+            products = list(dag_model._nodes.values())
+            count = len(products)
+            capacity = max(1024, count)
+
+            self.status = np.zeros(capacity, np.int8)
+            self.status[:count] = np.fromiter((p.status.value for p in products), np.int8, count)
+            self.target = np.full(capacity, _NAT)
+            self.target[:count] = _datetime64_column((p.target for p in products), count)
+            self.created = np.full(capacity, _NAT)
+            self.created[:count] = _datetime64_column((p._created for p in products), count)
+            self.name_id = np.zeros(capacity, np.int32)
+            self.name_id[:count] = np.fromiter((self._name_id(p.name) for p in products), np.int32, count)
+            self.alive = np.zeros(capacity, bool)
+            self.alive[:count] = True
+
+            self._products = products
+            self._rows = {p._uuid: row for row, p in enumerate(products)}
+            self._prerequisites = [[] for _ in products]
+            self._successors = [[] for _ in products]
+            for product in products:
+                self._link(product, dag_model._graph[product._uuid])
+
+            dag_model.subscribe(self)
+
+    def close(self):
+        """Stops following the model.
+        """
+        self.dag_model.unsubscribe(self)
+
+    def _read_lock(self):
+        lock = self.dag_model._lock
+        return lock.read() if lock is not None else nullcontext()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def size(self):
+        """Number of rows in use, including free ones; masks have this length.
+        """
+        return len(self._products)
+
+    def _name_id(self, name):
+        id = self._names.get(name)
+        if id is None:
+            id = self._names[name] = len(self._name_list)
+            self._name_list.append(name)
+        return id
+
+    def _grow(self):
+        for column in ("status", "target", "created", "name_id", "alive"):
+            array = getattr(self, column)
+            grown = np.zeros(2 * len(array), array.dtype)
+            if array.dtype.kind == "M":
+                grown[:] = _NAT
+            grown[:len(array)] = array
+            setattr(self, column, grown)
+
+    def _link(self, product, prerequisite_ids):
+        row = self._rows[product._uuid]
+        for id in prerequisite_ids:
+            pre = self._rows.get(id)
+            if pre is None:
+                self._pending.setdefault(id, []).append(row)
+            else:
+                self._prerequisites[row].append(pre)
+                self._successors[pre].append(row)
+
+    def _unlink(self, product, prerequisite_ids):
+        row = self._rows[product._uuid]
+        for id in prerequisite_ids:
+            pre = self._rows.get(id)
+            if pre is None:
+                pending = self._pending.get(id, [])
+                if row in pending:
+                    pending.remove(row)
+            else:
+                self._prerequisites[row].remove(pre)
+                self._successors[pre].remove(row)
+
+    # --- DAGObserver ---
+
+    def product_added(self, dag_model, product):
+        if self._free:
+            row = self._free.pop()
+            self._products[row] = product
+        else:
+            row = len(self._products)
+            if row == len(self.alive):
+                self._grow()
+            self._products.append(product)
+            self._prerequisites.append([])
+            self._successors.append([])
+
+        self._rows[product._uuid] = row
+        self.status[row] = product.status.value
+        self.target[row] = _datetime64(product.target)
+        self.created[row] = _datetime64(product._created)
+        self.name_id[row] = self._name_id(product.name)
+        self.alive[row] = True
+
+        for successor in self._pending.pop(product._uuid, []):
+            self._prerequisites[successor].append(row)
+            self._successors[row].append(successor)
+
+    def product_removed(self, dag_model, product):
+        row = self._rows.pop(product._uuid)
+        self._products[row] = None
+        self._prerequisites[row] = []
+        self._successors[row] = []
+        self.alive[row] = False
+        self._free.append(row)
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        self._link(product, prerequisite_ids)
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        self._unlink(product, prerequisite_ids)
+
+    def product_changed(self, dag_model, product, name, old, new):
+        row = self._rows.get(product._uuid)
+        if row is None:
+            return
+        if name == "status":
+            self.status[row] = new.value
+        elif name == "target":
+            self.target[row] = _datetime64(new)
+        elif name == "name":
+            self.name_id[row] = self._name_id(new)
+
+    # --- masks ---
+
+    def all(self):
+        return self.alive[:self.size].copy()
+
+    def status_is(self, *statuses):
+        return np.isin(self.status[:self.size], [status.value for status in statuses]) & self.alive[:self.size]
+
+    def name_is(self, name):
+        id = self._names.get(name)
+        if id is None:
+            return np.zeros(self.size, bool)
+        return (self.name_id[:self.size] == id) & self.alive[:self.size]
+
+    def name_contains(self, text):
+        text = text.lower()
+        ids = [id for id, name in enumerate(self._name_list) if text in name.lower()]
+        return np.isin(self.name_id[:self.size], ids) & self.alive[:self.size]
+
+    def compare(self, column, op, date):
+        """Mask of products whose `column` ("target" or "created") compares to a date with
+        `op` ("<", "<=", ">", ">=", "=" or "!="). `date` may be None to test for no date.
+        """
+        values = getattr(self, column)[:self.size]
+        alive = self.alive[:self.size]
+        if date is None:
+            if op not in ("=", "!="):
+                raise ValueError(f"Cannot compare {column} to none with {op}.")
+            missing = np.isnat(values)
+            return (missing if op == "=" else ~missing) & alive
+
+        date = np.datetime64(date, "s")
+        if op in ("=", "!="):
+            # Same day
+            days = values.astype("datetime64[D]") == date.astype("datetime64[D]")
+            return (days if op == "=" else ~days & ~np.isnat(values)) & alive
+        compare = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}[op]
+        return compare(values, date) & alive
+
+    def _cone(self, products, adjacency):
+        mask = np.zeros(self.size, bool)
+        queue = [self._rows[p._uuid] for p in products if p._uuid in self._rows]
+        while queue:
+            for next in adjacency[queue.pop()]:
+                if not mask[next]:
+                    mask[next] = True
+                    queue.append(next)
+        return mask
+
+    def upstream(self, *products):
+        """Mask of the (loaded) prerequisites of the products, direct or not.
+        """
+        return self._cone(products, self._prerequisites)
+
+    def downstream(self, *products):
+        """Mask of the (loaded) products that depend on the products, directly or not.
+        """
+        return self._cone(products, self._successors)
+
+    def select(self, mask):
+        """The products where `mask` is True.
+        """
+        return [self._products[row] for row in np.flatnonzero(mask)]
+
+    # --- expressions ---
+
+    def mask(self, expression, now=None):
+        """Evaluates a filter expression to a mask.
+
+        An expression is a list of terms that must all hold, with `or` between alternatives:
+
+            status=to_do target<+14d upstream="Final construct" or status=in_progress
+
+        Terms are <field><op><value>, optionally preceded by `not`:
+            status=<status> or status!=<status>
+            target and created compared with <, <=, >, >=, = (same day) or != to a date
+                (see parse_date) or to `none`
+            name=<name>, name!=<name> or name~<text> (contains, ignoring case)
+            upstream=<name> and downstream=<name>: prerequisites, or successors, of any
+                product with this name
+
+        Args:
+            expression (str): the expression.
+            now (datetime, optional): what relative dates are relative to, now by default.
+
+        Raises:
+            ValueError: if the expression cannot be parsed.
+        """
+        with self._read_lock():
+            tokens = split(expression)
+            self._load_upstream(tokens)
+            result = np.zeros(self.size, bool)
+            for alternative in _split_alternatives(tokens):
+                mask = self.all()
+                negate = False
+                for token in alternative:
+                    if token.lower() == "and":
+                        continue
+                    if token.lower() == "not":
+                        negate = not negate
+                        continue
+                    term = self._term(token, now)
+                    mask &= ~term & self.alive[:self.size] if negate else term
+                    negate = False
+                result |= mask
+            return result
+
+    def _load_upstream(self, tokens):
+        # Brings the prerequisites of upstream=<name> products that are not loaded yet into
+        # the model, before any mask is sized
+        for token in tokens:
+            match = _TERM.match(token)
+            if match is None or match.group(1).lower() != "upstream":
+                continue
+            for product in self.select(self.name_is(match.group(3))):
+                for _ in self.dag_model.all_prerequisites(product):
+                    pass
+
+    def find(self, expression, now=None):
+        """Products matching a filter expression, see `mask`.
+        """
+        with self._read_lock():
+            return self.select(self.mask(expression, now))
+
+    def _term(self, token, now):
+        match = _TERM.match(token)
+        if match is None:
+            raise ValueError(f"Could not parse {token}: expected <field><op><value>.")
+        field, op, value = match.group(1).lower(), match.group(2), match.group(3)
+
+        if field == "status":
+            if op not in ("=", "!="):
+                raise ValueError(f"Cannot compare status with {op}.")
+            mask = self.status_is(Status.from_string(value))
+            return mask if op == "=" else ~mask & self.alive[:self.size]
+
+        if field in ("target", "created"):
+            date = None if value.strip().lower() == "none" else parse_date(value, now)
+            return self.compare(field, op, date)
+
+        if field == "name":
+            if op == "~":
+                return self.name_contains(value)
+            if op not in ("=", "!="):
+                raise ValueError(f"Cannot compare name with {op}.")
+            mask = self.name_is(value)
+            return mask if op == "=" else ~mask & self.alive[:self.size]
+
+        if field in ("upstream", "downstream"):
+            if op != "=":
+                raise ValueError(f"Use {field}=<name>.")
+            products = self.select(self.name_is(value))
+            if not products:
+                raise ValueError(f"No product with name {value} found.")
+            return self.upstream(*products) if field == "upstream" else self.downstream(*products)
+
+        raise ValueError(f"Unknown field {field}.")
+
+
+def _split_alternatives(tokens):
+    alternatives = [[]]
+    for token in tokens:
+        if token.lower() == "or":
+            alternatives.append([])
+        else:
+            alternatives[-1].append(token)
+    return alternatives
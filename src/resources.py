@@ -0,0 +1,328 @@
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from urllib.parse import urlparse, unquote
+
+from src.dag_model import DAGObserver
+
+
+ResourceCheck = namedtuple("ResourceCheck", ["resource", "ok", "detail", "elapsed"])
+ResourceCheck.__doc__ = """Result of checking one resource.
+
+    resource (str): the checked resource.
+    ok (bool or None): whether the resource is reachable, None if it could not be determined.
+    detail (str): human-readable reason.
+    elapsed (float): seconds spent checking.
+"""
+
+
+def check_local_path(resource, timeout=None):
+    path = os.path.expandvars(os.path.expanduser(resource))
+    if timeout is None:
+        exists = os.path.exists(path)
+    else:
+        # Paths on unreachable network mounts can block for minutes, so wait on another
+        # thread, left behind if it does not answer in time
+        answer = []
+        thread = threading.Thread(target=lambda: answer.append(os.path.exists(path)), daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if not answer:
+            return None, f"no answer after {timeout}s"
+        exists = answer[0]
+
+    if exists:
+        return True, "exists"
+    return False, "no such file or directory"
+
+
+def check_file_uri(resource, timeout=None):
+    parsed = urlparse(resource)
+    path = unquote(parsed.path)
+    if parsed.netloc and parsed.netloc != "localhost":
+        path = f"//{parsed.netloc}{path}"
+    return check_local_path(path, timeout)
+
+
+def check_http(resource, timeout=None):
+    def request(method):
+        req = urllib.request.Request(resource, method=method)
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status
+
+    try:
+        try:
+            status = request("HEAD")
+        except urllib.error.HTTPError as e:
+            # Some servers refuse HEAD but serve GET
+            if e.code not in {403, 405, 501}:
+                raise
+            status = request("GET")
+        return True, f"HTTP {status}"
+    except urllib.error.HTTPError as e:
+        return False, f"HTTP {e.code}"
+    except (urllib.error.URLError, OSError) as e:
+        reason = getattr(e, "reason", e)
+        # A slow or briefly unreachable server is not a broken link
+        if isinstance(reason, (TimeoutError, ConnectionError)):
+            return None, str(reason) or type(reason).__name__
+        return False, str(reason)
+
+
+class ResourceCache:
+    """Thread-safe cache of resource check results that expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get(self, resource):
+        with self._lock:
+            entry = self._results.get(resource)
+            if entry is None:
+                return None
+
+            result, checked_at = entry
+            if time.monotonic() - checked_at > self.ttl:
+                del self._results[resource]
+                return None
+            return result
+
+    def put(self, result):
+        with self._lock:
+            self._results[result.resource] = (result, time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+class ResourceChecker:
+    """Checks many resources concurrently on a thread pool.
+
+    Resources are dispatched on their URI scheme: plain paths (including Windows drive
+    paths) and `file://` URIs are checked on disk, `http(s)://` with a HEAD request.
+    Other schemes can be supported with `register`.
+
+    Args:
+        max_workers (int, optional): number of checking threads.
+        timeout (float, optional): per-resource timeout in seconds, passed to the checkers.
+        ttl (float, optional): seconds for which results are cached.
+    """
+
+    def __init__(self, max_workers=32, timeout=5, ttl=300):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = ResourceCache(ttl)
+        self._checkers = {
+            "": check_local_path,
+            "file": check_file_uri,
+            "http": check_http,
+            "https": check_http,
+        }
+
+    def register(self, scheme, checker):
+        """Registers a checker for a URI scheme.
+
+        Args:
+            scheme (str): lower-case scheme, e.g. "s3".
+            checker (callable): called as checker(resource, timeout=...) and returning
+                (ok, detail).
+        """
+        self._checkers[scheme.lower()] = checker
+
+    def _checker_for(self, resource):
+        scheme = urlparse(resource).scheme.lower()
+        if len(scheme) == 1:
+            # Windows drive letter, e.g. C:\data
+            scheme = ""
+        return self._checkers.get(scheme)
+
+    def check(self, resource):
+        """Checks a single resource, using the cache if possible.
+        """
+        cached = self.cache.get(resource)
+        if cached is not None:
+            return cached
+
+        checker = self._checker_for(resource)
+        start = time.perf_counter()
+        if checker is None:
+            ok, detail = None, "unsupported scheme"
+        else:
+            try:
+                ok, detail = checker(resource, timeout=self.timeout)
+            except Exception as e:
+                ok, detail = False, f"{type(e).__name__}: {e}"
+        result = ResourceCheck(resource, ok, detail, time.perf_counter() - start)
+
+        if ok is not None:
+            self.cache.put(result)
+        return result
+
+    def check_all(self, resources, budget=None):
+        """Checks resources concurrently, yielding results as they finish.
+
+        Cached results are yielded first. If `budget` seconds pass before every check has
+        finished, the remaining resources are yielded with ok=None and the pending checks
+        are cancelled.
+
+        Args:
+            resources (iterable): resources to check, duplicates are checked once.
+            budget (float, optional): overall time limit in seconds.
+
+        Yields:
+            ResourceCheck: one result per distinct resource.
+        """
+        deadline = time.monotonic() + budget if budget is not None else None
+        pending = []
+        for resource in dict.fromkeys(resources):
+            cached = self.cache.get(resource)
+            if cached is not None:
+                yield cached
+            else:
+                pending.append(resource)
+
+        if not pending:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending)))
+        started = time.perf_counter()
+        futures = {executor.submit(self.check, resource): resource for resource in pending}
+        try:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            for future in as_completed(futures, timeout=remaining):
+                yield future.result()
+                del futures[future]
+        except TimeoutError:
+            elapsed = time.perf_counter() - started
+            for resource in futures.values():
+                yield ResourceCheck(resource, None, "time budget exceeded", elapsed)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ResourceIndex(DAGObserver):
+    """Reverse index from each resource to the products using it, kept in sync with a model.
+
+    Resources are the interned strings held by the products (see Product.INTERNED), so the
+    index adds one entry per distinct resource rather than a copy of each. Only assigning a
+    product's `resources` is seen, not editing the list in place.
+
+    Args:
+        dag_model (DAGModel): the model to index.
+    """
+
+    def __init__(self, dag_model):
+        self.dag_model = dag_model
+        self._users = {}
+        for product in dag_model.products:
+            self._add(product, product.resources)
+        dag_model.subscribe(self)
+
+    def close(self):
+        """Stops following the model.
+        """
+        self.dag_model.unsubscribe(self)
+
+    def _add(self, product, resources):
+        for resource in resources:
+            self._users.setdefault(resource, {})[product._uuid] = product
+
+    def _remove(self, product, resources):
+        for resource in resources:
+            users = self._users.get(resource)
+            if users is not None:
+                users.pop(product._uuid, None)
+                if not users:
+                    del self._users[resource]
+
+    def product_added(self, dag_model, product):
+        self._add(product, product.resources)
+
+    def product_removed(self, dag_model, product):
+        self._remove(product, product.resources)
+
+    def product_changed(self, dag_model, product, name, old, new):
+        if name == "resources":
+            self._remove(product, old)
+            self._add(product, new)
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, resource):
+        return resource in self._users
+
+    @property
+    def resources(self):
+        """Every distinct resource in the model.
+        """
+        return list(self._users)
+
+    def products_using(self, resource):
+        """Products that list a resource, in O(1) plus the size of the result.
+        """
+        return list(self._users.get(resource, {}).values())
+
+    def usage(self):
+        """resource -> list of Products, as from `collect_resources`.
+        """
+        return {resource: list(users.values()) for resource, users in self._users.items()}
+
+
+def collect_resources(dag_model, product=None, index=None):
+    """Maps each resource in the DAG (or in a product and its prerequisites) to the products using it.
+
+    Args:
+        dag_model (DAGModel): the model to collect resources from.
+        product (Product, optional): restrict to this product's upstream cone.
+        index (ResourceIndex, optional): index of the model, to answer without a scan of
+            every product.
+
+    Returns:
+        dict: resource (str) -> list of Products.
+    """
+    if product is None and index is not None:
+        return index.usage()
+    if product is None:
+        products = dag_model.products
+    else:
+        products = [product, *dag_model.all_prerequisites(product)]
+
+    usage = {}
+    seen = set()
+    for p in products:
+        if p._uuid in seen:
+            continue
+        seen.add(p._uuid)
+        for resource in p.resources:
+            usage.setdefault(resource, []).append(p)
+    return usage
+
+
+def check_resources(dag_model, product=None, checker=None, budget=None, index=None):
+    """Checks every resource in the DAG, or in a product's upstream cone.
+
+    Args:
+        dag_model (DAGModel): the model to check.
+        product (Product, optional): restrict to this product and its prerequisites.
+        checker (ResourceChecker, optional): checker to use, keeping its cache between calls.
+        budget (float, optional): overall time limit in seconds.
+        index (ResourceIndex, optional): index of the model, see `collect_resources`.
+
+    Yields:
+        (ResourceCheck, list): each result, with the products that use the resource.
+    """
+    checker = checker if checker is not None else ResourceChecker()
+    usage = collect_resources(dag_model, product, index)
+
+    for result in checker.check_all(usage.keys(), budget=budget):
+        yield result, usage[result.resource]
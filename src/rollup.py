@@ -0,0 +1,263 @@
+from collections import namedtuple
+
+import numpy as np
+
+from src.dag_model import DAGObserver, Status
+
+
+class Progress(namedtuple("Progress", ["done", "in_progress", "total"])):
+    """Status counts over a product and all of its prerequisites.
+    """
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def __str__(self):
+        return f"{self.done}/{self.total} done ({self.fraction:.0%}), {self.in_progress} in progress"
+
+
+# Number of set bits in each byte value
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], np.int32)
+
+
+class ProgressRollUp(DAGObserver):
+    """Maintains, for every product, how many products of its cone (itself and all of its
+    prerequisites, direct or not) are done, in progress, or in total.
+
+    Each product's cone is kept as a bitset over the rows of the columns, alongside one
+    bitset per status of the rows that have it. A product's counts are then popcounts of its
+    cone, alone and masked by status: O(N / 8) bytes, with no traversal. Marking a product
+    flips its status bits in O(1). Adding an edge ORs the prerequisite's cone into the cones
+    of the product's downstream cone; removing one rebuilds the cones of the downstream cone
+    from their prerequisites, in topological order. The endpoints of the model are also
+    maintained incrementally.
+
+    The bitsets take N² / 8 bytes, so they are only kept while the columns have at most
+    `max_rows` rows (128 MiB at the default). Above that, counts fall back to walking a
+    product's cone the first time they are asked for, and are then adjusted along the
+    downstream cone when a status changes; edge changes invalidate the counts downstream.
+
+    Built on a ProductColumns, whose rows and adjacency lists it shares; it must be created
+    after the columns so that it sees each change after them.
+
+    Args:
+        columns (ProductColumns): the columns of the model.
+        max_rows (int, optional): the most rows for which cones are kept as bitsets.
+    """
+
+    def __init__(self, columns, max_rows=2**15):
+        self.columns = columns
+        self.dag_model = columns.dag_model
+        self.max_rows = max_rows
+
+        # Bitsets: row -> rows of its cone, and status -> rows with that status
+        self._cones = None
+        self._statuses = None
+        # Counts when the bitsets would be too large
+        self._counts = None
+        self._dirty = None
+        self._grow()
+        if self._cones is not None:
+            alive = np.flatnonzero(columns.alive[:columns.size])
+            for status in Status:
+                self._statuses[status.value] = self._bits(alive[columns.status[alive] == status.value])
+            self._rebuild(set(alive.tolist()))
+
+        # uuid -> row of every product without successors
+        self._endpoints = {id: row for id, row in columns._rows.items() if not columns._successors[row]}
+
+        self.dag_model.subscribe(self)
+
+    def close(self):
+        """Stops following the model.
+        """
+        self.dag_model.unsubscribe(self)
+
+    def _reach(self, row, adjacency):
+        # The row and every row reachable from it
+        seen = {row}
+        queue = [row]
+        while queue:
+            for next in adjacency[queue.pop()]:
+                if next not in seen:
+                    seen.add(next)
+                    queue.append(next)
+        return seen
+
+    def _grow(self):
+        capacity = len(self.columns.alive)
+        if self._cones is None and self._counts is None and capacity <= self.max_rows:
+            width = (capacity + 7) // 8
+            self._cones = np.zeros((capacity, width), np.uint8)
+            self._statuses = np.zeros((len(Status), width), np.uint8)
+        elif self._cones is not None and len(self._cones) < capacity:
+            if capacity <= self.max_rows:
+                width = (capacity + 7) // 8
+                cones = np.zeros((capacity, width), np.uint8)
+                cones[:len(self._cones), :self._cones.shape[1]] = self._cones
+                statuses = np.zeros((len(Status), width), np.uint8)
+                statuses[:, :self._statuses.shape[1]] = self._statuses
+                self._cones, self._statuses = cones, statuses
+            else:
+                self._cones = self._statuses = None
+
+        if self._cones is None:
+            if self._counts is None:
+                self._counts = np.zeros((0, len(Status)), np.int32)
+                self._dirty = np.ones(0, bool)
+            if len(self._dirty) < capacity:
+                counts = np.zeros((capacity, len(Status)), np.int32)
+                counts[:len(self._counts)] = self._counts
+                self._counts = counts
+                dirty = np.ones(capacity, bool)
+                dirty[:len(self._dirty)] = self._dirty
+                self._dirty = dirty
+
+    # --- bitsets ---
+
+    def _bits(self, rows):
+        bits = np.zeros(self._cones.shape[1], np.uint8)
+        rows = np.asarray(list(rows), np.intp)
+        np.bitwise_or.at(bits, rows >> 3, np.left_shift(1, rows & 7).astype(np.uint8))
+        return bits
+
+    def _combine(self, row):
+        # A row's cone from those of its prerequisites
+        prerequisites = self.columns._prerequisites[row]
+        cone = self._cones[row]
+        if prerequisites:
+            np.bitwise_or.reduce(self._cones[prerequisites], axis=0, out=cone)
+        else:
+            cone[:] = 0
+        cone[row >> 3] |= 1 << (row & 7)
+
+    def _rebuild(self, rows):
+        # Recomputes the cones of `rows`, prerequisites first; the cones of their
+        # prerequisites outside `rows` must be up to date
+        prerequisites, successors = self.columns._prerequisites, self.columns._successors
+        waiting = {row: sum(pre in rows for pre in prerequisites[row]) for row in rows}
+        ready = [row for row, count in waiting.items() if count == 0]
+        while ready:
+            row = ready.pop()
+            del waiting[row]
+            self._combine(row)
+            for next in successors[row]:
+                if next in waiting:
+                    waiting[next] -= 1
+                    if waiting[next] == 0:
+                        ready.append(next)
+        # What is left is on or after a cycle
+        for row in waiting:
+            self._cones[row] = self._bits(self._reach(row, prerequisites))
+
+    def _spread(self, row):
+        # ORs a row's cone into the cones of the rows downstream of it
+        rows = list(self._reach(row, self.columns._successors))
+        self._cones[rows] |= self._cones[row]
+
+    def _set_status(self, row, status):
+        self._statuses[:, row >> 3] &= ~np.uint8(1 << (row & 7))
+        self._statuses[status.value, row >> 3] |= 1 << (row & 7)
+
+    # --- counts ---
+
+    def _invalidate(self, row):
+        rows = self._reach(row, self.columns._successors)
+        self._dirty[list(rows)] = True
+
+    def _update_endpoints(self, rows):
+        successors = self.columns._successors
+        for row in rows:
+            id = self.columns._products[row]._uuid
+            if successors[row]:
+                self._endpoints.pop(id, None)
+            else:
+                self._endpoints[id] = row
+
+    def progress(self, product):
+        """Status counts over the product's cone.
+
+        Returns:
+            Progress: the counts.
+        """
+        with self.columns._read_lock():
+            row = self.columns._rows[product._uuid]
+            if self._cones is not None:
+                cone = self._cones[row]
+                return Progress(int(_POPCOUNT[cone & self._statuses[Status.DONE.value]].sum()),
+                                int(_POPCOUNT[cone & self._statuses[Status.IN_PROGRESS.value]].sum()),
+                                int(_POPCOUNT[cone].sum()))
+
+            if self._dirty[row]:
+                cone = list(self._reach(row, self.columns._prerequisites))
+                self._counts[row] = np.bincount(self.columns.status[cone], minlength=len(Status))
+                self._dirty[row] = False
+            done, in_progress = self._counts[row, Status.DONE.value], self._counts[row, Status.IN_PROGRESS.value]
+            return Progress(int(done), int(in_progress), int(self._counts[row].sum()))
+
+    def downstream(self, product):
+        """Products whose progress changes with the status of `product`: itself and the
+        products that depend on it, directly or not.
+        """
+        with self.columns._read_lock():
+            row = self.columns._rows.get(product._uuid)
+            if row is None:
+                return []
+            products = self.columns._products
+            return [products[row] for row in self._reach(row, self.columns._successors)]
+
+    @property
+    def endpoints(self):
+        """Products with no successors, as DAGModel.endpoints but without a full traversal.
+        """
+        with self.columns._read_lock():
+            return [self.columns._products[row] for row in self._endpoints.values()]
+
+    # --- DAGObserver ---
+
+    def product_added(self, dag_model, product):
+        self._grow()
+        row = self.columns._rows[product._uuid]
+        if self._cones is not None:
+            # The row may be reused, and edges to it linked if it was loaded lazily
+            self._set_status(row, product.status)
+            self._combine(row)
+            self._spread(row)
+        else:
+            self._invalidate(row)
+        self._update_endpoints([row, *self.columns._prerequisites[row]])
+
+    def product_removed(self, dag_model, product):
+        # Its edges were removed first, so no cone holds its row any more, and only the
+        # product itself can leave the endpoints
+        self._endpoints.pop(product._uuid, None)
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        row = self.columns._rows[product._uuid]
+        if self._cones is not None:
+            self._combine(row)
+            self._spread(row)
+        else:
+            self._invalidate(row)
+        self._update_endpoints(self.columns._prerequisites[row])
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        row = self.columns._rows[product._uuid]
+        if self._cones is not None:
+            self._rebuild(self._reach(row, self.columns._successors))
+        else:
+            self._invalidate(row)
+        rows = self.columns._rows
+        self._update_endpoints([rows[id] for id in prerequisite_ids if id in rows])
+
+    def product_changed(self, dag_model, product, name, old, new):
+        if name != "status" or old == new:
+            return
+        row = self.columns._rows[product._uuid]
+        if self._cones is not None:
+            self._set_status(row, new)
+            return
+        rows = list(self._reach(row, self.columns._successors))
+        self._counts[rows, old.value] -= 1
+        self._counts[rows, new.value] += 1
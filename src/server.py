@@ -0,0 +1,479 @@
+"""Serve one in-memory DAGModel to many clients over a local socket.
+
+The protocol is newline-delimited JSON. Each request is an object
+`{"id": ..., "op": "<operation>", "params": {...}}` and is answered, in order, by
+`{"id": ..., "result": ...}` or `{"id": ..., "error": "...", "type": "<exception name>"}`.
+Clients may pipeline: send many requests before reading any responses.
+
+Run a server with `python -m src.server plan.xml [--socket path | --port n]`.
+"""
+import argparse
+import asyncio
+import io
+import ipaddress
+import json
+import os
+import socket
+import uuid
+
+from datetime import datetime
+
+from src.dag_model import DAGModel, Product, Status, CycleError
+from src.validate import analyze_DAG
+
+
+EDITABLE_FIELDS = ("name", "status", "target", "notes", "resources", "description")
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+
+def _decode_field(name, value):
+    if name == "status":
+        return Status(value)
+    if name == "target":
+        return datetime.fromisoformat(value) if value is not None else None
+    if name == "resources":
+        return list(value)
+    return value
+
+
+def parse_address(address):
+    """Splits an address into ("unix", path) or ("tcp", (host, port)).
+
+    Addresses are either "unix:<path>", a path containing a slash, or "[host:]port".
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    if "/" in address:
+        return "unix", address
+
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def is_loopback(host):
+    """Whether a host name or IP address only accepts connections from this machine.
+    """
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class DAGServer:
+    """Holds a DAGModel and answers requests from any number of connections.
+
+    Operations are the `op_<name>` methods; all of them run on the event loop, so
+    each request sees and leaves the model in a consistent state.
+
+    Args:
+        dag_model (DAGModel, optional): the shared model, empty if not given.
+        path (str, optional): file the model was loaded from, and the only file `save`
+            writes to.
+    """
+
+    def __init__(self, dag_model=None, path=None):
+        self.dag_model = dag_model if dag_model is not None else DAGModel()
+        self.path = path
+
+    # --- operations ---
+
+    def _get(self, id):
+        return self.dag_model.get_product_by_uuid(uuid.UUID(id))
+
+    def _resolve(self, data):
+        # Prerequisites may be given as a uuid or, if new to the server, as a full product
+        if isinstance(data, str):
+            return self._get(data)
+        id = uuid.UUID(data["uuid"])
+        if id in self.dag_model._nodes:
+            return self.dag_model.get_product_by_uuid(id)
+        return Product.from_dict(data)
+
+    def op_ping(self):
+        return "pong"
+
+    def op_get(self, uuid):
+        product = self._get(uuid)
+        return {**product.to_dict(),
+                "prerequisites": [str(pre._uuid) for pre in self.dag_model.get_prerequisites(product)]}
+
+    def op_products(self, name=None):
+        if name is not None:
+            products = self.dag_model.get_products_by_name(name)
+        else:
+            products = self.dag_model.products
+        return [p.to_dict() for p in products]
+
+    def op_prerequisites(self, uuid):
+        return [p.to_dict() for p in self.dag_model.get_prerequisites(self._get(uuid))]
+
+    def op_all_prerequisites(self, uuid):
+        return [p.to_dict() for p in self.dag_model.all_prerequisites(self._get(uuid))]
+
+    def op_successors(self, uuid):
+        return [p.to_dict() for p in self.dag_model.get_successors(self._get(uuid))]
+
+    def op_endpoints(self):
+        return [p.to_dict() for p in self.dag_model.endpoints]
+
+    def op_order(self):
+        return [p.to_dict() for p in self.dag_model.order]
+
+    def op_add(self, product, prerequisites=()):
+        product = self._resolve(product)
+        self.dag_model.add_product(product, *[self._resolve(pre) for pre in prerequisites])
+        return str(product._uuid)
+
+    def op_depends(self, product, prerequisites):
+        product = self._resolve(product)
+        self.dag_model.add_dependency(product, *[self._resolve(pre) for pre in prerequisites])
+
+    def op_free(self, uuid, prerequisites):
+        self.dag_model.remove_dependencies(self._get(uuid), *[self._get(pre) for pre in prerequisites])
+
+    def op_remove(self, uuid):
+        self.dag_model.remove_product(self._get(uuid))
+
+    def op_update(self, uuid, fields):
+        product = self._get(uuid)
+        for name, value in fields.items():
+            if name not in EDITABLE_FIELDS:
+                raise ValueError(f"Field {name} cannot be edited.")
+            setattr(product, name, _decode_field(name, value))
+
+    def op_validate(self):
+        cycles, invalid_dates = analyze_DAG(self.dag_model)
+        cycle = None
+        if cycles:
+            cycle = [f"{p.name} ({str(p._uuid)[-8:]})" for p in cycles[0].witness]
+        return {"valid": not cycles and not invalid_dates, "cycle": cycle,
+                "cycles": [{"products": [str(p._uuid) for p in c.products],
+                            "witness": [str(p._uuid) for p in c.witness],
+                            "break_edges": [[str(p._uuid), str(pre._uuid)] for p, pre in c.break_edges]}
+                           for c in cycles],
+                "invalid_dates": [str(p._uuid) for p in invalid_dates]}
+
+    def op_str(self):
+        return str(self.dag_model)
+
+    def op_xml(self):
+        buffer = io.BytesIO()
+        self.dag_model.to_xml(buffer)
+        return buffer.getvalue().decode()
+
+    def op_save(self):
+        # Clients are not authenticated, so they may only save to the server's own file
+        if self.path is None:
+            raise ValueError("No file to save to.")
+        self.dag_model.to_xml(self.path)
+        return self.path
+
+    # --- protocol ---
+
+    def handle_request(self, request):
+        """Runs one decoded request and returns the response object.
+        """
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Requests must be JSON objects.")
+            handler = getattr(self, f"op_{request['op']}", None)
+            if handler is None:
+                raise ValueError(f"Unrecognized operation `{request['op']}`.")
+            response["result"] = handler(**request.get("params", {}))
+        except CycleError as e:
+            response.update(error=e.args[0], type="CycleError", cycle=e.args[1])
+        except Exception as e:
+            response.update(error=str(e), type=type(e).__name__)
+        return response
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            handled = 0
+            while line := await reader.readline():
+                try:
+                    response = self.handle_request(json.loads(line))
+                except json.JSONDecodeError as e:
+                    response = {"id": None, "error": str(e), "type": "JSONDecodeError"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                handled += 1
+
+                # Only wait for the socket when the client is not keeping up
+                if writer.transport.get_write_buffer_size() > 2**20:
+                    await writer.drain()
+                elif handled % 64 == 0:
+                    # A long pipeline is already buffered; let other connections have a turn
+                    await asyncio.sleep(0)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, address=DEFAULT_ADDRESS, allow_remote=False):
+        """Starts listening on `address` (see `parse_address`).
+
+        Clients are not authenticated and may edit the model, so only loopback hosts are
+        accepted unless `allow_remote` is set.
+
+        Returns:
+            asyncio.Server: the listening server.
+
+        Raises:
+            ValueError: if the host is not a loopback address and `allow_remote` is not set.
+        """
+        kind, where = parse_address(address)
+        if kind == "tcp" and not allow_remote and not is_loopback(where[0]):
+            raise ValueError(f"Refusing to listen on {where[0]}: anyone who can reach it could "
+                             f"edit the plan. Use a loopback address, or allow remote clients.")
+        if kind == "unix":
+            if os.path.exists(where):
+                os.unlink(where)
+            return await asyncio.start_unix_server(self._serve_connection, where, limit=2**26)
+        return await asyncio.start_server(self._serve_connection, *where, limit=2**26)
+
+    async def serve_forever(self, address=DEFAULT_ADDRESS, allow_remote=False):
+        server = await self.start(address, allow_remote)
+        async with server:
+            await server.serve_forever()
+
+
+class RemoteError(Exception):
+    """An error raised by the server while running a request.
+    """
+
+    def __init__(self, message, type=None):
+        super().__init__(message)
+        self.type = type
+
+
+class DAGClient:
+    """Blocking client for a DAGServer.
+
+    Args:
+        address (str, optional): server address, see `parse_address`.
+        timeout (float, optional): socket timeout in seconds.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=None):
+        kind, where = parse_address(address)
+        family = socket.AF_UNIX if kind == "unix" else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(where)
+        self._file = self._socket.makefile("rwb")
+        self._next_id = 0
+
+    def call(self, op, **params):
+        """Sends one request and waits for its result.
+        """
+        return self.pipeline([(op, params)])[0]
+
+    def pipeline(self, requests):
+        """Sends all requests before reading any response.
+
+        Args:
+            requests (list): (op, params) pairs.
+
+        Returns:
+            list: the results, in request order.
+
+        Raises:
+            RemoteError or CycleError: for the first request that failed, after all
+                responses have been read.
+        """
+        ids = []
+        for op, params in requests:
+            ids.append(self._next_id)
+            self._file.write(json.dumps({"id": self._next_id, "op": op, "params": params}).encode() + b"\n")
+            self._next_id += 1
+        self._file.flush()
+
+        results, error = [], None
+        for id in ids:
+            response = json.loads(self._file.readline())
+            if response["id"] != id:
+                raise RemoteError(f"Expected response to request {id}, got {response['id']}.")
+            if "error" in response and error is None:
+                if response["type"] == "CycleError":
+                    error = CycleError(response["error"], response["cycle"])
+                else:
+                    error = RemoteError(response["error"], response["type"])
+            results.append(response.get("result"))
+
+        if error is not None:
+            raise error
+        return results
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RemoteDAGModel:
+    """Drop-in stand-in for a DAGModel whose state lives in a DAGServer.
+
+    Products handed out are local copies that keep their identity between calls. Edits
+    made directly to their fields are sent to the server by `flush`, which runs before
+    every request.
+
+    Args:
+        client (DAGClient): connection to the server.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._products = {}
+        self._synced = {}
+
+    def _local(self, data):
+        id = uuid.UUID(data["uuid"])
+        product = self._products.get(id)
+        fresh = Product.from_dict(data)
+        if product is None:
+            product = self._products[id] = fresh
+        else:
+            for name in EDITABLE_FIELDS:
+                setattr(product, name, getattr(fresh, name))
+        self._synced[id] = data
+        return product
+
+    def _track(self, product):
+        if product._uuid not in self._products:
+            self._products[product._uuid] = product
+        self._synced[product._uuid] = product.to_dict()
+
+    def flush(self):
+        """Sends local edits of product fields to the server.
+
+        Only the fields edited since the product was last read are sent, so that edits to
+        other fields made meanwhile by other clients are kept.
+        """
+        updates, changed = [], []
+        for id, product in self._products.items():
+            data = product.to_dict()
+            synced = self._synced.get(id, {})
+            if data != synced:
+                fields = {name: data[name] for name in EDITABLE_FIELDS
+                          if data[name] != synced.get(name)}
+                if not fields:
+                    continue
+                updates.append(("update", {"uuid": str(id), "fields": fields}))
+                changed.append((id, data))
+
+        if updates:
+            self.client.pipeline(updates)
+            self._synced.update(changed)
+
+    def _call(self, op, **params):
+        self.flush()
+        return self.client.call(op, **params)
+
+    def add_product(self, product, *prerequisites):
+        self._call("add", product=product.to_dict(),
+                   prerequisites=[pre.to_dict() for pre in prerequisites])
+        for p in [product, *prerequisites]:
+            self._track(p)
+
+    def add_dependency(self, product, *prerequisites):
+        self._call("depends", product=product.to_dict(),
+                   prerequisites=[pre.to_dict() for pre in prerequisites])
+        for p in [product, *prerequisites]:
+            self._track(p)
+
+    def remove_product(self, product):
+        self._call("remove", uuid=str(product._uuid))
+        self._products.pop(product._uuid, None)
+        self._synced.pop(product._uuid, None)
+
+    def remove_dependencies(self, product, *prerequisites):
+        self._call("free", uuid=str(product._uuid),
+                   prerequisites=[str(pre._uuid) for pre in prerequisites])
+
+    def get_product_by_uuid(self, uuid):
+        return self._local(self._call("get", uuid=str(uuid)))
+
+    def get_products_by_name(self, product_name):
+        return [self._local(data) for data in self._call("products", name=product_name)]
+
+    def get_prerequisites(self, product):
+        return [self._local(data) for data in self._call("prerequisites", uuid=str(product._uuid))]
+
+    def all_prerequisites(self, product):
+        return (self._local(data) for data in self._call("all_prerequisites", uuid=str(product._uuid)))
+
+    def get_successors(self, product):
+        return [self._local(data) for data in self._call("successors", uuid=str(product._uuid))]
+
+    @property
+    def endpoints(self):
+        return [self._local(data) for data in self._call("endpoints")]
+
+    @property
+    def products(self):
+        return [self._local(data) for data in self._call("products")]
+
+    @property
+    def order(self):
+        return tuple(self._local(data) for data in self._call("order"))
+
+    def to_xml(self, filepath):
+        """Saves the server's model to a file on this machine.
+        """
+        with open(filepath, "w", encoding="utf-8") as file:
+            file.write(self._call("xml"))
+
+    def save(self):
+        """Saves the model on the server, to the file it was loaded from.
+
+        Returns:
+            str: the server's file.
+        """
+        return self._call("save")
+
+    def __str__(self) -> str:
+        return self._call("str")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.server",
+                                     description="Serve a DAG model to LabDAG shells and scripts.")
+    parser.add_argument("file", nargs="?", help="XML file to load, and to save to on exit")
+    parser.add_argument("--socket", help="listen on this Unix socket")
+    parser.add_argument("--port", type=int, help="listen on this localhost port")
+    parser.add_argument("--host", default="127.0.0.1", help="listen on this host with --port")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="allow a --host other than this machine; clients are not authenticated")
+    args = parser.parse_args(argv)
+
+    dag_model = DAGModel.from_xml(args.file) if args.file and os.path.exists(args.file) else None
+    server = DAGServer(dag_model, args.file)
+
+    if args.socket:
+        address = f"unix:{args.socket}"
+    elif args.port:
+        address = f"{args.host}:{args.port}"
+    else:
+        address = DEFAULT_ADDRESS
+
+    print(f"Serving {args.file or 'an empty DAG'} on {address}")
+    try:
+        asyncio.run(server.serve_forever(address, args.allow_remote))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.file:
+            server.dag_model.to_xml(args.file)
+            print(f"Saved to {args.file}")
+
+
+if __name__ == '__main__':
+    main()
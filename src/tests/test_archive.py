@@ -0,0 +1,202 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.archive import archivable, archive_done, is_stub, rehydrate, restore
+from src.dag_model import DAGModel, Product, Status
+from src.dag_controller import LabManagementShell
+from src.history import History
+from src.layout import GraphLayout
+from src.plan_file import load_plan, write_plan
+from src.query import ProductColumns
+from src.validate import LiveValidator, analyze_DAG
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        # D <- C <- B <- A, with A, B and C done; and F <- E, both done
+        self.dag_model = DAGModel()
+        self.a = Product("A", status=Status.DONE, notes="first", resources=["protocol.pdf"])
+        self.b = Product("B", status=Status.DONE, notes="second", description="Digest")
+        self.c = Product("C", status=Status.DONE)
+        self.d = Product("D")
+        self.e = Product("E", status=Status.DONE)
+        self.f = Product("F", status=Status.DONE)
+        self.dag_model.add_product(self.b, self.a)
+        self.dag_model.add_product(self.c, self.b)
+        self.dag_model.add_product(self.d, self.c)
+        self.dag_model.add_product(self.f, self.e)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "archive.ldag")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def names(self):
+        return sorted(p.name for p in self.dag_model.products)
+
+    def test_archivable(self):
+        names = [self.dag_model.get_product_by_uuid(id).name for id in archivable(self.dag_model)]
+        self.assertEqual(sorted(names), ["A", "B", "E", "F"])
+
+    def test_archive(self):
+        columns = ProductColumns(self.dag_model)
+        self.assertEqual(archive_done(self.dag_model, self.path), 4)
+
+        # B stays as a stub, since C still depends on it; its own fields are kept
+        self.assertEqual(self.names(), ["B", "C", "D"])
+        self.assertTrue(is_stub(self.dag_model, self.b))
+        self.assertEqual(self.dag_model._graph[self.b._uuid], frozenset())
+        self.assertEqual((self.b.notes, self.b.description), ("second", "Digest"))
+        self.assertEqual(sorted(p.name for p in columns.find("status=done")), ["B", "C"])
+        columns.close()
+
+        archived = load_plan(self.path)
+        self.assertEqual(sorted(p.name for p in archived.products), ["A", "B", "E", "F"])
+        self.assertEqual(archived.get_product_by_uuid(self.b._uuid).notes, "second")
+
+        self.assertEqual(archive_done(self.dag_model, self.path), 0)
+
+    def test_notes_are_not_stubs(self):
+        self.d.notes = "Archived in the freezer"
+        self.assertFalse(is_stub(self.dag_model, self.d))
+
+    def test_rehydrate(self):
+        archive_done(self.dag_model, self.path)
+        self.assertTrue(rehydrate(self.dag_model, self.b))
+        a, = self.dag_model.get_prerequisites(self.b)
+        self.assertTrue(is_stub(self.dag_model, a))
+        self.assertFalse(rehydrate(self.dag_model, self.b))
+
+        self.assertEqual(restore(self.dag_model, self.d), 1)
+        self.assertEqual(a.resources, ["protocol.pdf"])
+        self.assertEqual(self.names(), ["A", "B", "C", "D"])
+
+    def test_reads_keep_stubs(self):
+        # A stub is a leaf until rehydrated, whatever reads the model
+        reads = {"validate": analyze_DAG,
+                 "live validation": LiveValidator,
+                 "order": lambda dag_model: dag_model.order,
+                 "show": str,
+                 "layout": lambda dag_model: GraphLayout(dag_model).update(),
+                 "prerequisites": lambda dag_model: dag_model.get_prerequisites(self.b),
+                 "find": lambda dag_model: ProductColumns(dag_model).find("upstream=C")}
+        for name, read in reads.items():
+            with self.subTest(read=name):
+                self.tearDown()
+                self.setUp()
+                archive_done(self.dag_model, self.path)
+                read(self.dag_model)
+                self.assertEqual(self.names(), ["B", "C", "D"])
+
+    def test_long_chain(self):
+        dag_model = DAGModel()
+        products = [Product(f"P{i}", status=Status.DONE) for i in range(50)] + [Product("Last")]
+        dag_model.add_product(products[0])
+        for pre, product in zip(products, products[1:]):
+            dag_model.add_product(product, pre)
+        # P49 stays, since Last is not done, and P48 as its stub
+        archive_done(dag_model, self.path)
+        self.assertEqual(len(dag_model._nodes), 3)
+
+        str(dag_model)
+        analyze_DAG(dag_model)
+        self.assertEqual(len(dag_model._nodes), 3)
+
+    def test_undo(self):
+        history = History(self.dag_model)
+        history.begin("archive")
+        archive_done(self.dag_model, self.path)
+        history.commit()
+
+        # Rehydrating is a load, not a step of its own
+        history.begin("show")
+        rehydrate(self.dag_model, self.b)
+        history.commit()
+        self.assertEqual(self.names(), ["A", "B", "C", "D"])
+
+        self.assertEqual(history.undo(), "archive")
+        self.assertEqual(self.names(), ["A", "B", "C", "D", "E", "F"])
+        self.assertFalse(self.dag_model._stubs)
+        self.assertEqual(len(self.dag_model.order), 6)
+
+        self.assertEqual(history.redo(), "archive")
+        self.assertEqual(self.names(), ["A", "B", "C", "D"])
+        self.assertEqual(set(self.dag_model._stubs), {self.a._uuid})
+        self.assertEqual(len(self.dag_model.order), 4)
+
+    def test_snapshot(self):
+        archive_done(self.dag_model, self.path)
+        snapshot = self.dag_model.snapshot()
+        self.assertTrue(is_stub(snapshot, self.b))
+
+        xml = os.path.join(self.tmpdir.name, "plan.xml")
+        snapshot.to_xml(xml)
+        reloaded = DAGModel.from_xml(xml)
+        self.assertTrue(is_stub(reloaded, reloaded.get_product_by_uuid(self.b._uuid)))
+
+    def test_stubs_survive_saving(self):
+        archive_done(self.dag_model, self.path)
+        xml = os.path.join(self.tmpdir.name, "plan.xml")
+        ldag = os.path.join(self.tmpdir.name, "plan.ldag")
+        self.dag_model.to_xml(xml)
+        write_plan(self.dag_model, ldag)
+        # Saving does not bring the archived products back
+        self.assertEqual(self.names(), ["B", "C", "D"])
+
+        for reloaded in (DAGModel.from_xml(xml), load_plan(ldag)):
+            b = reloaded.get_product_by_uuid(self.b._uuid)
+            self.assertTrue(is_stub(reloaded, b))
+            self.assertEqual(restore(reloaded, b), 2)
+            self.assertEqual(sorted(p.name for p in reloaded.products), ["A", "B", "C", "D"])
+
+    def test_archive_again(self):
+        archive_done(self.dag_model, self.path)
+        self.d.status = Status.DONE
+        # C and D; the stub of B leaves the model
+        self.assertEqual(archive_done(self.dag_model, self.path), 2)
+        self.assertEqual(self.names(), [])
+
+        # The stub of B did not replace its full record
+        archived = load_plan(self.path)
+        self.assertEqual(len(archived.products), 6)
+        self.assertEqual(archived.get_product_by_uuid(self.b._uuid).notes, "second")
+        self.assertEqual(archived.get_prerequisites(archived.get_product_by_uuid(self.b._uuid))[0].name, "A")
+
+
+class TestShellArchive(unittest.TestCase):
+    def test_archive_commands(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "archive.ldag")
+            shell = LabManagementShell()
+            shell.onecmd("add Plasmid1 Plasmid0")
+            shell.onecmd("add Plasmid2 Plasmid1")
+            shell.onecmd("add Plasmid3 Plasmid2")
+            for name in ("Plasmid0", "Plasmid1", "Plasmid2"):
+                shell.onecmd(f"mark {name} done")
+            shell.onecmd(f"archive {path}")
+            self.assertEqual(shell.dag_model.get_products_by_name("Plasmid0"), [])
+            self.assertTrue(is_stub(shell.dag_model, shell.dag_model.get_products_by_name("Plasmid1")[0]))
+
+            # Showing the stub brings back its prerequisite
+            with patch("builtins.print"):
+                shell.onecmd("show Plasmid1")
+            self.assertEqual(len(shell.dag_model.get_products_by_name("Plasmid0")), 1)
+
+            # which is not a step of history: undo reverts the archive
+            with patch("builtins.print"):
+                shell.onecmd("undo")
+                shell.onecmd("validate")
+            self.assertEqual(len(shell.dag_model.get_products_by_name("Plasmid0")), 1)
+            self.assertFalse(shell.dag_model._stubs)
+            self.assertEqual(len(shell.dag_model.order), 4)
+            shell.onecmd("redo")
+
+            shell.onecmd("restore Plasmid3")
+            self.assertFalse(any(is_stub(shell.dag_model, p) for p in shell.dag_model.products))
+
+
+if __name__ == '__main__':
+    unittest.main()
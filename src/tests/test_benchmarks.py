@@ -0,0 +1,55 @@
+import unittest
+
+from src.benchmarks.generators import chain, fan_in, fan_out, diamond_lattice, random_layered
+from src.benchmarks.suite import run, compare
+
+
+class TestGenerators(unittest.TestCase):
+    def test_sizes(self):
+        for generator in [chain, fan_in, fan_out, diamond_lattice, random_layered]:
+            dag_model = generator(50)
+            self.assertEqual(len(dag_model.products), 50)
+            # every generated model must be acyclic
+            self.assertEqual(len(dag_model.order), 50)
+
+    def test_shapes(self):
+        self.assertEqual(len(chain(10).endpoints), 1)
+        self.assertEqual(len(fan_in(10).endpoints), 1)
+        self.assertEqual(len(fan_out(10).endpoints), 9)
+        self.assertEqual(len(diamond_lattice(16).endpoints), 1)
+
+    def test_deterministic(self):
+        a = [p.name for p in random_layered(100, seed=3).order]
+        b = [p.name for p in random_layered(100, seed=3).order]
+        self.assertListEqual(a, b)
+
+
+class TestSuite(unittest.TestCase):
+    def test_run(self):
+        results = run(["chain"], [20], ["order", "to_xml", "from_xml", "remove_product"], repeat=1)
+        for op in ["generate", "order", "to_xml", "from_xml", "remove_product"]:
+            self.assertIn("min", results["results"][f"chain/20/{op}"])
+
+    def test_compare(self):
+        baseline = {"results": {"a/1/order": {"min": 1.0}, "a/1/gantt": {"min": 1.0}}}
+        current = {"results": {"a/1/order": {"min": 1.5}, "a/1/gantt": {"min": 1.5},
+                               "a/1/new": {"min": 9.0}}}
+
+        regressions = compare(current, baseline, threshold=0.25)
+        self.assertListEqual(sorted(r[0] for r in regressions), ["a/1/gantt", "a/1/order"])
+
+        regressions = compare(current, baseline, threshold=0.25, thresholds={"gantt": 1.0})
+        self.assertListEqual([r[0] for r in regressions], ["a/1/order"])
+
+    def test_compare_noise(self):
+        # Medians are compared, and sub-floor timings are ignored
+        baseline = {"results": {"a/1/order": {"min": 1.0, "median": 1.1},
+                                "a/1/get": {"min": 1e-4, "median": 2e-4}}}
+        current = {"results": {"a/1/order": {"min": 1.6, "median": 1.2},
+                               "a/1/get": {"min": 3e-4, "median": 5e-3}}}
+        self.assertListEqual(compare(current, baseline), [])
+        self.assertListEqual([r[0] for r in compare(current, baseline, min_time=1e-4)], ["a/1/get"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import pickle
+import random
+import unittest
+from unittest.mock import patch
+
+import matplotlib.pyplot as plt
+
+from src.benchmarks.generators import random_layered, chain
+from src.dag_model import DAGModel, Product, CycleError
+from src.dag_controller import LabManagementShell
+from src.components import Components, analyze_components, order_components, gantt_components, _parts
+from src.validate import analyze_DAG
+
+
+def merged(*dag_models):
+    # One model holding several independent ones
+    dag_model = DAGModel()
+    for part in dag_models:
+        for product in part.order:
+            dag_model.add_product(product, *part.get_prerequisites(product))
+    return dag_model
+
+
+def reference_groups(dag_model):
+    neighbours = {id: set(prereqs) for id, prereqs in dag_model._graph.items()}
+    for id, prereqs in dag_model._graph.items():
+        for pre in prereqs:
+            neighbours[pre].add(id)
+    seen, groups = set(), []
+    for start in neighbours:
+        if start in seen:
+            continue
+        group, stack = set(), [start]
+        while stack:
+            id = stack.pop()
+            if id not in group:
+                group.add(id)
+                stack.extend(neighbours[id] - group)
+        seen |= group
+        groups.append(frozenset(group))
+    return set(groups)
+
+
+class TestComponents(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = merged(random_layered(60, seed=1), random_layered(40, seed=2), chain(10))
+        self.components = Components(self.dag_model)
+
+    def tearDown(self):
+        self.components.close()
+
+    def check(self):
+        self.assertEqual({frozenset(group) for group in self.components.groups()},
+                         reference_groups(self.dag_model))
+        self.assertEqual(len(self.components), len(reference_groups(self.dag_model)))
+
+    def test_groups(self):
+        self.check()
+        sizes = [len(group) for group in self.components.groups()]
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+
+    def test_incremental(self):
+        rng = random.Random(0)
+        self.check()
+        for step in range(200):
+            products = self.dag_model.products
+            action = rng.random()
+            if action < 0.3:
+                self.dag_model.add_product(Product(f"new{step}"))
+            elif action < 0.8:
+                # Links are added from later to earlier products in the order, keeping it a DAG
+                order = self.dag_model.order
+                i, j = sorted(rng.sample(range(len(order)), 2))
+                self.dag_model.add_dependency(order[j], order[i])
+            elif action < 0.9:
+                product = rng.choice(products)
+                prereqs = self.dag_model.get_prerequisites(product)
+                if prereqs:
+                    self.dag_model.remove_dependencies(product, rng.choice(prereqs))
+            else:
+                self.dag_model.remove_product(rng.choice(products))
+            if step % 20 == 0:
+                self.check()
+        self.check()
+
+    def test_same(self):
+        a, b = Product("A"), Product("B")
+        self.dag_model.add_product(a)
+        self.dag_model.add_product(b)
+        self.assertFalse(self.components.same(a, b))
+        self.dag_model.add_dependency(b, a)
+        self.assertTrue(self.components.same(a, b))
+        self.assertFalse(self.components._stale)
+
+
+class TestParallelAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = merged(random_layered(60, seed=1), random_layered(40, seed=2), chain(10))
+
+    def test_analyze(self):
+        # Add a cycle to one of the parts
+        order = self.dag_model.order
+        self.dag_model.add_dependency(order[0], order[-1])
+        expected = analyze_DAG(self.dag_model)
+        for workers in (None, 2):
+            with self.subTest(workers=workers):
+                cycles, dates = analyze_components(self.dag_model, workers=workers)
+                self.assertEqual(sorted(sorted(p._uuid for p in c.products) for c in cycles),
+                                 sorted(sorted(p._uuid for p in c.products) for c in expected.cycles))
+                self.assertEqual(sorted(p._uuid for p in dates),
+                                 sorted(p._uuid for p in expected.invalid_dates))
+                for cycle in cycles:
+                    self.assertIs(cycle.products[0], self.dag_model.get_product_by_uuid(cycle.products[0]._uuid))
+
+    def test_order(self):
+        components = Components(self.dag_model)
+        order = order_components(self.dag_model, components, workers=2)
+        self.assertEqual(len(order), len(self.dag_model.products))
+        position = {p._uuid: i for i, p in enumerate(order)}
+        for id, prereqs in self.dag_model._graph.items():
+            for pre in prereqs:
+                self.assertLess(position[pre], position[id])
+        components.close()
+
+    def test_parts(self):
+        # Workers get positions and dates, not products
+        parts = _parts(self.dag_model, None, targets=True)
+        self.assertEqual(sum(len(group) for group, _ in parts), len(self.dag_model.products))
+        group, part = parts[-1]
+        self.assertEqual(len(group), 10)
+        self.assertNotIn(b"Product", pickle.dumps(part))
+
+    def test_order_cycle(self):
+        product = next(p for p in self.dag_model.order if self.dag_model.get_prerequisites(p))
+        self.dag_model.add_dependency(self.dag_model.get_prerequisites(product)[0], product)
+        with self.assertRaises(CycleError):
+            order_components(self.dag_model, workers=2)
+
+    def test_gantt(self):
+        _, ax = plt.subplots()
+        gantt_components(self.dag_model, ax)
+        self.assertEqual(len(ax.patches), len(self.dag_model.products))
+        plt.close(ax.figure)
+
+    def test_shell(self):
+        shell = LabManagementShell()
+        shell.onecmd("add Plasmid2 Plasmid1")
+        shell.onecmd("add Plasmid4 Plasmid3")
+        with patch("builtins.print") as mock_print:
+            shell.onecmd("validate --workers 2")
+        mock_print.assert_called_with("No problems found.")
+
+        # The shell keeps following the model's components
+        components = shell.components
+        shell.onecmd("add Plasmid5 Plasmid4")
+        with patch("builtins.print"):
+            shell.onecmd("validate --workers 2")
+        self.assertIs(shell.components, components)
+        self.assertEqual(len(components), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import copy
+import pickle
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from src.concurrency import ReadWriteLock, run_on_snapshot
+from src.dag_model import DAGModel, Product, Status
+from src.validate import validate_DAG
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_writer_excludes_readers(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def reader():
+            with lock.read():
+                events.append("read")
+
+        with lock.write():
+            thread = threading.Thread(target=reader)
+            thread.start()
+            time.sleep(0.05)
+            events.append("write done")
+        thread.join()
+
+        self.assertListEqual(events, ["write done", "read"])
+
+    def test_reentrant(self):
+        lock = ReadWriteLock()
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    pass
+        with lock.read():
+            with lock.read():
+                pass
+            with self.assertRaises(RuntimeError):
+                lock.acquire_write()
+
+
+    def test_read_outlives_write(self):
+        lock = ReadWriteLock()
+        lock.acquire_write()
+        lock.acquire_read()
+        lock.release_write()
+        # Still a reader: writers wait for it
+        self.assertEqual(lock._readers, 1)
+        lock.release_read()
+        self.assertEqual(lock._readers, 0)
+        with lock.write():
+            pass
+
+    def test_edit_while_reading(self):
+        dag_model = DAGModel(concurrent=True)
+        product = Product("Plasmid1")
+        dag_model.add_product(product)
+        snapshot = dag_model.snapshot()
+        with dag_model._lock.read():
+            with self.assertRaises(RuntimeError):
+                product.status = Status.DONE
+        self.assertEqual(snapshot.get_product_by_uuid(product._uuid).status, Status.TO_DO)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = DAGModel(concurrent=True)
+        self.product1 = Product("Plasmid1", target=datetime(2024, 1, 30))
+        self.product2 = Product("Plasmid2", target=datetime(2024, 2, 15))
+        self.product3 = Product("Plasmid3")
+        self.dag_model.add_product(self.product2, self.product1)
+
+    def test_isolation(self):
+        snapshot = self.dag_model.snapshot()
+
+        self.dag_model.add_product(self.product3, self.product2)
+        self.dag_model.remove_dependencies(self.product2, self.product1)
+        self.product1.status = Status.DONE
+        self.product1.name = "Renamed"
+
+        self.assertEqual(len(snapshot.products), 2)
+        self.assertListEqual([p._uuid for p in snapshot.get_prerequisites(self.product2)],
+                             [self.product1._uuid])
+        frozen = snapshot.get_product_by_uuid(self.product1._uuid)
+        self.assertEqual(frozen.status, Status.TO_DO)
+        self.assertEqual(frozen.name, "Plasmid1")
+        self.assertEqual(snapshot.get_products_by_name("Plasmid1")[0]._uuid, self.product1._uuid)
+
+        self.assertEqual(len(self.dag_model.products), 3)
+        self.assertEqual(self.dag_model.get_product_by_uuid(self.product1._uuid).status, Status.DONE)
+
+        with self.assertRaises(TypeError):
+            snapshot.add_product(Product("x"))
+
+    def test_non_concurrent_snapshot(self):
+        dag_model = DAGModel()
+        dag_model.add_product(self.product3)
+        snapshot = dag_model.snapshot()
+        self.product3.status = Status.DONE
+        dag_model.remove_product(self.product3)
+
+        self.assertEqual(snapshot.products[0].status, Status.TO_DO)
+
+    def test_background_readers(self):
+        products = [Product(f"p{i}") for i in range(200)]
+        for i, product in enumerate(products):
+            self.dag_model.add_product(product, *products[max(0, i - 2):i])
+
+        futures = [run_on_snapshot(validate_DAG, self.dag_model) for _ in range(4)]
+        for i, product in enumerate(products):
+            product.status = Status.DONE
+            if i % 10 == 0:
+                self.dag_model.add_product(Product(f"new{i}"), product)
+
+        for future in futures:
+            valid, cycle, _ = future.result()
+            self.assertTrue(valid)
+            self.assertIsNone(cycle)
+        self.assertEqual(len(self.dag_model.products), 222)
+
+    def test_copy_and_pickle(self):
+        for clone in [copy.deepcopy(self.dag_model), pickle.loads(pickle.dumps(self.dag_model))]:
+            self.assertTrue(clone.concurrent)
+            self.assertEqual(clone, self.dag_model)
+            clone.add_product(self.product3)
+            self.assertEqual(len(self.dag_model.products), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from datetime import datetime
 from pathlib import Path
@@ -22,6 +24,20 @@ class TestDAGModel(unittest.TestCase):
         self.dag_model.remove_product(self.product1)
         self.assertNotIn(self.product1._uuid, self.dag_model._nodes)
 
+        # edges from successors are removed too
+        self.dag_model.add_product(self.product2, self.product1)
+        self.dag_model.remove_product(self.product1)
+        self.assertEqual(self.dag_model.get_prerequisites(self.product2), [])
+
+    def test_remove_products(self):
+        self.dag_model.add_product(self.product2, self.product1)
+        self.dag_model.add_product(self.product3, self.product2)
+        self.dag_model.add_product(self.product4, self.product1, self.product3)
+        self.dag_model.remove_products(self.product1, self.product2)
+        self.assertEqual(self.dag_model.products, [self.product3, self.product4])
+        self.assertEqual(self.dag_model.get_prerequisites(self.product3), [])
+        self.assertEqual(self.dag_model.get_prerequisites(self.product4), [self.product3])
+
     def test_remove_dependencies(self):
         self.dag_model.add_product(self.product1, self.product2)
         self.dag_model.remove_dependencies(self.product1, self.product2)
@@ -108,6 +124,23 @@ class TestDAGModel(unittest.TestCase):
         # Cleanup
         Path("temp.xml").unlink()
 
+    def test_xml_resource_table(self):
+        self.product1.resources = ["protocol.pdf", "map.gb"]
+        self.product2.resources = ["protocol.pdf"]
+        self.dag_model.add_dependency(self.product2, self.product1)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "plan.xml")
+            self.dag_model.to_xml(path)
+            with open(path) as f:
+                self.assertEqual(f.read().count("protocol.pdf"), 1)
+            dag_2 = DAGModel.from_xml(path)
+
+        self.assertEqual(self.dag_model, dag_2)
+        product1 = dag_2.get_product_by_uuid(self.product1._uuid)
+        product2 = dag_2.get_product_by_uuid(self.product2._uuid)
+        self.assertIs(product1.resources[0], product2.resources[0])
+
     def test_str(self):
         self.dag_model.add_dependency(self.product1, self.product3)
         self.dag_model.add_dependency(self.product2, self.product1)
@@ -0,0 +1,122 @@
+import unittest
+
+from src.dag_model import DAGModel, DAGObserver, Product, Status
+from src.dag_controller import LabManagementShell
+from src.history import History
+
+
+class EdgeCounter(DAGObserver):
+    def __init__(self):
+        self.edges = 0
+        self.products = 0
+
+    def product_added(self, dag_model, product):
+        self.products += 1
+
+    def product_removed(self, dag_model, product):
+        self.products -= 1
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        self.edges += len(prerequisite_ids)
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        self.edges -= len(prerequisite_ids)
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = DAGModel()
+        self.product1 = Product("Plasmid1")
+        self.product2 = Product("Plasmid2")
+        self.product3 = Product("Plasmid3")
+        self.dag_model.add_product(self.product2, self.product1)
+
+        self.counter = EdgeCounter()
+        self.counter.products, self.counter.edges = 2, 1
+        self.dag_model.subscribe(self.counter)
+        self.history = History(self.dag_model)
+
+    def test_undo_redo_structure(self):
+        self.history.begin("add")
+        self.dag_model.add_product(self.product3, self.product2, self.product1)
+        self.history.begin("remove")
+        self.dag_model.remove_product(self.product2)
+        self.history.commit()
+
+        self.assertEqual(len(self.dag_model.products), 2)
+        self.assertEqual((self.counter.products, self.counter.edges), (2, 1))
+
+        self.assertEqual(self.history.undo(), "remove")
+        self.assertEqual(len(self.dag_model.products), 3)
+        self.assertEqual(len(self.dag_model.get_prerequisites(self.product3)), 2)
+        self.assertEqual((self.counter.products, self.counter.edges), (3, 3))
+
+        self.assertEqual(self.history.undo(), "add")
+        self.assertNotIn(self.product3._uuid, self.dag_model._nodes)
+        self.assertEqual((self.counter.products, self.counter.edges), (2, 1))
+        self.assertIsNone(self.history.undo())
+
+        self.assertEqual(self.history.redo(), "add")
+        self.assertEqual(self.history.redo(), "remove")
+        self.assertNotIn(self.product2._uuid, self.dag_model._nodes)
+        self.assertEqual(self.dag_model.get_prerequisites(self.product3), [self.product1])
+        self.assertEqual((self.counter.products, self.counter.edges), (2, 1))
+        self.assertIsNone(self.history.redo())
+
+    def test_undo_fields(self):
+        self.history.begin("mark")
+        self.product1.status = Status.DONE
+        self.product1.status = Status.IN_PROGRESS
+        self.product2.name = "Renamed"
+        self.history.commit()
+
+        self.history.undo()
+        self.assertEqual(self.product1.status, Status.TO_DO)
+        self.assertEqual(self.product2.name, "Plasmid2")
+
+        self.history.redo()
+        self.assertEqual(self.product1.status, Status.IN_PROGRESS)
+        self.assertEqual(self.product2.name, "Renamed")
+
+    def test_new_command_clears_redo(self):
+        self.history.begin("free")
+        self.dag_model.remove_dependencies(self.product2, self.product1)
+        self.history.undo()
+        self.assertTrue(self.history.can_redo)
+
+        self.history.begin("mark")
+        self.product1.status = Status.DONE
+        self.history.commit()
+        self.assertFalse(self.history.can_redo)
+
+    def test_empty_commands_dropped(self):
+        self.history.begin("show")
+        self.history.commit()
+        self.assertFalse(self.history.can_undo)
+
+
+class TestShellUndo(unittest.TestCase):
+    def test_undo_commands(self):
+        shell = LabManagementShell()
+        shell.onecmd("add Plasmid2 Plasmid1")
+        shell.onecmd("mark Plasmid1 done")
+        shell.onecmd("free Plasmid2 Plasmid1")
+
+        shell.onecmd("undo")
+        product2, = shell.dag_model.get_products_by_name("Plasmid2")
+        self.assertEqual(len(shell.dag_model.get_prerequisites(product2)), 1)
+
+        shell.onecmd("undo")
+        product1, = shell.dag_model.get_products_by_name("Plasmid1")
+        self.assertEqual(product1.status, Status.TO_DO)
+
+        shell.onecmd("redo")
+        self.assertEqual(product1.status, Status.DONE)
+
+        shell.onecmd("undo")
+        shell.onecmd("undo")
+        self.assertEqual(len(shell.dag_model.products), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
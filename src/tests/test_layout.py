@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from src.benchmarks.generators import random_layered, chain
+from src.dag_model import DAGModel, Product
+from src.dag_controller import LabManagementShell
+from src.layout import GraphLayout, ROW_GAP, crossings
+
+
+class TestGraphLayout(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = random_layered(200, seed=2)
+        self.layout = GraphLayout(self.dag_model)
+
+    def check(self, layout):
+        positions = layout.positions
+        self.assertEqual(set(positions), set(self.dag_model._nodes))
+        for pre, id, points in layout.edges:
+            self.assertLess(positions[pre][0], positions[id][0])
+            xs = [x for x, _ in points]
+            self.assertEqual(xs, sorted(xs))
+
+        # No two products or bends on top of each other in a layer
+        by_x = {}
+        for _, _, points in layout.edges:
+            for x, y in points[1:-1]:
+                by_x.setdefault(x, set()).add(y)
+        for x, y in positions.values():
+            by_x.setdefault(x, set()).add(y)
+        for x, ys in by_x.items():
+            ys = sorted(ys)
+            for a, b in zip(ys, ys[1:]):
+                self.assertGreaterEqual(b - a, ROW_GAP - 1e-6)
+
+    def test_layout(self):
+        self.check(self.layout.update())
+        self.assertIs(self.layout.update(), self.layout.update())
+
+    def test_reduces_crossings(self):
+        unswept = GraphLayout(self.dag_model, sweeps=0)
+        self.assertLess(crossings(self.layout), crossings(unswept))
+
+    def test_incremental(self):
+        layout = self.layout.update()
+        last = max(self.layout._layer.values())
+        endpoint = next(id for id, l in self.layout._layer.items() if l == last)
+        new = Product("new")
+        self.dag_model.add_product(new, self.dag_model._nodes[endpoint])
+
+        updated = self.layout.update()
+        self.check(updated)
+        # Layers far from the edit keep their coordinates
+        for id, (x, y) in layout.positions.items():
+            if self.layout._layer[id] < last - 1:
+                self.assertEqual(updated.positions[id], (x, y))
+
+        self.dag_model.remove_product(new)
+        self.check(self.layout.update())
+
+    def test_separate_windows(self):
+        layout = self.layout.update()
+        last = max(self.layout._layer.values())
+        self.assertGreaterEqual(last, 4)
+        endpoint = next(id for id, l in self.layout._layer.items() if l == last)
+        # Edits to the first and last layers leave the layers between them alone
+        self.dag_model.add_product(Product("first"))
+        self.dag_model.add_product(Product("new"), self.dag_model._nodes[endpoint])
+
+        updated = self.layout.update()
+        self.check(updated)
+        for id, (x, y) in layout.positions.items():
+            if 2 <= self.layout._layer[id] < last - 1:
+                self.assertEqual(updated.positions[id], (x, y))
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            svg = os.path.join(tmpdir, "plan.svg")
+            self.layout.to_svg(svg)
+            root = ET.parse(svg).getroot()
+            rects = root.findall(".//{http://www.w3.org/2000/svg}rect")
+            self.assertEqual(len(rects), 200)
+
+            dot = os.path.join(tmpdir, "plan.dot")
+            self.layout.to_dot(dot)
+            with open(dot) as f:
+                text = f.read()
+            self.assertTrue(text.startswith("digraph"))
+            self.assertEqual(text.count("->"), sum(len(p) for p in self.dag_model._graph.values()))
+
+    def test_small_models(self):
+        self.assertEqual(GraphLayout(DAGModel()).update().positions, {})
+        dag_model = chain(5)
+        self.assertEqual(len({y for _, y in GraphLayout(dag_model).update().positions.values()}), 1)
+
+
+class TestShellGraph(unittest.TestCase):
+    def test_graph_command(self):
+        shell = LabManagementShell()
+        shell.onecmd("add Plasmid2 Plasmid1")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "plan.svg")
+            shell.onecmd(f"graph {path}")
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import random
+import unittest
+
+from src.persistent import PMap, PersistentDict
+
+
+class CollidingKey:
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return self.value % 3
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and self.value == other.value
+
+
+class TestPMap(unittest.TestCase):
+    def check_against_dict(self, keys):
+        rng = random.Random(0)
+        expected, pmap = {}, PMap()
+        versions = []
+        for step in range(5000):
+            key = rng.choice(keys)
+            if rng.random() < 0.6:
+                expected[key] = step
+                pmap = pmap.set(key, step)
+            elif key in expected:
+                del expected[key]
+                pmap = pmap.delete(key)
+            if step % 500 == 0:
+                versions.append((dict(expected), pmap))
+
+        # old versions are unaffected by later updates
+        for old_expected, old_pmap in versions + [(expected, pmap)]:
+            self.assertEqual(len(old_pmap), len(old_expected))
+            self.assertDictEqual(dict(old_pmap.items()), old_expected)
+            for key in keys:
+                self.assertEqual(old_pmap.get(key, "missing"), old_expected.get(key, "missing"))
+
+    def test_against_dict(self):
+        self.check_against_dict(list(range(2000)))
+
+    def test_hash_collisions(self):
+        self.check_against_dict([CollidingKey(i) for i in range(100)])
+
+    def test_missing(self):
+        pmap = PMap({1: "a"})
+        with self.assertRaises(KeyError):
+            pmap[2]
+        with self.assertRaises(KeyError):
+            pmap.delete(2)
+        self.assertNotIn(2, pmap)
+        self.assertEqual(pmap, {1: "a"})
+
+
+class TestPersistentDict(unittest.TestCase):
+    def test_freeze(self):
+        d = PersistentDict({"a": 1})
+        frozen = d.freeze()
+        d["b"] = 2
+        del d["a"]
+
+        self.assertDictEqual(dict(d), {"b": 2})
+        self.assertDictEqual(dict(frozen), {"a": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
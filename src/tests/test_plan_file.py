@@ -0,0 +1,164 @@
+import os
+import tempfile
+import unittest
+
+from src.dag_model import DAGModel, Product, Status
+from src.dag_controller import LabManagementShell
+from src.plan_file import (PlanFile, write_plan, load_plan, load_cone,
+                           ANCESTORS, DESCENDANTS, BOTH)
+
+
+class TestPlanFile(unittest.TestCase):
+    def setUp(self):
+        # a <- b <- d, a <- c <- d, c <- e; f is unrelated
+        self.dag_model = DAGModel()
+        self.a, self.b, self.c, self.d, self.e, self.f = (Product(name) for name in "abcdef")
+        self.b.status = Status.DONE
+        self.c.resources = ["/tmp/c"]
+        self.dag_model.add_product(self.b, self.a)
+        self.dag_model.add_product(self.c, self.a)
+        self.dag_model.add_product(self.d, self.b, self.c)
+        self.dag_model.add_product(self.e, self.c)
+        self.dag_model.add_product(self.f)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, "plan.ldag")
+        write_plan(self.dag_model, self.filepath)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def names(self, products):
+        return sorted(product.name for product in products)
+
+    def test_round_trip(self):
+        loaded = load_plan(self.filepath)
+        self.assertEqual(set(loaded._nodes), set(self.dag_model._nodes))
+        for id, prerequisites in self.dag_model._graph.items():
+            self.assertEqual(loaded._graph[id], prerequisites)
+
+        c = loaded._nodes[self.c._uuid]
+        self.assertEqual(c.resources, ["/tmp/c"])
+        self.assertEqual(loaded._nodes[self.b._uuid].status, Status.DONE)
+
+    def test_resource_section(self):
+        shared = "https://example.org/protocol"
+        for product in (self.a, self.b, self.e):
+            product.resources = [shared, f"/data/{product.name}"]
+        write_plan(self.dag_model, self.filepath)
+
+        with open(self.filepath, "rb") as f:
+            self.assertEqual(f.read().count(shared.encode()), 1)
+
+        loaded = load_plan(self.filepath)
+        a, b = loaded._nodes[self.a._uuid], loaded._nodes[self.b._uuid]
+        self.assertEqual(a.resources, [shared, "/data/a"])
+        self.assertIs(a.resources[0], b.resources[0])
+
+        # Saving a partially loaded model copies the other records with their resources
+        cone = load_cone(self.filepath, "d")
+        cone.remove_product(cone.get_products_by_name("d")[0])
+        write_plan(cone, self.filepath)
+        self.assertEqual(load_plan(self.filepath)._nodes[self.e._uuid].resources, [shared, "/data/e"])
+
+    def test_lookups(self):
+        plan = PlanFile(self.filepath)
+        try:
+            position, = plan.find_name("d")
+            self.assertEqual(plan.uuid_at(position), self.d._uuid)
+            self.assertEqual(plan.find(self.d._uuid), position)
+            self.assertEqual(plan.find_name("missing"), [])
+            self.assertEqual(len(plan.prerequisites(position)), 2)
+        finally:
+            plan.close()
+
+    def test_load_cone(self):
+        ancestors = load_cone(self.filepath, "d")
+        self.assertEqual(self.names(ancestors.products), ["a", "b", "c", "d"])
+
+        descendants = load_cone(self.filepath, "c", DESCENDANTS)
+        self.assertEqual(self.names(descendants.products), ["c", "d", "e"])
+
+        both = load_cone(self.filepath, str(self.c._uuid), BOTH)
+        self.assertEqual(self.names(both.products), ["a", "c", "d", "e"])
+
+        with self.assertRaises(ValueError):
+            load_cone(self.filepath, "missing", ANCESTORS)
+
+    def test_lazy_loading(self):
+        dag_model = load_cone(self.filepath, "c", DESCENDANTS)
+        d, = dag_model.get_products_by_name("d")
+
+        # b, then a, are read from the file when they are reached
+        self.assertEqual(self.names(dag_model.get_prerequisites(d)), ["b", "c"])
+        b, = dag_model.get_products_by_name("b")
+        a, = dag_model.get_prerequisites(b)
+        self.assertEqual(self.names(dag_model.get_successors(a)), ["b", "c"])
+
+    def test_lookups_on_partial_model(self):
+        dag_model = load_cone(self.filepath, "c", DESCENDANTS)
+        # b is in the file but not loaded
+        b, = dag_model.get_products_by_name("b")
+        self.assertEqual(b._uuid, self.b._uuid)
+
+        ancestors = load_cone(self.filepath, "c")
+        # c has successors in the file
+        self.assertEqual(ancestors.endpoints, [])
+
+    def test_xml_from_partial_model(self):
+        dag_model = load_cone(self.filepath, "e", DESCENDANTS)
+        xml_path = os.path.join(self.tmpdir.name, "plan.xml")
+        dag_model.to_xml(xml_path)
+
+        # Products that were never loaded are copied over from the plan file
+        loaded = DAGModel.from_xml(xml_path)
+        self.assertEqual(self.names(loaded.products), ["a", "b", "c", "d", "e", "f"])
+        self.assertEqual(loaded._graph[self.e._uuid], frozenset({self.c._uuid}))
+        self.assertEqual(loaded._graph[self.d._uuid], frozenset({self.b._uuid, self.c._uuid}))
+        # without loading them into the model
+        self.assertEqual(len(dag_model._nodes), 1)
+
+        # but not the ones removed from the model
+        dag_model.remove_product(dag_model.get_products_by_name("d")[0])
+        dag_model.to_xml(xml_path)
+        loaded = DAGModel.from_xml(xml_path)
+        self.assertEqual(self.names(loaded.products), ["a", "b", "c", "e", "f"])
+
+    def test_save_partial_model(self):
+        dag_model = load_cone(self.filepath, "d")
+        e_id = self.e._uuid
+        b, = dag_model.get_products_by_name("b")
+        b.name = "renamed"
+        dag_model.remove_product(dag_model._nodes[self.a._uuid])
+        write_plan(dag_model, self.filepath)
+
+        loaded = load_plan(self.filepath)
+        self.assertEqual(self.names(loaded.products), ["c", "d", "e", "f", "renamed"])
+        self.assertEqual(loaded._graph[e_id], frozenset({self.c._uuid}))
+        self.assertEqual(loaded._graph[self.c._uuid], frozenset())
+
+
+class TestShellPlanFile(unittest.TestCase):
+    def test_save_and_load_cone(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "plan.ldag")
+            shell = LabManagementShell()
+            shell.onecmd("add Plasmid2 Plasmid1")
+            shell.onecmd("add Other")
+            shell.onecmd(f"save {filepath}")
+
+            shell.onecmd(f"load --cone Plasmid2 {filepath}")
+            self.assertEqual(sorted(p.name for p in shell.dag_model.products), ["Plasmid1", "Plasmid2"])
+
+            # Products of the file that are not loaded are found, not created again
+            shell.onecmd(f"load --cone Plasmid1 {filepath}")
+            shell.onecmd("depends Other Plasmid1")
+            self.assertEqual(len(shell.dag_model.get_products_by_name("Other")), 1)
+            shell.onecmd(f"save {filepath}")
+
+            shell.onecmd(f"load {filepath}")
+            self.assertEqual(len(shell.dag_model.products), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
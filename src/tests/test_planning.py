@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.benchmarks.generators import random_layered
+from src.dag_model import DAGModel, Product, Status
+from src.planning import simulate, Estimate, _Network, DEFAULT_ESTIMATE
+
+START = datetime(2024, 1, 1)
+
+
+def days(n):
+    return START + timedelta(days=n)
+
+
+class TestSimulate(unittest.TestCase):
+    def setUp(self):
+        # Final <- Left <- Base, Final <- Right <- Base
+        self.dag_model = DAGModel()
+        self.base = Product("Base")
+        self.left = Product("Left")
+        self.right = Product("Right")
+        self.final = Product("Final", target=days(7))
+        self.dag_model.add_product(self.left, self.base)
+        self.dag_model.add_product(self.right, self.base)
+        self.dag_model.add_product(self.final, self.left, self.right)
+
+    def test_fixed_durations(self):
+        estimates = {self.base._uuid: (2, 2, 2), self.left._uuid: (1, 1, 1),
+                     self.right._uuid: (4, 4, 4), self.final._uuid: (1, 1, 1)}
+        forecast = simulate(self.dag_model, estimates, samples=50, start=START)
+        # The longest path goes through Right
+        self.assertEqual(forecast.percentiles(self.final), {10: days(7), 50: days(7), 90: days(7)})
+        self.assertEqual(forecast.percentiles(self.left)[50], days(3))
+        self.assertEqual(forecast.chance(self.final), 1.0)
+        self.assertIsNone(forecast.chance(self.left))
+
+        self.final.target = days(6)
+        self.assertEqual(simulate(self.dag_model, estimates, samples=50, start=START).chance(self.final), 0.0)
+
+    def test_done_products(self):
+        self.base.status = Status.DONE
+        estimates = {self.base._uuid: (9, 9, 9)}
+        forecast = simulate(self.dag_model, estimates, samples=10, start=START, default=Estimate(1, 1, 1))
+        self.assertEqual(forecast.percentiles(self.base)[50], START)
+        self.assertEqual(forecast.percentiles(self.final)[90], days(2))
+
+    def test_distribution(self):
+        dag_model = DAGModel()
+        product = Product("Only", target=days(3))
+        dag_model.add_product(product)
+        forecast = simulate(dag_model, {product._uuid: Estimate(0, 3, 6)}, samples=20000, start=START, seed=1)
+        self.assertAlmostEqual(forecast.chance(product), 0.5, delta=0.02)
+        p10 = (forecast.percentiles(product)[10] - START) / timedelta(days=1)
+        # Triangular(0, 3, 6): P(X <= x) = x^2 / 18 below the mode
+        self.assertAlmostEqual(p10, np.sqrt(1.8), delta=0.1)
+
+    def test_matches_reference(self):
+        # Propagation by layers agrees with a product-by-product walk
+        dag_model = random_layered(300, seed=3)
+        network = _Network(dag_model, {}, DEFAULT_ESTIMATE)
+        finish = network.sample(5, np.random.SeedSequence(0))
+
+        # The same draws without propagation are the durations
+        rng = np.random.default_rng(np.random.SeedSequence(0))
+        duration = np.concatenate([network.durations(rng, lo, hi, 5) for lo, hi, _, _ in network.layers])
+        done = np.array([dag_model._nodes[id].status == Status.DONE for id in network.ids])
+        active = duration[~done]
+        self.assertTrue(np.all((active >= DEFAULT_ESTIMATE.optimistic) & (active <= DEFAULT_ESTIMATE.pessimistic)))
+        self.assertTrue(np.all(duration[done] == 0))
+
+        row = {id: i for i, id in enumerate(network.ids)}
+        expected = np.zeros_like(finish)
+        for product in dag_model.order:
+            i = row[product._uuid]
+            pres = [row[pre] for pre in dag_model._graph[product._uuid]]
+            expected[i] = duration[i] + (np.max(expected[pres], axis=0) if pres else 0)
+        np.testing.assert_allclose(finish, expected, rtol=1e-5)
+
+    def test_workers(self):
+        forecast = simulate(self.dag_model, samples=4000, start=START, seed=2, workers=2)
+        single = simulate(self.dag_model, samples=4000, start=START, seed=2)
+        self.assertEqual(forecast.samples, 4000)
+        self.assertAlmostEqual(forecast.chance(self.final), single.chance(self.final), delta=0.05)
+        for product in self.dag_model.products:
+            for level, date in forecast.percentiles(product).items():
+                self.assertLess(abs(date - single.percentiles(product)[level]), timedelta(hours=6))
+
+    def test_invalid_estimates(self):
+        with self.assertRaises(ValueError):
+            simulate(self.dag_model, {self.base._uuid: (3, 2, 1)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from src.dag_model import DAGModel, Product, Status
+from src.dag_controller import LabManagementShell
+from src.history import History
+from src.query import ProductColumns, parse_date
+
+
+NOW = datetime(2024, 3, 1, 15, 30)
+
+
+class TestProductColumns(unittest.TestCase):
+    def setUp(self):
+        # Final <- Digest <- Plasmid, Final <- Primer; Other is unrelated
+        self.dag_model = DAGModel()
+        self.plasmid = Product("Plasmid", status=Status.DONE, target=datetime(2024, 2, 20))
+        self.digest = Product("Digest", target=datetime(2024, 3, 10))
+        self.primer = Product("Primer", status=Status.IN_PROGRESS, target=datetime(2024, 4, 1))
+        self.final = Product("Final", target=datetime(2024, 3, 12))
+        self.other = Product("Other")
+        self.dag_model.add_product(self.digest, self.plasmid)
+        self.dag_model.add_product(self.final, self.digest, self.primer)
+        self.dag_model.add_product(self.other)
+
+        self.columns = ProductColumns(self.dag_model)
+
+    def find(self, expression):
+        return sorted(p.name for p in self.columns.find(expression, now=NOW))
+
+    def test_filters(self):
+        self.assertEqual(self.find("status=to_do"), ["Digest", "Final", "Other"])
+        self.assertEqual(self.find("status=to_do target<=+14d"), ["Digest", "Final"])
+        self.assertEqual(self.find("target=none"), ["Other"])
+        self.assertEqual(self.find("target=3/10/2024"), ["Digest"])
+        self.assertEqual(self.find("name~IG"), ["Digest"])
+        self.assertEqual(self.find("not status=to_do"), ["Plasmid", "Primer"])
+        self.assertEqual(self.find("status=done or name=Other"), ["Other", "Plasmid"])
+
+    def test_cones(self):
+        self.assertEqual(self.find("upstream=Final"), ["Digest", "Plasmid", "Primer"])
+        self.assertEqual(self.find("upstream=Final status=to_do target>=today"), ["Digest"])
+        self.assertEqual(self.find("downstream=Plasmid"), ["Digest", "Final"])
+
+    def test_follows_model(self):
+        new = Product("New", target=datetime(2024, 3, 2))
+        self.dag_model.add_product(new, self.final)
+        self.plasmid.status = Status.TO_DO
+        self.digest.name = "Ligation"
+        self.dag_model.remove_dependencies(self.final, self.primer)
+        self.dag_model.remove_product(self.other)
+
+        self.assertEqual(self.find("upstream=New"), ["Final", "Ligation", "Plasmid"])
+        self.assertEqual(self.find("status=to_do target<+7d"), ["New", "Plasmid"])
+        self.assertEqual(self.find("name=Digest"), [])
+        self.assertEqual(len(self.columns), 5)
+
+        # The removed product's row is reused
+        self.dag_model.add_product(Product("Reused"))
+        self.assertEqual(self.columns.size, 6)
+
+    def test_follows_undo(self):
+        history = History(self.dag_model)
+        history.begin("remove")
+        self.dag_model.remove_product(self.digest)
+        history.commit()
+        self.assertEqual(self.find("upstream=Final"), ["Primer"])
+
+        history.undo()
+        self.assertEqual(self.find("upstream=Final"), ["Digest", "Plasmid", "Primer"])
+
+    def test_growth(self):
+        for i in range(3000):
+            self.dag_model.add_product(Product(f"P{i}"), self.other)
+        self.assertEqual(len(self.find("downstream=Other")), 3000)
+
+    def test_errors(self):
+        for expression in ["status<done", "colour=red", "upstream=Missing", "target<someday"]:
+            with self.assertRaises(ValueError):
+                self.columns.find(expression)
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date("+2w", NOW), datetime(2024, 3, 15))
+        self.assertEqual(parse_date("2024-05-01", NOW), datetime(2024, 5, 1))
+
+
+class TestShellFind(unittest.TestCase):
+    def test_find_command(self):
+        shell = LabManagementShell()
+        shell.onecmd("add Plasmid2 Plasmid1")
+        shell.onecmd("mark Plasmid1 done")
+
+        with patch("builtins.print") as mock_print:
+            shell.onecmd("find status=to_do")
+        mock_print.assert_any_call("1 products found.")
+
+        shell.onecmd("add Plasmid3 Plasmid2")
+        with patch("builtins.print") as mock_print:
+            shell.onecmd("find upstream=Plasmid3")
+        mock_print.assert_any_call("2 products found.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import tempfile
+import time
+import unittest
+import urllib.error
+from pathlib import Path
+from unittest.mock import patch
+
+from src.dag_model import DAGModel, Product
+from src.dag_controller import LabManagementShell
+from src.history import History
+from src.resources import (ResourceChecker, ResourceIndex, check_local_path, check_resources,
+                           collect_resources)
+
+
+class TestResourceChecker(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.existing = Path(self.tmpdir.name) / "protocol.txt"
+        self.existing.write_text("protocol")
+        self.missing = Path(self.tmpdir.name) / "missing.txt"
+
+        self.checker = ResourceChecker()
+        self.http_calls = []
+
+        def fake_http(resource, timeout=None):
+            self.http_calls.append(resource)
+            return resource.endswith("/ok"), "fake"
+
+        self.checker.register("http", fake_http)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_local_and_file_uri(self):
+        self.assertTrue(self.checker.check(str(self.existing)).ok)
+        self.assertFalse(self.checker.check(str(self.missing)).ok)
+        self.assertTrue(self.checker.check(self.existing.as_uri()).ok)
+        self.assertFalse(self.checker.check(self.missing.as_uri()).ok)
+
+    def test_unsupported_scheme(self):
+        self.assertIsNone(self.checker.check("gopher://example.org").ok)
+
+    def test_check_all_and_cache(self):
+        resources = ["http://example.org/ok", "http://example.org/broken", str(self.existing),
+                     "http://example.org/ok"]
+        results = {r.resource: r.ok for r in self.checker.check_all(resources)}
+        self.assertDictEqual(results, {"http://example.org/ok": True,
+                                       "http://example.org/broken": False,
+                                       str(self.existing): True})
+        self.assertEqual(len(self.http_calls), 2)
+
+        # second run is served from the cache
+        list(self.checker.check_all(resources))
+        self.assertEqual(len(self.http_calls), 2)
+
+        # expired entries are checked again
+        self.checker.cache.ttl = 0
+        time.sleep(0.01)
+        list(self.checker.check_all(resources))
+        self.assertEqual(len(self.http_calls), 4)
+
+    def test_budget(self):
+        self.checker.register("slow", lambda resource, timeout=None: (time.sleep(1), (True, ""))[1])
+
+        start = time.perf_counter()
+        results = list(self.checker.check_all(["slow://a", str(self.existing)], budget=0.2))
+        self.assertLess(time.perf_counter() - start, 0.9)
+
+        by_resource = {r.resource: r for r in results}
+        self.assertTrue(by_resource[str(self.existing)].ok)
+        self.assertIsNone(by_resource["slow://a"].ok)
+        # The time actually spent waiting, not the budget
+        self.assertGreater(by_resource["slow://a"].elapsed, 0.15)
+        self.assertLess(by_resource["slow://a"].elapsed, 0.9)
+
+    def test_local_timeout(self):
+        with patch("os.path.exists", side_effect=lambda path: time.sleep(1)):
+            start = time.perf_counter()
+            ok, detail = check_local_path(str(self.existing), timeout=0.1)
+            self.assertLess(time.perf_counter() - start, 0.9)
+        self.assertIsNone(ok)
+        self.assertEqual(check_local_path(str(self.existing), timeout=1), (True, "exists"))
+
+    def test_http_timeout(self):
+        checker = ResourceChecker()
+        errors = {"http://example.org/slow": urllib.error.URLError(TimeoutError("timed out")),
+                  "http://example.org/down": ConnectionRefusedError("refused"),
+                  "http://example.org/gone": urllib.error.HTTPError(
+                      "http://example.org/gone", 404, "Not Found", {}, None)}
+
+        def urlopen(request, timeout=None):
+            raise errors[request.full_url]
+
+        with patch("urllib.request.urlopen", side_effect=urlopen):
+            results = {r.resource: r.ok for r in checker.check_all(errors)}
+        self.assertDictEqual(results, {"http://example.org/slow": None,
+                                       "http://example.org/down": None,
+                                       "http://example.org/gone": False})
+        # Only the real failure is cached
+        self.assertIsNone(checker.cache.get("http://example.org/slow"))
+        self.assertFalse(checker.cache.get("http://example.org/gone").ok)
+
+
+class TestCheckResources(unittest.TestCase):
+    def test_cone(self):
+        dag_model = DAGModel()
+        product1 = Product("Plasmid1", resources=["http://example.org/ok"])
+        product2 = Product("Plasmid2", resources=["http://example.org/ok", "http://example.org/p2"])
+        product3 = Product("Plasmid3", resources=["http://example.org/p3"])
+        dag_model.add_product(product2, product1)
+        dag_model.add_product(product3)
+
+        usage = collect_resources(dag_model)
+        self.assertEqual(len(usage), 3)
+        self.assertEqual(len(usage["http://example.org/ok"]), 2)
+
+        checker = ResourceChecker()
+        checker.register("http", lambda resource, timeout=None: (resource.endswith("/ok"), ""))
+        results = {result.resource: (result.ok, users)
+                   for result, users in check_resources(dag_model, product2, checker)}
+        self.assertSetEqual(set(results), {"http://example.org/ok", "http://example.org/p2"})
+        self.assertTrue(results["http://example.org/ok"][0])
+        self.assertListEqual(results["http://example.org/p2"][1], [product2])
+
+
+class TestResourceIndex(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = DAGModel()
+        self.product1 = Product("Plasmid1", resources=["protocol.pdf"])
+        self.product2 = Product("Plasmid2", resources=["protocol.pdf", "map.gb"])
+        self.dag_model.add_product(self.product2, self.product1)
+        self.index = ResourceIndex(self.dag_model)
+
+    def tearDown(self):
+        self.index.close()
+
+    def users(self, resource):
+        return sorted(p.name for p in self.index.products_using(resource))
+
+    def test_lookup(self):
+        self.assertEqual(self.users("protocol.pdf"), ["Plasmid1", "Plasmid2"])
+        self.assertEqual(self.users("missing"), [])
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual({r: len(users) for r, users in collect_resources(self.dag_model, index=self.index).items()},
+                         {r: len(users) for r, users in collect_resources(self.dag_model).items()})
+
+    def test_follows_changes(self):
+        history = History(self.dag_model)
+        history.begin("edit")
+        self.product1.resources = ["map.gb"]
+        self.dag_model.add_product(Product("Plasmid3", resources=["protocol.pdf"]))
+        self.dag_model.remove_product(self.product2)
+        history.commit()
+        self.assertEqual(self.users("protocol.pdf"), ["Plasmid3"])
+        self.assertEqual(self.users("map.gb"), ["Plasmid1"])
+
+        history.undo()
+        self.assertEqual(self.users("protocol.pdf"), ["Plasmid1", "Plasmid2"])
+        self.assertEqual(self.users("map.gb"), ["Plasmid2"])
+
+    def test_interned(self):
+        # Equal resources built separately are one string
+        path = "".join(["protocols/", "digest.pdf"])
+        product = Product("Plasmid4", resources=[path], notes="".join(["same ", "note"]))
+        self.assertIs(product.resources[0], Product("x", resources=["protocols/digest.pdf"]).resources[0])
+        self.assertIs(product.notes, Product("y", notes="same note").notes)
+
+    def test_shell(self):
+        shell = LabManagementShell()
+        shell.onecmd("add Plasmid2 Plasmid1")
+        shell.onecmd("resource add Plasmid1 protocol.pdf")
+        shell.onecmd("resource add Plasmid2 protocol.pdf map.gb")
+        with patch("builtins.print") as mock_print:
+            shell.onecmd("resource users protocol.pdf")
+        mock_print.assert_any_call("2 products use protocol.pdf:")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from src.benchmarks.generators import random_layered
+from src.dag_model import DAGModel, Product, Status
+from src.dag_controller import LabManagementShell
+from src.history import History
+from src.query import ProductColumns
+from src.rollup import ProgressRollUp, Progress
+
+
+class TestProgressRollUp(unittest.TestCase):
+    MAX_ROWS = 2**15
+
+    def setUp(self):
+        # Final <- Left <- Base, Final <- Right <- Base
+        self.dag_model = DAGModel()
+        self.base = Product("Base", status=Status.DONE)
+        self.left = Product("Left", status=Status.IN_PROGRESS)
+        self.right = Product("Right")
+        self.final = Product("Final")
+        self.dag_model.add_product(self.left, self.base)
+        self.dag_model.add_product(self.right, self.base)
+        self.dag_model.add_product(self.final, self.left, self.right)
+
+        self.rollup = ProgressRollUp(ProductColumns(self.dag_model), max_rows=self.MAX_ROWS)
+
+    def expected(self, product):
+        cone = {p._uuid: p for p in self.dag_model.all_prerequisites(product)}
+        cone[product._uuid] = product
+        cone = list(cone.values())
+        return Progress(sum(p.status == Status.DONE for p in cone),
+                        sum(p.status == Status.IN_PROGRESS for p in cone),
+                        len(cone))
+
+    def check(self):
+        for product in self.dag_model.products:
+            self.assertEqual(self.rollup.progress(product), self.expected(product), product.name)
+        self.assertEqual({p.name for p in self.rollup.endpoints},
+                         {p.name for p in self.dag_model.endpoints})
+
+    def test_counts(self):
+        # Base is shared by both branches but counted once
+        self.assertEqual(self.rollup.progress(self.final), Progress(1, 1, 4))
+        self.assertEqual(str(self.rollup.progress(self.left)), "1/2 done (50%), 1 in progress")
+        self.check()
+
+    def test_status_changes(self):
+        self.check()
+        self.right.status = Status.DONE
+        self.left.status = Status.DONE
+        self.assertEqual(self.rollup.progress(self.final), Progress(3, 0, 4))
+        self.base.status = Status.TO_DO
+        self.check()
+
+    def test_edge_changes(self):
+        self.check()
+        extra = Product("Extra", status=Status.DONE)
+        self.dag_model.add_product(extra)
+        self.dag_model.add_dependency(self.base, extra)
+        self.check()
+
+        self.dag_model.remove_dependencies(self.final, self.left)
+        self.check()
+
+        self.dag_model.remove_product(self.base)
+        self.check()
+
+    def test_undo(self):
+        history = History(self.dag_model)
+        self.check()
+        history.begin("remove")
+        self.dag_model.remove_product(self.right)
+        self.base.status = Status.TO_DO
+        history.commit()
+        self.check()
+
+        history.undo()
+        self.check()
+
+    def test_random_edits(self):
+        self.rollup.close()
+        self.dag_model = random_layered(300, seed=4)
+        self.rollup = ProgressRollUp(ProductColumns(self.dag_model), max_rows=self.MAX_ROWS)
+        self.check()
+
+        rng = random.Random(4)
+        products = list(self.dag_model.products)
+        for _ in range(30):
+            product = rng.choice(products)
+            prereqs = self.dag_model.get_prerequisites(product)
+            if prereqs and rng.random() < 0.5:
+                self.dag_model.remove_dependencies(product, rng.choice(prereqs))
+            else:
+                product.status = rng.choice(list(Status))
+        # Enough new products for the columns to grow
+        for i in range(1100):
+            self.dag_model.add_product(Product(f"New{i}"), rng.choice(products))
+        self.check()
+
+    def test_cycle(self):
+        self.dag_model.add_dependency(self.base, self.final)
+        for product in (self.base, self.left, self.final):
+            self.assertEqual(self.rollup.progress(product).total, 4)
+        self.dag_model.remove_dependencies(self.base, self.final)
+        self.check()
+
+    def test_downstream(self):
+        self.assertEqual({p.name for p in self.rollup.downstream(self.left)}, {"Left", "Final"})
+
+
+class TestProgressRollUpWithoutBitsets(TestProgressRollUp):
+    # Counts walked and adjusted along cones, as for models too large for bitsets
+    MAX_ROWS = 0
+
+
+class TestProgressRollUpOutgrowingBitsets(TestProgressRollUp):
+    # Bitsets until the columns grow past 1024 rows
+    MAX_ROWS = 1024
+
+
+class TestShellProgress(unittest.TestCase):
+    def test_show_progress(self):
+        shell = LabManagementShell()
+        shell.onecmd("add Plasmid2 Plasmid1")
+        shell.onecmd("mark Plasmid1 done")
+
+        with patch("builtins.print") as mock_print:
+            shell.onecmd("show Plasmid2")
+        self.assertIn("Progress: 1/2 done (50%), 0 in progress",
+                      [str(call.args[0]) for call in mock_print.call_args_list if call.args])
+
+        shell.onecmd("mark Plasmid2 in_progress")
+        with patch("builtins.print") as mock_print:
+            shell.onecmd("show")
+        self.assertTrue(any("1/2 done (50%), 1 in progress" in str(call) for call in mock_print.call_args_list))
+
+
+if __name__ == '__main__':
+    unittest.main()
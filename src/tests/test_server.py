@@ -0,0 +1,146 @@
+import asyncio
+import json
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from src.dag_model import DAGModel, Product, Status, CycleError
+from src.server import DAGServer, DAGClient, RemoteDAGModel, RemoteError, parse_address, is_loopback
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.address = f"unix:{Path(self.tmpdir.name) / 'labdag.sock'}"
+
+        self.dag_model = DAGModel()
+        self.product1 = Product("Plasmid1", target=datetime(2024, 1, 30))
+        self.product2 = Product("Plasmid2")
+        self.dag_model.add_product(self.product2, self.product1)
+        self.server = DAGServer(self.dag_model)
+
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.listener = self.loop.run_until_complete(self.server.start(self.address))
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def tearDown(self):
+        async def shutdown():
+            self.listener.close()
+            await self.listener.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.tmpdir.cleanup()
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("unix:/tmp/s"), ("unix", "/tmp/s"))
+        self.assertEqual(parse_address("8000"), ("tcp", ("127.0.0.1", 8000)))
+        self.assertEqual(parse_address("localhost:8000"), ("tcp", ("localhost", 8000)))
+
+    def test_call(self):
+        with DAGClient(self.address) as client:
+            self.assertEqual(client.call("ping"), "pong")
+            result = client.call("get", uuid=str(self.product2._uuid))
+            self.assertEqual(result["name"], "Plasmid2")
+            self.assertListEqual(result["prerequisites"], [str(self.product1._uuid)])
+
+            with self.assertRaises(RemoteError):
+                client.call("no_such_operation")
+
+    def test_pipeline(self):
+        with DAGClient(self.address) as client:
+            results = client.pipeline([("products", {})] * 200 + [("order", {})])
+            self.assertEqual(len(results), 201)
+            self.assertListEqual([p["name"] for p in results[-1]], ["Plasmid1", "Plasmid2"])
+
+    def test_shared_state(self):
+        with DAGClient(self.address) as client1, DAGClient(self.address) as client2:
+            model1 = RemoteDAGModel(client1)
+            model2 = RemoteDAGModel(client2)
+
+            product3 = Product("Plasmid3")
+            model1.add_product(product3, model1.get_products_by_name("Plasmid2")[0])
+            self.assertIn(product3, self.dag_model.products)
+
+            # field edits are sent before the next request
+            product3.status = Status.DONE
+            model1.flush()
+            remote_product3 = model2.get_products_by_name("Plasmid3")[0]
+            self.assertEqual(remote_product3.status, Status.DONE)
+            self.assertEqual(self.dag_model.get_product_by_uuid(product3._uuid).status, Status.DONE)
+
+            self.assertListEqual([p.name for p in model2.order], ["Plasmid1", "Plasmid2", "Plasmid3"])
+            model2.remove_dependencies(remote_product3, *model2.get_prerequisites(remote_product3))
+            self.assertEqual(len(model1.endpoints), 2)
+
+    def test_concurrent_field_edits(self):
+        with DAGClient(self.address) as client1, DAGClient(self.address) as client2:
+            model1, model2 = RemoteDAGModel(client1), RemoteDAGModel(client2)
+            product1, = model1.get_products_by_name("Plasmid1")
+            other1, = model2.get_products_by_name("Plasmid1")
+
+            # Each client edits a different field of its own copy, the second one stale
+            product1.status = Status.DONE
+            model1.flush()
+            other1.notes = "Sequenced"
+            model2.flush()
+
+            product = self.dag_model.get_product_by_uuid(self.product1._uuid)
+            self.assertEqual(product.status, Status.DONE)
+            self.assertEqual(product.notes, "Sequenced")
+
+    def test_local_only(self):
+        self.assertTrue(is_loopback("localhost"))
+        self.assertTrue(is_loopback("::1"))
+        self.assertFalse(is_loopback("0.0.0.0"))
+        with self.assertRaises(ValueError):
+            asyncio.run(DAGServer().start("0.0.0.0:0"))
+
+    def test_save(self):
+        with DAGClient(self.address) as client:
+            # Clients cannot choose where the server writes
+            with self.assertRaises(RemoteError):
+                client.call("save", path=str(Path(self.tmpdir.name) / "other.xml"))
+            with self.assertRaises(RemoteError):
+                client.call("save")
+            self.assertFalse((Path(self.tmpdir.name) / "other.xml").exists())
+
+            # but can save a copy on their side
+            filepath = Path(self.tmpdir.name) / "copy.xml"
+            RemoteDAGModel(client).to_xml(filepath)
+            self.assertEqual(DAGModel.from_xml(filepath), self.dag_model)
+
+    def test_malformed_request(self):
+        with DAGClient(self.address) as client:
+            client._file.write(b"[1]\n")
+            client._file.flush()
+            response = json.loads(client._file.readline())
+            self.assertEqual(response["type"], "ValueError")
+            # the connection is still open
+            self.assertEqual(client.call("ping"), "pong")
+
+    def test_cycle_error(self):
+        with DAGClient(self.address) as client:
+            model = RemoteDAGModel(client)
+            product1, = model.get_products_by_name("Plasmid1")
+            product2, = model.get_products_by_name("Plasmid2")
+            model.add_dependency(product1, product2)
+            with self.assertRaises(CycleError):
+                _ = model.order
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
+import random
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest.mock import patch
 
 from src.dag_model import DAGModel, Product
-from src.validate import validate_DAG
+from src.dag_controller import LabManagementShell
+from src.history import History
+from src.validate import validate_DAG, analyze_DAG, LiveValidator
 
 
 class TestValidateDAG(unittest.TestCase):
@@ -65,5 +69,153 @@ class TestValidateDAG(unittest.TestCase):
         self.assertIsNone(cycle)
         self.assertNotEqual(len(invalid_dates), 0)
 
+    def test_all_cycles(self):
+        # Two separate cycles: 1 -> 2 -> 3 -> 1 with a shortcut 1 -> 3, and 4 <-> 5
+        products = [Product(f"P{i}") for i in range(7)]
+        for product in products:
+            self.dag_model.add_product(product)
+        p0, p1, p2, p3, p4, p5, p6 = products
+        self.dag_model.add_dependency(p1, p2, p3)
+        self.dag_model.add_dependency(p2, p3)
+        self.dag_model.add_dependency(p3, p1)
+        self.dag_model.add_dependency(p4, p5)
+        self.dag_model.add_dependency(p5, p4, p0)
+        self.dag_model.add_dependency(p6, p5, p1)
+
+        cycles, invalid_dates = analyze_DAG(self.dag_model)
+        self.assertEqual(len(cycles), 2)
+        self.assertEqual(len(invalid_dates), 0)
+
+        by_size = sorted(cycles, key=lambda cycle: len(cycle.products))
+        small, large = by_size
+        self.assertEqual({p.name for p in small.products}, {"P4", "P5"})
+        self.assertEqual({p.name for p in large.products}, {"P1", "P2", "P3"})
+        # The shortest witness uses the 1 -> 3 shortcut
+        self.assertEqual(len(large.witness), 3)
+        self.assertIs(large.witness[0], large.witness[-1])
+
+        for cycle in cycles:
+            for product, prerequisite in cycle.break_edges:
+                self.dag_model.remove_dependencies(product, prerequisite)
+        self.assertEqual(analyze_DAG(self.dag_model).cycles, [])
+        self.assertEqual(len(self.dag_model.order), 7)
+
+    def test_self_dependency(self):
+        self.dag_model.add_product(self.product1)
+        self.dag_model.add_dependency(self.product1, self.product1)
+
+        valid, cycle, _ = validate_DAG(self.dag_model)
+        self.assertFalse(valid)
+        self.assertEqual(len(cycle), 2)
+
+    def test_dates_through_cycle(self):
+        # Plasmid3 is after everything but depends on a cycle containing a later target
+        late = Product("Late", target=datetime(2024, 6, 1))
+        self.dag_model.add_product(self.product3, self.product1)
+        self.dag_model.add_product(late)
+        self.dag_model.add_dependency(self.product1, late)
+        self.dag_model.add_dependency(late, self.product1)
+
+        _, invalid_dates = analyze_DAG(self.dag_model)
+        self.assertEqual({p.name for p in invalid_dates}, {"Plasmid1", "Plasmid3"})
+
+    def test_long_chain(self):
+        products = [Product(f"P{i}") for i in range(5000)]
+        for pre, product in zip(products, products[1:]):
+            self.dag_model.add_product(product, pre)
+        self.dag_model.add_dependency(products[0], products[-1])
+
+        cycle, = analyze_DAG(self.dag_model).cycles
+        self.assertEqual(len(cycle.products), 5000)
+        self.assertEqual(len(cycle.break_edges), 1)
+
+
+class TestLiveValidator(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = DAGModel()
+        self.early = Product("Early", target=datetime(2024, 1, 1))
+        self.middle = Product("Middle", target=datetime(2024, 2, 1))
+        self.late = Product("Late", target=datetime(2024, 3, 1))
+        self.dag_model.add_product(self.middle, self.early)
+        self.dag_model.add_product(self.late, self.middle)
+        self.live = LiveValidator(self.dag_model)
+
+    def names(self, products):
+        return sorted(p.name for p in products)
+
+    def test_dates(self):
+        self.assertTrue(self.live.valid)
+        self.early.target = datetime(2024, 2, 15)
+        self.assertEqual(self.names(self.live.invalid_dates), ["Middle"])
+        self.assertEqual(self.names(self.live.drain()[1]), ["Middle"])
+        self.assertEqual(self.live.drain(), ([], []))
+
+        self.dag_model.remove_dependencies(self.middle, self.early)
+        self.assertTrue(self.live.valid)
+
+    def test_cycles(self):
+        self.dag_model.add_dependency(self.early, self.late)
+        cycle, = self.live.cycles
+        self.assertEqual(self.names(cycle), ["Early", "Early", "Late", "Middle"])
+        self.assertEqual(len(self.live.drain()[0]), 1)
+
+        # Another path keeps the cycle open
+        self.dag_model.add_dependency(self.late, self.early)
+        self.dag_model.remove_dependencies(self.middle, self.early)
+        self.assertFalse(self.live.valid)
+
+        self.dag_model.remove_dependencies(self.early, self.late)
+        self.assertEqual(self.live.cycles, [])
+
+    def test_existing_problems(self):
+        self.dag_model.add_dependency(self.early, self.late)
+        live = LiveValidator(self.dag_model)
+        self.assertEqual(len(live.cycles), 1)
+
+    def test_matches_full_validation(self):
+        rng = random.Random(1)
+        products = [Product(f"P{i}", target=datetime(2024, 1, 1) + timedelta(days=rng.randrange(60)))
+                    for i in range(30)]
+        for product in products:
+            self.dag_model.add_product(product)
+        history = History(self.dag_model)
+
+        for step in range(300):
+            product, pre = rng.sample(products, 2)
+            history.begin()
+            choice = rng.random()
+            if choice < 0.1:
+                history.undo()
+            elif choice < 0.2:
+                product.target = datetime(2024, 1, 1) + timedelta(days=rng.randrange(60))
+            elif choice < 0.5:
+                self.dag_model.remove_dependencies(product, pre)
+            elif (pre._uuid in self.dag_model._graph and not self.live.cycles
+                  and rng.random() < 0.7):
+                self.dag_model.add_dependency(product, pre)
+            history.commit()
+
+            cycles, _ = analyze_DAG(self.dag_model)
+            self.assertEqual(bool(cycles), bool(self.live.cycles), step)
+            if not cycles:
+                self.assertEqual(self.names(self.live.invalid_dates),
+                                 self.names(validate_DAG(self.dag_model)[2]), step)
+
+
+class TestShellLive(unittest.TestCase):
+    def test_live_command(self):
+        shell = LabManagementShell()
+        shell.onecmd("add Plasmid2 Plasmid1")
+        shell.onecmd("live on")
+
+        with patch("builtins.print") as mock_print:
+            shell.postcmd(False, shell.onecmd("depends Plasmid1 Plasmid2") or "")
+        printed = [str(call.args[0]) for call in mock_print.call_args_list if call.args]
+        self.assertTrue(any(line.startswith("Warning: cycle") for line in printed))
+
+        shell.onecmd("live off")
+        self.assertIsNone(shell.live)
+
+
 if __name__ == '__main__':
     unittest.main()
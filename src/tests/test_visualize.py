@@ -1,9 +1,13 @@
 import unittest
+from unittest.mock import patch
 
 import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgba
 from datetime import datetime
 from src.dag_model import DAGModel, Product, Status
-from src.visualize import gantt, gantt_2
+from src.rollup import ProgressRollUp
+from src.query import ProductColumns
+from src.visualize import gantt, gantt_2, InteractiveGantt
 
 class TestVisualize(unittest.TestCase):
     def setUp(self):
@@ -22,5 +26,80 @@ class TestVisualize(unittest.TestCase):
         plt.show()
 
 
+class TestInteractiveGantt(unittest.TestCase):
+    def setUp(self):
+        self.dag_model = DAGModel()
+        self.product1 = Product("Plasmid1")
+        self.product2 = Product("Plasmid2")
+        self.other = Product("Other")
+        self.dag_model.add_product(self.product2, self.product1)
+        self.dag_model.add_product(self.other)
+
+        _, self.ax = plt.subplots()
+        rollup = ProgressRollUp(ProductColumns(self.dag_model))
+        self.view = InteractiveGantt(self.dag_model, self.ax, progress=rollup.progress,
+                                     downstream=rollup.downstream)
+        self.ax.figure.canvas.draw()
+
+    def tearDown(self):
+        self.view.close()
+        plt.close(self.ax.figure)
+
+    def bar(self, product):
+        return self.view._bars[product._uuid][0]
+
+    def test_status_blits(self):
+        canvas = self.ax.figure.canvas
+        with patch.object(canvas, "draw_idle") as draw_idle, patch.object(canvas, "blit") as blit:
+            self.product1.status = Status.DONE
+            self.product1.status = Status.IN_PROGRESS
+            self.product1.status = Status.DONE
+            self.view.flush()
+        draw_idle.assert_not_called()
+        # Plasmid1's colour and progress, and Plasmid2's progress
+        self.assertEqual(blit.call_count, 2)
+        self.assertEqual(self.bar(self.product1).get_facecolor(), to_rgba('g'))
+        self.assertEqual(self.view._bars[self.product2._uuid][1].get_width(), 5)
+
+    def test_only_downstream_restyled(self):
+        with patch.object(self.view, "_style", wraps=self.view._style) as style:
+            self.product2.status = Status.DONE
+            self.view.flush()
+        self.assertEqual([call.args[0] for call in style.call_args_list], [self.product2])
+
+    def test_many_changes_redraw_once(self):
+        self.view.blit_limit = 1
+        canvas = self.ax.figure.canvas
+        with patch.object(canvas, "draw_idle") as draw_idle, patch.object(canvas, "blit") as blit:
+            self.product1.status = Status.DONE
+            self.view.flush()
+        draw_idle.assert_called_once()
+        blit.assert_not_called()
+
+    def test_structure_coalesced(self):
+        bar = self.bar(self.product2)
+        canvas = self.ax.figure.canvas
+        with patch.object(canvas, "draw_idle") as draw_idle:
+            product0 = Product("Plasmid0")
+            self.dag_model.add_product(self.product1, product0)
+            self.dag_model.add_product(Product("Plasmid3"), self.product2)
+            self.view.flush()
+        draw_idle.assert_called_once()
+
+        # The same bar is reused, moved one column right
+        self.assertIs(self.bar(self.product2), bar)
+        self.assertEqual(bar.get_x(), 20)
+        self.assertEqual(len(self.view._bars), 5)
+
+        self.dag_model.remove_product(product0)
+        self.view.flush()
+        self.assertEqual(len(self.view._bars), 4)
+
+    def test_close(self):
+        self.view.close()
+        self.product1.status = Status.DONE
+        self.assertFalse(self.view._recolour)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from src.dag_model import DAGModel, Product, Status
+from src.dag_controller import LabManagementShell
+from src.plan_file import write_plan
+from src.query import ProductColumns
+from src.watch import PlanWatcher, diff, apply_diff
+
+
+def save(dag_model, filepath):
+    if filepath.endswith(".ldag"):
+        write_plan(dag_model, filepath)
+    else:
+        dag_model.to_xml(filepath)
+    # Make sure the change is seen even within the file system's timestamp resolution
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+class TestDiff(unittest.TestCase):
+    def setUp(self):
+        # C <- B <- A, D <- A
+        self.dag_model = DAGModel()
+        self.a, self.b, self.c, self.d = (Product(name) for name in "ABCD")
+        self.dag_model.add_product(self.b, self.a)
+        self.dag_model.add_product(self.c, self.b)
+        self.dag_model.add_product(self.d, self.a)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "plan.xml")
+        save(self.dag_model, self.path)
+        self.other = DAGModel.from_xml(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def edit(self, dag_model):
+        # Rename A, finish B, drop D, and add E between B and C
+        nodes = {p.name: p for p in dag_model.products}
+        nodes["A"].name = "A2"
+        nodes["B"].status = Status.DONE
+        nodes["B"].target = datetime(2024, 5, 1)
+        dag_model.remove_product(nodes["D"])
+        e = Product("E")
+        dag_model.add_product(e, nodes["B"])
+        dag_model.add_product(nodes["C"], e)
+
+    def check_same(self, dag_model, other):
+        self.assertEqual(set(dag_model._nodes), set(other._nodes))
+        self.assertEqual(dict(dag_model._graph), dict(other._graph))
+        for id, product in other._nodes.items():
+            for name in Product.FIELDS:
+                self.assertEqual(getattr(dag_model._nodes[id], name), getattr(product, name))
+
+    def test_diff(self):
+        self.assertTrue(diff(self.dag_model, self.other).empty)
+
+        self.edit(self.other)
+        changes = diff(self.dag_model, self.other)
+        self.assertEqual([p.name for p in changes.added], ["E"])
+        self.assertEqual(changes.removed, [self.d._uuid])
+        self.assertEqual(dict(changes.changed), {self.a._uuid: {"name": "A2"},
+                                                 self.b._uuid: {"status": Status.DONE,
+                                                                "target": datetime(2024, 5, 1)}})
+        self.assertEqual(set(changes.prerequisites), {changes.added[0]._uuid, self.c._uuid})
+        self.assertEqual(str(changes), "1 added, 1 removed, 2 changed, 2 with new prerequisites")
+
+    def test_apply_keeps_products_and_indexes(self):
+        columns = ProductColumns(self.dag_model)
+        self.edit(self.other)
+        apply_diff(self.dag_model, diff(self.dag_model, self.other))
+
+        self.check_same(self.dag_model, self.other)
+        self.assertIs(self.dag_model.get_product_by_uuid(self.a._uuid), self.a)
+        self.assertEqual(self.a.name, "A2")
+        self.assertEqual([p.name for p in columns.find("status=done")], ["B"])
+        self.assertEqual(sorted(p.name for p in columns.find("downstream=A2")), ["B", "C", "E"])
+        columns.close()
+
+    def test_watcher(self):
+        for use_inotify in (True, False):
+            with self.subTest(use_inotify=use_inotify):
+                dag_model = DAGModel.from_xml(self.path)
+                watcher = PlanWatcher(self.path, use_inotify=use_inotify)
+                self.assertTrue(watcher.poll(dag_model).empty)
+                self.assertIsNone(watcher.poll(dag_model))
+
+                other = DAGModel.from_xml(self.path)
+                self.edit(other)
+                save(other, self.path)
+                self.assertFalse(watcher.poll(dag_model).empty)
+                self.check_same(dag_model, other)
+                self.assertIsNone(watcher.poll(dag_model))
+                watcher.close()
+                save(self.dag_model, self.path)
+
+    def test_unreadable_version_is_retried(self):
+        watcher = PlanWatcher(self.path, use_inotify=False)
+        watcher.poll(self.dag_model)
+        with open(self.path, "w") as f:
+            f.write("<DAG")
+        with self.assertRaises(Exception):
+            watcher.poll(self.dag_model)
+
+        self.edit(self.other)
+        save(self.other, self.path)
+        self.assertFalse(watcher.poll(self.dag_model).empty)
+        self.check_same(self.dag_model, self.other)
+
+    def test_plan_file(self):
+        path = os.path.join(self.tmpdir.name, "plan.ldag")
+        save(self.dag_model, path)
+        watcher = PlanWatcher(path)
+        self.assertTrue(watcher.poll(self.dag_model).empty)
+
+        self.edit(self.other)
+        save(self.other, path)
+        watcher.poll(self.dag_model)
+        self.check_same(self.dag_model, self.other)
+        watcher.close()
+
+
+class TestShellWatch(unittest.TestCase):
+    def test_watch_command(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "plan.xml")
+            shell = LabManagementShell()
+            shell.onecmd("add Plasmid2 Plasmid1")
+            shell.onecmd(f"save {path}")
+            shell.onecmd(f"watch {path}")
+            shell.onecmd("live")
+
+            other = DAGModel.from_xml(path)
+            other.add_product(Product("Plasmid3"), *other.get_products_by_name("Plasmid2"))
+            save(other, path)
+
+            with patch("builtins.print") as mock_print:
+                shell.precmd("")
+            self.assertIn(f"Reloaded {path}: 1 added, 0 removed, 0 changed, 1 with new prerequisites",
+                          [str(call.args[0]) for call in mock_print.call_args_list if call.args])
+            self.assertEqual(len(shell.dag_model.get_products_by_name("Plasmid3")), 1)
+
+            # The reload is one step of history
+            shell.onecmd("undo")
+            self.assertEqual(shell.dag_model.get_products_by_name("Plasmid3"), [])
+
+            shell.onecmd("watch off")
+            self.assertIsNone(shell.watcher)
+            shell.onecmd("live off")
+
+
+if __name__ == '__main__':
+    unittest.main()
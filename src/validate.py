@@ -1,10 +1,36 @@
-from src.dag_model import CycleError
+from collections import namedtuple
+from contextlib import nullcontext
 
-def validate_DAG(dag_model):  
+from src.dag_model import DAGObserver
+
+
+Cycle = namedtuple("Cycle", ["products", "witness", "break_edges"])
+Cycle.__doc__ = """A group of products that all (transitively) depend on each other.
+
+    products (list): the products in the group (a strongly connected component).
+    witness (list): a short cycle in the group (the shortest unless the group is very large),
+        each product depending on the next, with the first product repeated at the end.
+    break_edges (list): (product, prerequisite) pairs whose removal leaves the group acyclic.
+"""
+
+# Largest cycle whose witness is guaranteed to be a shortest one, see _shortest_cycle
+_WITNESS_SEARCHES = 32
+
+Analysis = namedtuple("Analysis", ["cycles", "invalid_dates"])
+Analysis.__doc__ = """Result of analyze_DAG.
+
+    cycles (list): a Cycle for every group of products depending on each other.
+    invalid_dates (list): products whose target dates are before that of some prerequisite.
+"""
+
+
+def validate_DAG(dag_model):
     """Validates that a DAGModel
         (1) contains no cycles, and
         (2) does not have any products with target dates before those of their prerequisites.
 
+    See analyze_DAG for every cycle at once.
+
     Args:
         dag_model (DAGModel): the DAGModel to validate.
 
@@ -12,32 +38,427 @@ def validate_DAG(dag_model):
         valid (bool): whether the DAGModel is valid.
         cycle (list or None): products involved in a cycle if any, else None.
         invalid_dates (list): products whose target dates are before that of some prerequisite.
-    """    
+    """
+
+    cycles, invalid_dates = analyze_DAG(dag_model)
 
     cycle = None
-    invalid_dates = []
-
-    # Check for cycle
-    try:
-        _ = dag_model.order
-    except CycleError as e:
-        cycle = e.args[1]
-    
-    # Check for target date consistency
-    for product in dag_model.products:
-        if product.target is None:
+    if len(cycles) > 0:
+        cycle = [f"{product.name} ({str(product._uuid)[-8:]})" for product in cycles[0].witness]
+
+    valid = (cycle is None) and (len(invalid_dates) == 0)
+    return valid, cycle, invalid_dates
+
+
+def analyze_DAG(dag_model):
+    """Finds every cycle and every product scheduled before one of its prerequisites.
+
+    A single pass of Tarjan's algorithm splits the products into strongly connected
+    components, which come out with each component's prerequisites before it. Components of
+    more than one product (or of a product depending on itself) are the cycles, and the
+    latest prerequisite target date of every product is carried along the same order, so
+    the whole analysis is O(N + E) for a valid DAG. Finding the witness cycle and the edges
+    to break costs more, but only within each cycle.
+
+    Args:
+        dag_model (DAGModel): the DAGModel to analyze.
+
+    Returns:
+        Analysis: the cycles and the products with inconsistent target dates.
+    """
+    lock = getattr(dag_model, "_lock", None)
+    with lock.read() if lock is not None else nullcontext():
+        products, graph = _dependency_graph(dag_model)
+        cycles, invalid = _analyze_graph(graph, {id: product.target for id, product in products.items()})
+
+        cycles = [Cycle([products[id] for id in members],
+                        [products[id] for id in witness],
+                        [(products[id], products[pre]) for id, pre in break_edges])
+                  for members, witness, break_edges in cycles]
+        invalid_dates = [product for id, product in products.items() if id in invalid]
+    return Analysis(cycles, invalid_dates)
+
+
+def _analyze_graph(graph, targets):
+    """analyze_DAG on ids alone, so that it can run where the products are not at hand.
+
+    Args:
+        graph (dict): the prerequisite ids of each id.
+        targets (dict or list): the target date (or None) of each id.
+
+    Returns:
+        tuple: Cycles of ids, and the set of ids with inconsistent target dates.
+    """
+    cycles = []
+    invalid = set()
+    # Latest target among a product and all of its prerequisites
+    latest = {}
+
+    for component in _strongly_connected(graph):
+        id = component[0]
+        if len(component) > 1 or id in graph[id]:
+            cycles.append(Cycle(component, _shortest_cycle(graph, component),
+                                _feedback_edges(graph, component)))
+
+            # Every member of a cycle is a prerequisite of every other one
+            prereq_date = _latest([latest.get(pre) for member in component for pre in graph[member]]
+                                  + [targets[member] for member in component])
+            for member in component:
+                latest[member] = prereq_date
+        else:
+            prereq_date = _latest([latest[pre] for pre in graph[id]])
+            latest[id] = _latest([prereq_date, targets[id]])
+
+        for member in component:
+            target = targets[member]
+            if target is not None and prereq_date is not None and target < prereq_date:
+                invalid.add(member)
+    return cycles, invalid
+
+
+def _latest(dates):
+    dates = [date for date in dates if date is not None]
+    return max(dates) if dates else None
+
+
+def _dependency_graph(dag_model):
+    graph = getattr(dag_model, "_graph", None)
+    if graph is None:
+        # Models without a local graph, such as server.RemoteDAGModel
+        products = {product._uuid: product for product in dag_model.products}
+        graph = {id: frozenset(pre._uuid for pre in dag_model.get_prerequisites(product))
+                 for id, product in products.items()}
+        return products, graph
+
+    # Partially loaded plans fault in the prerequisites they are missing; stubs are leaves
+    dag_model._load_prerequisites()
+    return dict(dag_model._nodes), dict(dag_model._graph)
+
+
+def _strongly_connected(graph):
+    """Tarjan's algorithm, without recursion so that long chains do not overflow the stack.
+
+    Yields:
+        list: the ids of each strongly connected component, prerequisites first.
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+
+    for root in graph:
+        if root in index:
             continue
 
-        max_prereq_date = None
-        for pre in dag_model.all_prerequisites(product):
-            if pre.target is None:
-                continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph[root]))]
 
-            if max_prereq_date is None or max_prereq_date < pre.target:
-                max_prereq_date = pre.target
+        while work:
+            node, prereqs = work[-1]
+            for pre in prereqs:
+                if pre not in index:
+                    index[pre] = low[pre] = len(index)
+                    stack.append(pre)
+                    on_stack.add(pre)
+                    work.append((pre, iter(graph[pre])))
+                    break
+                elif pre in on_stack:
+                    low[node] = min(low[node], index[pre])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
 
-        if max_prereq_date is not None and product.target < max_prereq_date:
-            invalid_dates.append(product)
-    
-    valid = (cycle is None) and (len(invalid_dates) == 0)
-    return valid, cycle, invalid_dates
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    yield component
+
+
+def _shortest_cycle(graph, component):
+    # Breadth-first search from each member, stopping as soon as it cannot beat the best
+    # cycle found so far. Searching from every member of a large component is quadratic, so
+    # beyond _WITNESS_SEARCHES members this is the shortest cycle through one of the first ones.
+    for id in component:
+        if id in graph[id]:
+            return [id, id]
+
+    members = set(component)
+    best = None
+
+    for start in component[:_WITNESS_SEARCHES]:
+        parents = {start: None}
+        frontier = [start]
+        depth = 0
+        closing = None
+        while frontier and closing is None and (best is None or depth + 1 < len(best) - 1):
+            depth += 1
+            next_frontier = []
+            for node in frontier:
+                if start in graph[node]:
+                    closing = node
+                    break
+                for pre in graph[node]:
+                    if pre in members and pre not in parents:
+                        parents[pre] = node
+                        next_frontier.append(pre)
+            frontier = next_frontier
+
+        if closing is not None:
+            path = []
+            while closing is not None:
+                path.append(closing)
+                closing = parents[closing]
+            path.reverse()
+            path.append(start)
+            if best is None or len(path) < len(best):
+                best = path
+    return best
+
+
+def _feedback_edges(graph, component):
+    """Edges to remove to make a strongly connected component acyclic.
+
+    Finding the fewest such edges is NP-hard; this uses the Eades-Lin-Smyth heuristic, which
+    orders the members by peeling off products without prerequisites (to the end), products
+    without successors (to the start), or else the product with the most prerequisites
+    relative to successors, and returns the edges pointing backwards in that order.
+    """
+    members = set(component)
+    prereqs = {id: {pre for pre in graph[id] if pre in members and pre != id} for id in members}
+    succs = {id: set() for id in members}
+    for id, pres in prereqs.items():
+        for pre in pres:
+            succs[pre].add(id)
+
+    start, end = [], []
+    remaining = set(members)
+    no_prereqs, no_succs = [], []
+
+    def remove(id):
+        remaining.discard(id)
+        for pre in prereqs[id]:
+            succs[pre].discard(id)
+            if not succs[pre]:
+                no_succs.append(pre)
+        for succ in succs[id]:
+            prereqs[succ].discard(id)
+            if not prereqs[succ]:
+                no_prereqs.append(succ)
+
+    while remaining:
+        if no_prereqs:
+            id = no_prereqs.pop()
+            if id in remaining:
+                end.append(id)
+                remove(id)
+        elif no_succs:
+            id = no_succs.pop()
+            if id in remaining:
+                start.append(id)
+                remove(id)
+        else:
+            id = max(remaining, key=lambda id: len(prereqs[id]) - len(succs[id]))
+            start.append(id)
+            remove(id)
+
+    position = {id: i for i, id in enumerate(start + end[::-1])}
+    edges = []
+    for id in component:
+        for pre in graph[id]:
+            if pre == id or (pre in members and position[pre] < position[id]):
+                edges.append((id, pre))
+    return edges
+
+
+class LiveValidator(DAGObserver):
+    """Keeps the cycles and target date problems of a DAGModel up to date as it is edited.
+
+    Each change re-checks only the products it can affect: adding an edge searches for a
+    path back through the new prerequisite's own prerequisites, and target or edge changes
+    re-check the dates of the products downstream of the change, in topological order.
+
+    Cycles are tracked as the edges that closed them. Dates are checked on the graph
+    without those edges, so while a cycle is open, dates are not compared around it.
+
+    Args:
+        dag_model (DAGModel): the model to follow; its current state is checked once.
+    """
+
+    def __init__(self, dag_model):
+        self.dag_model = dag_model
+        # (product id, prerequisite id) -> ids of a cycle closed by that edge
+        self._cycle_edges = {}
+        self._successors = {}
+        # Latest target among a product and its prerequisites
+        self._latest = {}
+        self._invalid = set()
+        self._new_cycles = set()
+        self._new_dates = set()
+
+        lock = dag_model._lock
+        with lock.read() if lock is not None else nullcontext():
+            products, graph = _dependency_graph(dag_model)
+            for id, prereqs in graph.items():
+                self._successors.setdefault(id, set())
+                for pre in prereqs:
+                    self._successors.setdefault(pre, set()).add(id)
+
+            for component in _strongly_connected(graph):
+                if len(component) > 1 or component[0] in graph[component[0]]:
+                    for id, pre in _feedback_edges(graph, component):
+                        self._cycle_edges[(id, pre)] = [id, *self._path(pre, id)]
+            self._new_cycles.update(self._cycle_edges)
+
+            self._recheck(list(graph))
+            dag_model.subscribe(self)
+
+    def close(self):
+        """Stops following the model.
+        """
+        self.dag_model.unsubscribe(self)
+
+    @property
+    def valid(self):
+        return not self._cycle_edges and not self._invalid
+
+    @property
+    def cycles(self):
+        """A cycle (products each depending on the next, the first repeated at the end) for
+        each edge that closed one.
+        """
+        return [self._products(witness) for witness in self._cycle_edges.values()]
+
+    @property
+    def invalid_dates(self):
+        """Products whose target dates are before that of some prerequisite.
+        """
+        return self._products(self._invalid)
+
+    def drain(self):
+        """Problems that appeared since the last call.
+
+        Returns:
+            cycles (list): new cycles, as in `cycles`.
+            invalid_dates (list): products whose target dates became inconsistent.
+        """
+        cycles = [self._products(self._cycle_edges[edge]) for edge in self._new_cycles
+                  if edge in self._cycle_edges]
+        dates = self._products(self._new_dates & self._invalid)
+        self._new_cycles.clear()
+        self._new_dates.clear()
+        return cycles, dates
+
+    def _products(self, ids):
+        nodes = self.dag_model._nodes
+        return [nodes[id] for id in ids if id in nodes]
+
+    def _prerequisites(self, id):
+        # Prerequisites through edges that did not close a cycle
+        return [pre for pre in self.dag_model._graph.get(id, ()) if (id, pre) not in self._cycle_edges]
+
+    def _path(self, start, goal):
+        # Ids from start to goal following prerequisites, None if goal is not upstream
+        parents = {start: None}
+        queue = [start]
+        while queue:
+            id = queue.pop()
+            if id == goal:
+                path = []
+                while id is not None:
+                    path.append(id)
+                    id = parents[id]
+                return path[::-1]
+            for pre in self.dag_model._graph.get(id, ()):
+                if pre not in parents:
+                    parents[pre] = id
+                    queue.append(pre)
+        return None
+
+    def _recheck(self, ids):
+        # Recomputes the dates of `ids` and everything downstream of them
+        region = set()
+        queue = [id for id in ids if id in self.dag_model._graph]
+        while queue:
+            id = queue.pop()
+            if id not in region:
+                region.add(id)
+                queue.extend(self._successors.get(id, ()))
+
+        prereqs = {id: self._prerequisites(id) for id in region}
+        waiting = {id: sum(pre in region for pre in pres) for id, pres in prereqs.items()}
+        ready = [id for id, count in waiting.items() if count == 0]
+
+        nodes = self.dag_model._nodes
+        while ready:
+            id = ready.pop()
+            prereq_date = _latest([self._latest.get(pre) for pre in prereqs[id]])
+            target = nodes[id].target
+            self._latest[id] = _latest([prereq_date, target])
+
+            if target is not None and prereq_date is not None and target < prereq_date:
+                if id not in self._invalid:
+                    self._invalid.add(id)
+                    self._new_dates.add(id)
+            else:
+                self._invalid.discard(id)
+
+            for succ in self._successors.get(id, ()):
+                if succ in waiting and (succ, id) not in self._cycle_edges:
+                    waiting[succ] -= 1
+                    if waiting[succ] == 0:
+                        ready.append(succ)
+
+    # --- DAGObserver ---
+
+    def product_added(self, dag_model, product):
+        self._successors.setdefault(product._uuid, set())
+        self._recheck([product._uuid])
+
+    def product_removed(self, dag_model, product):
+        id = product._uuid
+        self._successors.pop(id, None)
+        self._latest.pop(id, None)
+        self._invalid.discard(id)
+
+    def dependencies_added(self, dag_model, product, prerequisite_ids):
+        id = product._uuid
+        for pre in prerequisite_ids:
+            self._successors.setdefault(pre, set()).add(id)
+            path = self._path(pre, id)
+            if path is not None:
+                self._cycle_edges[(id, pre)] = [id, *path]
+                self._new_cycles.add((id, pre))
+        self._recheck([id])
+
+    def dependencies_removed(self, dag_model, product, prerequisite_ids):
+        id = product._uuid
+        removed = {(id, pre) for pre in prerequisite_ids}
+        for pre in prerequisite_ids:
+            self._successors.get(pre, set()).discard(id)
+            self._cycle_edges.pop((id, pre), None)
+
+        # Cycles that went through a removed edge may be gone, or take another path
+        recheck = [id]
+        for edge, witness in list(self._cycle_edges.items()):
+            if removed.isdisjoint(zip(witness, witness[1:])):
+                continue
+            path = self._path(edge[1], edge[0])
+            if path is None:
+                del self._cycle_edges[edge]
+                recheck.append(edge[0])
+            else:
+                self._cycle_edges[edge] = [edge[0], *path]
+        self._recheck(recheck)
+
+    def product_changed(self, dag_model, product, name, old, new):
+        if name == "target":
+            self._recheck([product._uuid])
@@ -2,24 +2,52 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
-from src.dag_model import DAGModel
+from src.dag_model import DAGModel, DAGObserver
 
 
-def gantt(dag_model, ax=None):
+WSTRIDE = 10
+HSTRIDE = 10
+
+
+def _gantt_rows(dag_model):
+    # (product, column) for each row of the chart, each product one column after its last
+    # prerequisite
+    end = {}
+    rows = []
+    for product in dag_model.order:
+        max_end = max([0] + [end.get(pre._uuid, 0) for pre in dag_model.get_prerequisites(product)])
+        end[product._uuid] = max_end + 1
+        rows.append((product, max_end))
+    return rows
+
+
+def gantt(dag_model, ax=None, progress=None):
+    """Draws each product as a bar after its prerequisites.
+
+    Args:
+        dag_model (DAGModel): the model to draw.
+        ax (Axes, optional): where to draw, a new figure by default.
+        progress (callable, optional): returns the rollup.Progress of a product, shown next
+            to its name.
+    """
+    return _draw_gantt(_gantt_rows(dag_model), ax, progress)
+
+
+def _draw_gantt(rows, ax=None, progress=None):
+    # Draws rows from _gantt_rows, top to bottom
     if ax is None:
         _, ax = plt.subplots()
     
-    wstride = 10
-    hstride = 10
+    wstride = WSTRIDE
+    hstride = HSTRIDE
 
-    end = {}
-    order = dag_model.order
-    N = len(order)
+    N = len(rows)
     names = []
-    for y, product in enumerate(order):
-        names.append(product.name)
-        max_end = max([0] + [end.get(pre._uuid, 0) for pre in dag_model.get_prerequisites(product)])
-        end[product._uuid] = max_end + 1
+    for y, (product, max_end) in enumerate(rows):
+        if progress is not None:
+            names.append(f"{product.name} ({progress(product).fraction:.0%})")
+        else:
+            names.append(product.name)
 
         # Rectangle patch
         xpos = max_end * wstride
@@ -32,7 +60,7 @@ def gantt(dag_model, ax=None):
                                  facecolor='ryg'[product.status.value])
         ax.add_patch(rect)
     
-    ax.set_xlim(0, max(end.values()) * wstride)
+    ax.set_xlim(0, max([1] + [max_end + 1 for _, max_end in rows]) * wstride)
     ax.set_ylim(- N * hstride, 0)
     ax.set_yticks(np.arange(- hstride / 2, - N * hstride, -hstride), names)
 
@@ -72,4 +100,183 @@ def gantt_2(dag_model, ax=None):
     ax.set_xlim(xmax * wstride, 0)
     ax.set_yticks(np.arange(hstride / 2, ymax * hstride, hstride), names)
 
-    return ax
\ No newline at end of file
+    return ax
+
+
+class InteractiveGantt(DAGObserver):
+    """Gantt chart that follows a DAGModel without blocking the caller.
+
+    Each product keeps its bar (and, with `progress`, a strip showing the done fraction of
+    its cone). Edits are only recorded as they happen; `flush` applies them all at once,
+    either from a timer running with the window's event loop, at most once per `interval`,
+    or when called directly (the shell calls it after every command). Status changes
+    restyle the changed bars, and with `progress` the bars downstream of them, and blit just
+    their area, or redraw the figure once if more than `blit_limit` bars changed;
+    structural changes move the existing bars and redraw the figure once.
+
+    Args:
+        dag_model (DAGModel): the model to show.
+        ax (Axes, optional): where to draw, a new figure by default.
+        progress (callable, optional): returns the rollup.Progress of a product.
+        downstream (callable, optional): returns the products whose progress depends on
+            the status of a product, such as rollup.ProgressRollUp.downstream; every bar
+            is restyled on a status change if not given.
+        interval (int, optional): milliseconds between redraws while edits keep coming.
+        blit_limit (int, optional): the most bars blitted one by one.
+    """
+
+    def __init__(self, dag_model, ax=None, progress=None, downstream=None, interval=16, blit_limit=64):
+        if ax is None:
+            _, ax = plt.subplots()
+        self.dag_model = dag_model
+        self.ax = ax
+        self.progress = progress
+        self.downstream = downstream
+        self.blit_limit = blit_limit
+        self._bars = {}
+        self._recolour = set()
+        self._relayout = True
+        self._closed = False
+
+        canvas = ax.figure.canvas
+        self._timer = canvas.new_timer(interval=interval)
+        self._timer.single_shot = True
+        self._timer.add_callback(self.flush)
+        self._timer_running = False
+        canvas.mpl_connect("close_event", lambda _: self.close())
+
+        dag_model.subscribe(self)
+        self.flush()
+
+    def show(self):
+        """Opens the window without blocking.
+        """
+        plt.show(block=False)
+        self.ax.figure.canvas.flush_events()
+
+    def close(self):
+        """Stops following the model; the window may stay open.
+        """
+        if not self._closed:
+            self._closed = True
+            self._timer.stop()
+            self.dag_model.unsubscribe(self)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _schedule(self):
+        if not self._timer_running:
+            self._timer_running = True
+            self._timer.start()
+
+    # --- DAGObserver ---
+
+    def _structure_changed(self, *args):
+        self._relayout = True
+        self._schedule()
+
+    product_added = product_removed = dependencies_added = dependencies_removed = _structure_changed
+
+    def product_changed(self, dag_model, product, name, old, new):
+        if name == "status":
+            self._recolour.add(product._uuid)
+            self._schedule()
+        elif name == "name":
+            self._relayout = True
+            self._schedule()
+
+    # --- drawing ---
+
+    def _new_bar(self):
+        # add_artist rather than add_patch: the limits are set by _layout, and updating
+        # them for each patch dominates the cost of a large chart
+        bar = patches.Rectangle((0, 0), WSTRIDE, HSTRIDE, linewidth=1, edgecolor='w')
+        self.ax.add_artist(bar)
+        strip = None
+        if self.progress is not None:
+            strip = patches.Rectangle((0, 0), 0, HSTRIDE / 5, linewidth=0, facecolor='k', alpha=0.4)
+            self.ax.add_artist(strip)
+        return bar, strip
+
+    def _style(self, product):
+        bar, strip = self._bars[product._uuid]
+        bar.set_facecolor('ryg'[product.status.value])
+        if strip is not None:
+            strip.set_width(WSTRIDE * self.progress(product).fraction)
+
+    def flush(self):
+        """Draws all edits made since the last call, in one redraw.
+        """
+        self._timer_running = False
+        if self._relayout:
+            self._layout()
+        elif self._recolour:
+            self._blit_colours()
+        self._recolour.clear()
+
+    def _layout(self):
+        self._relayout = False
+        rows = _gantt_rows(self.dag_model)
+
+        # Reuse the bars of products that are still there
+        current = {product._uuid for product, _ in rows}
+        for id in list(self._bars):
+            if id not in current:
+                for artist in self._bars.pop(id):
+                    if artist is not None:
+                        artist.remove()
+
+        names = []
+        for y, (product, max_end) in enumerate(rows):
+            if product._uuid not in self._bars:
+                self._bars[product._uuid] = self._new_bar()
+            bar, strip = self._bars[product._uuid]
+            bar.set_xy((max_end * WSTRIDE, - (y + 1) * HSTRIDE))
+            if strip is not None:
+                strip.set_xy((max_end * WSTRIDE, - (y + 1) * HSTRIDE))
+            self._style(product)
+            names.append(product.name)
+
+        N = len(rows)
+        self.ax.set_xlim(0, max([1] + [max_end + 1 for _, max_end in rows]) * WSTRIDE)
+        self.ax.set_ylim(- max(N, 1) * HSTRIDE, 0)
+        self.ax.set_yticks(np.arange(- HSTRIDE / 2, - N * HSTRIDE, -HSTRIDE), names)
+        self.ax.figure.canvas.draw_idle()
+
+    def _blit_colours(self):
+        nodes = self.dag_model._nodes
+        changed = set(self._recolour)
+        if self.progress is not None:
+            # Marking a product changes the progress of everything downstream of it
+            if self.downstream is None:
+                changed.update(self._bars)
+            else:
+                for id in self._recolour:
+                    if id in nodes:
+                        changed.update(product._uuid for product in self.downstream(nodes[id]))
+
+        restyled = []
+        for id in changed:
+            if id not in self._bars or id not in nodes:
+                continue
+            bar, strip = self._bars[id]
+            old = (bar.get_facecolor(), strip.get_width() if strip is not None else None)
+            self._style(nodes[id])
+            if (bar.get_facecolor(), strip.get_width() if strip is not None else None) != old:
+                restyled.append((bar, strip))
+        if not restyled:
+            return
+
+        canvas = self.ax.figure.canvas
+        renderer = getattr(canvas, "get_renderer", lambda: None)()
+        if renderer is None or not canvas.supports_blit or len(restyled) > self.blit_limit:
+            canvas.draw_idle()
+            return
+        for bar, strip in restyled:
+            # Bars are opaque, so drawing over the old one is enough
+            self.ax.draw_artist(bar)
+            if strip is not None:
+                self.ax.draw_artist(strip)
+            canvas.blit(bar.get_window_extent(renderer))
@@ -0,0 +1,222 @@
+"""Follow a plan file edited by other programs, applying only what changed to a DAGModel.
+
+Example:
+
+    watcher = PlanWatcher("plan.xml")
+    ...
+    changes = watcher.poll(dag_model)   # None if the file did not change
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+from collections import namedtuple
+from contextlib import nullcontext
+
+from src.dag_model import DAGModel, Product
+from src.plan_file import load_plan, PLAN_EXTENSION
+
+
+class PlanDiff(namedtuple("PlanDiff", ["added", "removed", "changed", "prerequisites"])):
+    """Differences between two versions of a plan, matched by product UUID.
+
+        added (list): products only in the new version.
+        removed (list): UUIDs of products only in the old version.
+        changed (list): (uuid, {field: new value}) for products whose fields differ.
+        prerequisites (dict): uuid -> new set of prerequisite UUIDs, for products whose
+            prerequisites differ (including added products).
+    """
+
+    @property
+    def empty(self):
+        return not (self.added or self.removed or self.changed or self.prerequisites)
+
+    def __str__(self):
+        return (f"{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed, "
+                f"{len(self.prerequisites)} with new prerequisites")
+
+
+def read_plan(filepath):
+    """Reads a plan from an XML or indexed plan (.ldag) file.
+    """
+    if filepath.endswith(PLAN_EXTENSION):
+        return load_plan(filepath)
+    return DAGModel.from_xml(filepath)
+
+
+def diff(dag_model, new_model):
+    """Compares a model to a new version of it.
+
+    Args:
+        dag_model (DAGModel): the current model.
+        new_model (DAGModel): the new version, e.g. read from a file.
+
+    Returns:
+        PlanDiff: what to apply to `dag_model` to make it match `new_model`.
+
+    Raises:
+        ValueError: if `dag_model` was partially loaded from a plan file.
+    """
+    if dag_model._loader is not None:
+        raise ValueError("Cannot compare a partially loaded model; load the whole plan.")
+
+    old_nodes, new_nodes = dag_model._nodes, new_model._nodes
+    old_graph = dag_model._graph
+
+    added = [product for id, product in new_nodes.items() if id not in old_nodes]
+    removed = [id for id in old_nodes if id not in new_nodes]
+
+    changed = []
+    for id, new in new_nodes.items():
+        old = old_nodes.get(id)
+        if old is None:
+            continue
+        fields = {name: getattr(new, name) for name in Product.FIELDS
+                  if getattr(old, name) != getattr(new, name)}
+        if fields:
+            changed.append((id, fields))
+
+    prerequisites = {id: prereqs for id, prereqs in new_model._graph.items()
+                     if old_graph.get(id, frozenset()) != prereqs}
+    return PlanDiff(added, removed, changed, prerequisites)
+
+
+def apply_diff(dag_model, plan_diff):
+    """Applies a PlanDiff through the model's usual methods, so that observers (indexes,
+    views, history) follow each change. Products that are kept stay the same objects.
+    """
+    lock = dag_model._lock
+    with lock.write() if lock is not None else nullcontext():
+        for product in plan_diff.added:
+            dag_model.add_product(product)
+
+        nodes = dag_model._nodes
+        for id, fields in plan_diff.changed:
+            product = nodes[id]
+            for name, value in fields.items():
+                setattr(product, name, value)
+
+        for id, prereqs in plan_diff.prerequisites.items():
+            dag_model.add_product(nodes[id], *(nodes[pre] for pre in prereqs))
+
+        for id in plan_diff.removed:
+            dag_model.remove_product(nodes[id])
+
+
+class _Inotify:
+    # Minimal inotify binding: reports writes and replacements of one file, without blocking
+
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = os.O_CLOEXEC
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, filepath):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watch the directory, since editors often replace the file rather than write it
+        directory = os.path.dirname(os.path.abspath(filepath))
+        self._name = os.path.basename(filepath).encode()
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+
+    def changed(self):
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                if data[offset:offset + length].rstrip(b"\0") == self._name:
+                    changed = True
+                offset += length
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PlanWatcher:
+    """Watches a plan file and applies its new versions to a model as diffs.
+
+    On Linux, inotify tells when the file was written or replaced; elsewhere (or with
+    `use_inotify=False`) its modification time and size are compared on every poll. Either
+    way, polling does not block and costs a system call or two while nothing changes.
+
+    Reloading parses the whole file, then only the differences are applied to the model, so
+    indexes and open views built on it are updated rather than rebuilt.
+
+    Args:
+        filepath (str): the XML or .ldag plan file.
+        use_inotify (bool, optional): whether to use inotify when available.
+    """
+
+    def __init__(self, filepath, use_inotify=True):
+        self.filepath = filepath
+        self._signature = None
+        self._pending = True
+        self._inotify = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(filepath)
+            except (OSError, AttributeError):
+                self._inotify = None
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def poll(self, dag_model):
+        """Applies the file to the model if it changed since the last successful poll.
+
+        Returns:
+            PlanDiff or None: what was applied, None if the file did not change.
+
+        Raises:
+            Exception: if the new version cannot be read; it is tried again on the next poll.
+        """
+        if self._inotify is not None and self._inotify.changed():
+            self._pending = True
+        if self._inotify is not None and not self._pending:
+            return None
+
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            self._pending = False
+            return None
+
+        plan_diff = self.reload(dag_model)
+        self._signature = signature
+        self._pending = False
+        return plan_diff
+
+    def reload(self, dag_model):
+        """Reads the file and applies its differences to the model.
+
+        Returns:
+            PlanDiff: what was applied.
+        """
+        plan_diff = diff(dag_model, read_plan(self.filepath))
+        if not plan_diff.empty:
+            apply_diff(dag_model, plan_diff)
+        return plan_diff